@@ -0,0 +1,157 @@
+"""
+Forhåndsberegnede aggregater per snapshot.
+
+Alle telletabeller og KPI-er visningene trenger regnes ut ÉN gang når et nytt
+snapshot bygges (i bakgrunnstråden), og lagres på snapshotet. Visningene leser
+bare små, ferdige rammer – ingen groupby per rerun/sesjon.
+"""
+import pandas as pd
+
+from metrics import METRICS
+
+
+class FrameCounts:
+    """Tellinger fra en ferdig DataFrame (standard). data_sources.SqlCounts har samme
+       metoder, men regner ut alt med GROUP BY i databasen i stedet."""
+
+    def __init__(self, df):
+        self.df = df
+
+    def total(self):
+        return len(self.df)
+
+    def nunique(self, col):
+        return int(self.df[col].nunique())
+
+    def minimum(self, col):
+        return self.df[col].min() if not self.df.empty else None
+
+    def counts(self, col):
+        """[col, "n"] – antall rader per verdi, sortert synkende."""
+        return (
+            self.df.groupby(col, observed=True).size()
+                .reset_index(name="n")
+                .sort_values("n", ascending=False, ignore_index=True)
+        )
+
+    def day_counts(self, col):
+        """[col, "n"] – antall rader per dag, sortert på dato."""
+        return (
+            self.df[col].value_counts()
+                .rename_axis(col)
+                .reset_index(name="n")
+                .sort_values(col, ignore_index=True)
+        )
+
+
+def as_counts(src):
+    """DataFrame → FrameCounts; et ferdig tellerobjekt sendes videre uendret."""
+    return FrameCounts(src) if isinstance(src, pd.DataFrame) else src
+
+
+def count_table(src, col, label, rename=None):
+    """Antall rader per verdi i `col`, sortert synkende. Kolonner: [rename or col, label].
+       Nøkkelkolonnen blir vanlig tekst (kategorier er et lagringsformat, ikke visning),
+       og indeksen er 1-basert slik tabellene viser den."""
+    out = as_counts(src).counts(col).rename(columns={"n": label})
+    out[col] = out[col].astype(str)
+    out.index = pd.RangeIndex(1, len(out) + 1)
+    if rename:
+        out = out.rename(columns={col: rename})
+    return out
+
+
+def top_of(table, label):
+    """(navn, antall) for øverste rad i en sortert telletabell, ellers ("-", 0)."""
+    if table.empty:
+        return "-", 0
+    return table.iloc[0, 0], int(table.iloc[0][label])
+
+
+def per_day_counts(src, col, label, key="Dato"):
+    """Antall per dag, sortert på dato. Kolonner: [key, label]."""
+    return as_counts(src).day_counts(col).rename(columns={col: key, "n": label})
+
+
+def reparert(src):
+    src = as_counts(src)
+    per_brand = count_table(src, "Merke", "Repairs", rename="Brand")
+    per_tech = count_table(src, "Tekniker", "Repairs", rename="Technician")
+    top_tech, top_tech_count = top_of(per_tech, "Repairs")
+    return {
+        "total": src.total(),
+        "brands": src.nunique("Merke"),
+        "per_brand": per_brand,
+        "per_tech": per_tech,
+        "top_tech": top_tech,
+        "top_tech_count": top_tech_count,
+    }
+
+
+def innlevert(src):
+    src = as_counts(src)
+    per_day = per_day_counts(src, "Innlevert", "Innlevert")
+    return {
+        "total": src.total(),
+        "brands": src.nunique("Merke"),
+        "per_brand": count_table(src, "Merke", "Innlevert"),
+        "per_day": per_day,
+        # Oppslag for "innlevert i dag" (dagen bestemmes ved visning)
+        "by_day": per_day.set_index("Dato")["Innlevert"],
+    }
+
+
+def inhouse(src):
+    src = as_counts(src)
+    per_brand = count_table(src, "Merke", "Antall")
+    top_brand, top_brand_count = top_of(per_brand, "Antall")
+    return {
+        "total": src.total(),
+        "oldest": src.minimum("Dato"),
+        "top_brand": top_brand,
+        "top_brand_count": top_brand_count,
+        "per_status": count_table(src, "Status", "Antall"),
+        "per_day": per_day_counts(src, "Dato", "Antall"),
+    }
+
+
+def arbeidet(src):
+    src = as_counts(src)
+    per_status = count_table(src, "Status", "Antall")
+    per_tech = count_table(src, "Tekniker", "Antall")
+    top_status, top_status_count = top_of(per_status, "Antall")
+    top_tech, top_tech_count = top_of(per_tech, "Antall")
+    return {
+        "total": src.total(),
+        "per_brand": count_table(src, "Merke", "Antall"),
+        "per_status": per_status,
+        "per_tech": per_tech,
+        "top_status": top_status,
+        "top_status_count": top_status_count,
+        "top_tech": top_tech,
+        "top_tech_count": top_tech_count,
+    }
+
+
+VIEW_AGGREGATES = {
+    "Reparert":  reparert,
+    "Innlevert": innlevert,
+    "Inhouse":   inhouse,
+    "Arbeidet":  arbeidet,
+}
+
+
+def build_aggregates(frames):
+    """{visning: dict med aggregater eller Exception} for et ferdig sett med rammer
+       (DataFrame eller et tellerobjekt som FrameCounts/SqlCounts)."""
+    out = {}
+    for view, frame in frames.items():
+        if isinstance(frame, Exception):
+            out[view] = frame
+            continue
+        try:
+            with METRICS.time("rr_stage_seconds", stage="aggregate", view=view):
+                out[view] = VIEW_AGGREGATES[view](frame)
+        except Exception as e:
+            out[view] = e
+    return out
@@ -0,0 +1,151 @@
+"""
+Aldring av Inhouse-beholdningen (dager i huset per enhet).
+
+Enhetene telles ÉN gang per nytt Inhouse-snapshot til en kompakt tabell
+(Merke, Status, Dato) → antall – størrelsen følger antall kombinasjoner, ikke
+antall enheter. Alt annet regnes på den tabellen, vektorisert:
+
+  - dager i huset = i dag − Dato (så datoskifte krever ingen ny telling)
+  - histogram per status og per merke i bøttene 0–2, 3–7, 8–14 og 15+ dager
+  - p50/p90 (vektet med antall) totalt, per status og per merke
+  - filter (merke, status, periode) er utsnitt av tabellen, ikke av radene
+
+Ved nytt snapshot sammenlignes tabellen med forrige: differansen er enhetene
+som har kommet inn og gått ut (eller byttet status) siden sist, per status.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS
+
+KEYS = ["Merke", "Status", "Dato"]
+
+# Nedre grense (dager) per bøtte
+BUCKET_EDGES = np.array([0, 3, 8, 15])
+BUCKET_LABELS = ["0–2", "3–7", "8–14", "15+"]
+QUANTILES = (0.5, 0.9)
+
+
+def unit_counts(df):
+    """(Merke, Status, Dato) → n. Enheter uten dato telles ikke (se undated)."""
+    return (
+        df.groupby(KEYS, observed=True).size()
+            .rename("n").reset_index()
+    )
+
+
+def weighted_quantiles(values, weights, qs=QUANTILES):
+    """Minste verdi der kumulativ vekt når q (nærmeste hele dag, ingen interpolering)."""
+    if not len(values) or weights.sum() == 0:
+        return [None] * len(qs)
+    order = np.argsort(values, kind="stable")
+    cum = np.cumsum(weights[order])
+    idx = np.searchsorted(cum, np.asarray(qs) * cum[-1], side="left")
+    return [int(v) for v in np.asarray(values)[order][np.minimum(idx, len(cum) - 1)]]
+
+
+def movement(old, new):
+    """Inn/ut per status mellom to telletabeller (positiv differanse = inn, negativ = ut)."""
+    both = old.merge(new, on=KEYS, how="outer", suffixes=("_old", "_new")).fillna({"n_old": 0, "n_new": 0})
+    delta = both["n_new"] - both["n_old"]
+    out = pd.DataFrame({
+        "Status": both["Status"].astype(str),
+        "Inn": delta.clip(lower=0),
+        "Ut": (-delta).clip(lower=0),
+    })
+    return out.groupby("Status").sum().astype(int)
+
+
+class AgingEngine:
+    """Holder telletabellen for siste Inhouse-ramme og lager rapporter fra den. Trådsikker."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._counts = None
+        self._undated = 0
+        self._moves = None          # inn/ut per status siden forrige snapshot
+        self._reports = {}
+
+    def update(self, df):
+        """Ny ramme → ny telletabell (samme ramme-objekt = ingenting å gjøre)."""
+        with self._lock:
+            if df is self._frame:
+                return False
+            with METRICS.time("rr_stage_seconds", stage="aging_update", view="Inhouse"):
+                counts = unit_counts(df)
+                moves = movement(self._counts, counts) if self._counts is not None else None
+            self._frame, self._counts, self._moves = df, counts, moves
+            self._undated = int(df["Dato"].isna().sum())
+            self._reports = {}
+            return True
+
+    def report(self, df, today, brands=(), statuses=(), start=None, end=None):
+        """Aldringsrapport for `df` per `today` (dato). Filteret er valgfritt."""
+        self.update(df)
+        key = (pd.Timestamp(today), tuple(brands), tuple(statuses), start, end)
+        with self._lock:
+            cached = self._reports.get(key)
+            counts, moves, undated = self._counts, self._moves, self._undated
+        if cached is not None:
+            return cached
+        with METRICS.time("rr_stage_seconds", stage="aging_report", view="Inhouse"):
+            out = self._report(counts, moves, undated, *key)
+        with self._lock:
+            if self._counts is counts:
+                self._reports[key] = out
+        return out
+
+    @staticmethod
+    def _report(counts, moves, undated, today, brands, statuses, start, end):
+        c = counts
+        if brands:
+            c = c[c["Merke"].isin(brands)]
+        if statuses:
+            c = c[c["Status"].isin(statuses)]
+        if start is not None:
+            c = c[c["Dato"] >= pd.Timestamp(start)]
+        if end is not None:
+            c = c[c["Dato"] < pd.Timestamp(end) + pd.Timedelta(days=1)]
+
+        age = np.maximum((today - c["Dato"]).dt.days.to_numpy(), 0)
+        n = c["n"].to_numpy()
+        bucket = np.searchsorted(BUCKET_EDGES, age, side="right") - 1
+        nb = len(BUCKET_LABELS)
+
+        def by(col):
+            """[col, bøtter..., Totalt, p50, p90] – sortert på flest eldre enn 14 dager."""
+            codes, names = pd.factorize(c[col].astype(str), sort=True)
+            hist = np.bincount(codes * nb + bucket, weights=n, minlength=len(names) * nb)
+            out = pd.DataFrame(hist.reshape(len(names), nb).astype(int), columns=BUCKET_LABELS)
+            out.insert(0, col, np.asarray(names))
+            out["Totalt"] = out[BUCKET_LABELS].sum(axis=1)
+            q = [weighted_quantiles(age[codes == i], n[codes == i]) for i in range(len(names))]
+            out["p50"] = [p for p, _ in q]
+            out["p90"] = [p for _, p in q]
+            out = out.sort_values(["15+", "Totalt"], ascending=False, ignore_index=True)
+            out.index = pd.RangeIndex(1, len(out) + 1)
+            return out
+
+        per_status = by("Status")
+        if moves is not None:
+            for col in ("Inn", "Ut"):
+                per_status[col] = per_status["Status"].map(moves[col]).fillna(0).astype(int)
+        # Lang form for stablet søylediagram (status × bøtte)
+        long = per_status.melt(id_vars="Status", value_vars=BUCKET_LABELS,
+                               var_name="Alder", value_name="Antall")
+        long = long[long["Antall"] > 0].reset_index(drop=True)
+        p50, p90 = weighted_quantiles(age, n)
+        total = int(n.sum())
+        return {
+            "units": total,
+            "undated": undated,
+            "p50": p50,
+            "p90": p90,
+            "over_14": int(n[age >= BUCKET_EDGES[-1]].sum()),
+            "per_status": per_status,
+            "per_brand": by("Merke"),
+            "status_buckets": long,
+        }
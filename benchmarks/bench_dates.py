@@ -0,0 +1,73 @@
+"""
+Benchmark: dato-parsing på et syntetisk ark (standard 500 000 rader).
+
+Sammenligner gammel to-stegs parsing (to_datetime dayfirst + Excel-pass + .dt.date)
+med date_parsing.parse_dates. Kjør fra repo-roten:
+
+    python benchmarks/bench_dates.py [--rows 500000] [--repeat 3]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from date_parsing import parse_dates  # noqa: E402
+
+
+def legacy_parse(s):
+    """Slik read_df_innlevert/read_df_inhouse parset før (infer_datetime_format er
+       standard fra pandas 2 og fjernet i pandas 3, så argumentet er utelatt)."""
+    dates = pd.to_datetime(s, errors="coerce", dayfirst=True)
+    needs_excel = dates.isna()
+    if needs_excel.any():
+        as_num = pd.to_numeric(s[needs_excel], errors="coerce")
+        conv = pd.to_datetime(as_num, errors="coerce", unit="D", origin="1899-12-30")
+        dates.loc[needs_excel] = conv
+    return dates.dt.date
+
+
+def synthetic_column(rows, seed=42, mix=(0.80, 0.10, 0.08, 0.02)):
+    """dd.mm.yyyy / ISO / Excel-serie / tomme celler i gitt andel."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 1000, rows), unit="D")
+    kind = rng.choice(4, size=rows, p=mix)
+    nor = days.strftime("%d.%m.%Y")
+    iso = days.strftime("%Y-%m-%d")
+    serial = ((days - pd.Timestamp("1899-12-30")).days).astype(str)
+    out = np.where(kind == 0, nor, np.where(kind == 1, iso, np.where(kind == 2, serial, "")))
+    return pd.Series(out, dtype=object)
+
+
+def bench(fn, s, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        res = fn(s)
+        best = min(best, time.perf_counter() - t0)
+    return best, res
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=500_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    s = synthetic_column(args.rows)
+    print(f"{args.rows:,} rader, pandas {pd.__version__}")
+    for label, fn in [("legacy", legacy_parse), ("parse_dates", parse_dates)]:
+        secs, res = bench(fn, s, args.repeat)
+        parsed = int(pd.Series(res).notna().sum())
+        mem = pd.Series(res).memory_usage(deep=True) / args.rows
+        print(
+            f"{label:<12} {secs * 1000:8.1f} ms  {args.rows / secs:12,.0f} rader/s  "
+            f"parset={parsed:,}  {mem:5.1f} B/rad  dtype={pd.Series(res).dtype}"
+        )
+
+
+if __name__ == "__main__":
+    main()
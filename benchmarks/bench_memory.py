@@ -0,0 +1,79 @@
+"""
+Minnerapport: bytes per rad for de kanoniske rammene, før og etter kompakte dtyper.
+
+"Før" = str/object-kolonner og date-objekter (slik read_df* returnerte dem),
+"etter" = category med felles ordbok + datetime64 (sheet_data-byggerne).
+Kjør fra repo-roten:
+
+    python benchmarks/bench_memory.py [--rows 200000]
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from sheet_data import frame_arbeidet, frame_inhouse, frame_innlevert, frame_reparert  # noqa: E402
+
+BRANDS = ["Samsung", "Apple", "LG", "Sony", "Huawei", "Xiaomi", "OnePlus", "Motorola",
+          "Nokia", "Google", "Asus", "Lenovo", "Acer", "HP", "Dell", "Philips"]
+STATUSES = ["Venter på deler", "Under reparasjon", "Klar for henting", "Sendt til leverandør",
+            "Venter på kunde", "Diagnose", "Kvalitetskontroll"]
+TECHS = ["Ola Nordmann", "Kari Nordmann", "Per Hansen", "Anne Johansen", "Lars Olsen",
+         "Ingrid Larsen", "Nils Berg", "Sofie Dahl"]
+
+
+def synthetic_values(rows, seed=7):
+    """Rå arkverdier (header + rader) for alle fire visningene."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp("2023-01-01") + pd.to_timedelta(rng.integers(0, 1000, rows), unit="D")
+    dates = list(days.strftime("%d.%m.%Y"))
+    brand = list(rng.choice(BRANDS, rows))
+    status = list(rng.choice(STATUSES, rows))
+    tech = list(rng.choice(TECHS, rows))
+    return {
+        "Reparert":  [["Merke", "Tekniker"]] + [list(r) for r in zip(brand, tech)],
+        "Innlevert": [["Merke", "Innlevert"]] + [list(r) for r in zip(brand, dates)],
+        "Inhouse":   [["Merke", "Statustekst", "Statusdato"]] + [list(r) for r in zip(brand, status, dates)],
+        "Arbeidet":  [["Merker", "Status", "Tekniker"]] + [list(r) for r in zip(brand, status, tech)],
+    }
+
+
+def legacy(frame):
+    """Samme innhold med gamle dtyper: str-objekter og datetime.date-objekter."""
+    out = frame.copy()
+    for col in out.columns:
+        if pd.api.types.is_datetime64_any_dtype(out[col]):
+            out[col] = out[col].dt.date
+        else:
+            out[col] = out[col].astype(str).astype(object)
+    return out
+
+
+def bytes_per_row(df):
+    return df.memory_usage(deep=True, index=False).sum() / max(len(df), 1)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=200_000)
+    args = ap.parse_args()
+
+    values = synthetic_values(args.rows)
+    builders = {
+        "Reparert": frame_reparert, "Innlevert": frame_innlevert,
+        "Inhouse": frame_inhouse, "Arbeidet": frame_arbeidet,
+    }
+    print(f"{args.rows:,} rader per ark, pandas {pd.__version__}")
+    print(f"{'visning':<10} {'før B/rad':>10} {'etter B/rad':>12} {'faktor':>7}")
+    for view, build in builders.items():
+        after = build(values[view])
+        before = bytes_per_row(legacy(after))
+        now = bytes_per_row(after)
+        print(f"{view:<10} {before:10.1f} {now:12.1f} {before / now:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark av hele datastien uten Google: henting → parsing → aggregering → figurer.
+
+Bruker fake_sheets.FakeClient (syntetiske ark med skitne datoer, Excel-seriedatoer
+og tomme rader, simulert latens per API-kall) bak samme SheetLoader som appen.
+Faste frø gir like data hver gang, og hver størrelse måles --repeat ganger
+(median). Minne = tracemalloc-topp per steg, målt i en egen runde. Kjør fra
+repo-roten:
+
+    python benchmarks/bench_pipeline.py [--rows 1000 10000 100000] [--latency 0.05] [--repeat 3]
+
+--split henter hver arkfane i et eget, parallelt kall (som appens fetch_split);
+--row-latency gir store ark lengre svartid, slik at forskjellen blir synlig.
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from aggregates import build_aggregates  # noqa: E402
+from fake_sheets import DEFAULT_WORKSHEETS, FakeClient, synthetic_workbook  # noqa: E402
+from figures import FigureCache  # noqa: E402
+from sheet_data import SheetLoader  # noqa: E402
+
+# Samme figurer som visningene viser: (visning, aggregat, type, spesifikasjon)
+CHARTS = [
+    ("Reparert",  "per_brand",  "bar",  dict(x="Brand", y="Repairs")),
+    ("Reparert",  "per_tech",   "pie",  dict(names="Technician", values="Repairs")),
+    ("Innlevert", "per_brand",  "bar",  dict(x="Merke", y="Innlevert")),
+    ("Innlevert", "per_day",    "line", dict(x="Dato", y="Innlevert")),
+    ("Inhouse",   "per_status", "bar",  dict(x="Status", y="Antall")),
+    ("Inhouse",   "per_day",    "bar",  dict(x="Dato", y="Antall")),
+    ("Arbeidet",  "per_brand",  "bar",  dict(x="Merke", y="Antall")),
+    ("Arbeidet",  "per_status", "bar",  dict(x="Status", y="Antall")),
+]
+
+STAGES = ("fetch", "parse", "aggregate", "figures", "figures (cache)", "refresh (inkr.)")
+
+
+def run_once(book, latency, on_stage=None, split=False, row_latency=0.0):
+    """Én full runde; returnerer {steg: sekunder}. on_stage(steg) kalles etter hvert steg."""
+    client = FakeClient(book={ws: list(v) for ws, v in book.items()}, latency=latency,
+                        row_latency=row_latency)
+    loader = SheetLoader(client, "fake", DEFAULT_WORKSHEETS, append_only=("Innlevert",), split=split)
+    cache = FigureCache()
+    out = {}
+    t = time.perf_counter()
+
+    def done(stage):
+        nonlocal t
+        out[stage] = time.perf_counter() - t
+        if on_stage is not None:
+            on_stage(stage)
+        t = time.perf_counter()
+
+    values = loader.fetch()
+    done("fetch")
+    frames = loader.build(values)
+    done("parse")
+    aggs = build_aggregates(frames)
+    done("aggregate")
+    for stage in ("figures", "figures (cache)"):
+        for view, key, kind, spec in CHARTS:
+            cache.get(kind, aggs[view][key], view=view, **spec)
+        done(stage)
+
+    # Nye rader i append-only-arket: kun halen hentes og parses
+    ws = DEFAULT_WORKSHEETS["Innlevert"]
+    client.spreadsheet.append_rows(ws, book[ws][1:101])
+    t = time.perf_counter()
+    loader.build(loader.fetch())
+    done("refresh (inkr.)")
+    return out
+
+
+def peak_memory(book, latency, **kwargs):
+    """tracemalloc-topp (MB) per steg fra én egen runde."""
+    peaks = {}
+
+    def on_stage(stage):
+        peaks[stage] = tracemalloc.get_traced_memory()[1] / 1e6
+        tracemalloc.reset_peak()
+
+    tracemalloc.start()
+    try:
+        run_once(book, latency, on_stage, **kwargs)
+    finally:
+        tracemalloc.stop()
+    return peaks
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--latency", type=float, default=0.05, help="sekunder per API-kall")
+    ap.add_argument("--row-latency", type=float, default=0.0, help="sekunder per returnerte rad")
+    ap.add_argument("--split", action="store_true", help="én parallell henting per arkfane")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--no-memory", action="store_true", help="hopp over tracemalloc-runden")
+    args = ap.parse_args()
+
+    opts = dict(split=args.split, row_latency=args.row_latency)
+    print(f"latens {args.latency * 1000:.0f} ms/kall, {'parallell per fane' if args.split else 'ett batch-kall'}, "
+          f"median av {args.repeat}")
+    print(f"{'rader':>9} " + " ".join(f"{s:>16}" for s in STAGES))
+    for rows in args.rows:
+        book = synthetic_workbook(rows)
+        runs = [run_once(book, args.latency, **opts) for _ in range(args.repeat)]
+        med = {s: statistics.median(r[s] for r in runs) for s in STAGES}
+        print(f"{rows:>9,} " + " ".join(f"{med[s] * 1000:>13.1f} ms" for s in STAGES))
+        if not args.no_memory:
+            mem = peak_memory(book, args.latency, **opts)
+            print(f"{'topp MB':>9} " + " ".join(f"{mem.get(s, 0):>13.1f} MB" for s in STAGES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Topp-RSS med N samtidige sesjoner: kopier per sesjon vs. delte rammer.
+
+"copy"   = slik det var: st.cache_data pickler/unpickler returverdien for hver
+           kaller, og visningen tar i tillegg df.copy() for tabellen.
+"shared" = alle sesjoner får samme (skrivebeskyttede) ramme fra snapshotet.
+
+Rammene bygges én gang og picklet til en tempfil; hver modus kjøres i en egen
+prosess som laster dem, slik at RSS ikke påvirkes av de rå arkverdiene.
+Kjør fra repo-roten:
+
+    python benchmarks/bench_sessions.py [--rows 200000] [--sessions 30]
+"""
+import argparse
+import os
+import pickle
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from bench_memory import synthetic_values  # noqa: E402
+from sheet_data import build_frames  # noqa: E402
+
+VIEWS = {"Reparert": "Reparert", "Innlevert": "Innlevert", "Inhouse": "Inhouse", "Arbeidet": "Arbeidet"}
+
+
+def peak_rss_mb():
+    """Topp-RSS for denne prosessen. VmHWM fra /proc (ru_maxrss arves over exec på Linux)."""
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run(mode, path, sessions):
+    with open(path, "rb") as fh:
+        frames = pickle.load(fh)
+    base = peak_rss_mb()
+    live = []  # det hver "sesjon" holder under en samtidig rerun
+    for _ in range(sessions):
+        if mode == "copy":
+            per_session = {v: pickle.loads(pickle.dumps(f)) for v, f in frames.items()}
+            per_session["_table"] = per_session["Innlevert"].copy()
+        else:
+            per_session = dict(frames)
+        live.append(per_session)
+    peak = peak_rss_mb()
+    print(f"{mode:<7} etter lasting {base:8.1f} MB   topp {peak:8.1f} MB   (+{peak - base:.1f} MB)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--sessions", type=int, default=30)
+    ap.add_argument("--mode", choices=["copy", "shared"])
+    ap.add_argument("--frames", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.mode:
+        run(args.mode, args.frames, args.sessions)
+        return
+
+    print(f"{args.rows:,} rader per ark, {args.sessions} samtidige sesjoner")
+    frames = build_frames(synthetic_values(args.rows), VIEWS)
+    fd, path = tempfile.mkstemp(suffix=".pkl")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(frames, fh)
+        for mode in ("copy", "shared"):
+            subprocess.run(
+                [sys.executable, __file__, "--mode", mode, "--frames", path,
+                 "--sessions", str(args.sessions)],
+                check=True,
+            )
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Oppstartstid for appen: tid til innloggingsskjema og tid til første graf.
+
+Hver måling kjøres i en egen, kald prosess (ingen moduler i cache fra forrige
+måling) med Streamlits AppTest og syntetiske data (data_source = "fake"):
+
+  login        ikke innlogget – til authenticator.login() har tegnet skjemaet
+  first_chart  innlogget på "Reparert" – til første st.plotly_chart-kall
+               (inkluderer første henting, som i en ny prosess)
+
+Streamlit (og streamlit_authenticator, for å kunne måle login()) importeres, og
+AppTest varmes opp med et tomt skript, før klokken starter – serveren har alltid
+gjort det før første sesjon – så tallene er skriptets egen oppstart. Skriver også hvilke tunge moduler som er lastet når
+innloggingssiden er ferdig. Kjør fra repo-roten:
+
+    python benchmarks/bench_startup.py [--runs 5] [--rows 5000] [--app secure_retail_repair_dashboard.py]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HEAVY = ("pandas", "plotly.express", "gspread", "google.oauth2", "openpyxl")
+
+
+def child(mode, app, rows):
+    """Én måling (kjøres i egen prosess). Skriver resultatet som JSON på stdout."""
+    sys.path.insert(0, str(Path(app).resolve().parent))
+    import streamlit as st
+    import streamlit_authenticator as stauth
+    from streamlit.testing.v1 import AppTest
+
+    clock = {"start": 0.0, "login": None, "first_chart": None}
+
+    def mark(name, fn):
+        def wrapper(*args, **kwargs):
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                if clock[name] is None:
+                    clock[name] = time.perf_counter() - clock["start"]
+        return wrapper
+
+    st.plotly_chart = mark("first_chart", st.plotly_chart)
+    stauth.Authenticate.login = mark("login", stauth.Authenticate.login)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        warm = Path(tmp) / "warm_up.py"
+        warm.write_text("import streamlit as st\nst.write('ok')\n")
+        AppTest.from_file(str(warm)).run()
+
+        at = AppTest.from_file(str(app), default_timeout=120)
+        at.secrets["data_source"] = "fake"
+        at.secrets["fake_rows"] = rows
+        at.secrets["fake_latency"] = 0.0
+        at.secrets["metrics_port"] = 0
+        at.secrets["snapshot_db"] = f"{tmp}/snapshot.sqlite"
+        at.secrets["history_db"] = f"{tmp}/history.sqlite"
+        at.secrets["auth"] = {"credentials": [{"username": "bench", "password": "x", "role": "viewer"}]}
+        if mode == "first_chart":
+            at.session_state["authentication_status"] = True
+            at.session_state["name"] = "bench"
+            at.session_state["username"] = "bench"
+        at.query_params["view"] = "Reparert"
+
+        clock["start"] = time.perf_counter()
+        at.run()
+        styles = sum(m.value.count("<style") for m in at.markdown)
+    print(json.dumps({
+        "login": clock["login"],
+        "first_chart": clock["first_chart"],
+        "heavy": [m for m in HEAVY if m in sys.modules],
+        "styles": styles,
+        "errors": [str(e.value)[:200] for e in at.exception],
+    }))
+
+
+def measure(mode, app, rows):
+    out = subprocess.run(
+        [sys.executable, "-W", "ignore", __file__, "--child", mode, "--app", str(app), "--rows", str(rows)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--rows", type=int, default=5000)
+    ap.add_argument("--app", default=str(ROOT / "secure_retail_repair_dashboard.py"))
+    ap.add_argument("--child", choices=("login", "first_chart"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.child:
+        child(args.child, args.app, args.rows)
+        return
+
+    print(f"{args.app} · {args.runs} kalde prosesser per måling · {args.rows:,} rader (fake)")
+    for mode, key, label in (("login", "login", "Innloggingsskjema"),
+                             ("first_chart", "first_chart", "Første graf")):
+        results = [measure(mode, args.app, args.rows) for _ in range(args.runs)]
+        errors = [e for r in results for e in r["errors"]]
+        times = [r[key] for r in results if r[key] is not None]
+        if errors or not times:
+            print(f"{label:<18} feilet: {errors[:1] or 'ingen graf'}")
+            continue
+        print(f"{label:<18} median {statistics.median(times) * 1000:7.0f} ms   "
+              f"min {min(times) * 1000:7.0f} ms   <style>-blokker: {results[0]['styles']}")
+        if mode == "login":
+            heavy = results[0]["heavy"]
+            print(f"{'':<18} tunge moduler lastet: {', '.join(heavy) if heavy else 'ingen'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Masseimport av Excel (.xlsx) til arkfanen for "Reparert" (Admin: Replace data).
+
+Filen strømmes med openpyxl i read-only-modus (én rad om gangen, ikke hele
+arket i minnet). Headeren valideres mot samme kandidatlister som visningen
+(BRAND_COLS / TECH_COLS) FØR noe skrives, og radene normaliseres til de
+kanoniske kolonnene Merke, Tekniker (tomme rader hoppes over).
+
+De normaliserte radene (to korte tekster per rad) samles i minnet og skrives
+til arkfanen i ÉTT values_batch_update-kall: Merke/Tekniker i A:B og tomme
+celler i resten av kolonnene (C, D, …) for hver datarad, og tomme rader der
+gamle rader ligger under det nye innholdet. Hele rader erstattes, så gamle
+verdier i C+ blir aldri stående ved siden av nye rader, og dashboardet ser
+enten det gamle eller det nye innholdet. Headerraden beholder kolonnene etter B.
+Fanen beholder sheetId, så formler og lenker fra andre faner virker videre.
+Feiler lesingen av filen, er arket urørt.
+
+Alle kall går gjennom sheet_data.api_call med `budget` (ApiBudget), som
+appens andre Sheets-kall.
+"""
+import time
+from dataclasses import dataclass
+
+from gspread.utils import rowcol_to_a1
+from openpyxl import load_workbook
+
+from sheet_data import BRAND_COLS, TECH_COLS, absolute_range_name, api_call
+
+CHUNK_ROWS = 5000               # fremdrift meldes per CHUNK_ROWS leste rader
+HEADER = ["Merke", "Tekniker"]
+
+
+@dataclass
+class ImportStats:
+    """Fremdrift/resultat for én import (oppdateres per CHUNK_ROWS leste rader)."""
+    expected: int = 0           # datarader ifølge filen (kan være 0 = ukjent)
+    read: int = 0               # datarader lest fra filen
+    written: int = 0            # rader skrevet til arket (uten header)
+    skipped: int = 0            # tomme/ufullstendige rader
+    batches: int = 0            # skrivekall (values_batch_update)
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.read / self.seconds if self.seconds else 0.0
+
+
+def _text(v):
+    """Celleverdi → tekst slik den vises i arket (12.0 → "12", None → "")."""
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v).strip()
+
+
+def _column(header, cands):
+    for c in cands:
+        if c in header:
+            return header.index(c)
+    return None
+
+
+def import_excel(file, spreadsheet, worksheet, chunk_rows=CHUNK_ROWS, on_progress=None, budget=None):
+    """Erstatt radene i `worksheet` med Merke/Tekniker fra Excel-filen.
+
+    file:        sti eller fil-objekt (f.eks. st.file_uploader)
+    spreadsheet: gspread.Spreadsheet (eller fake_sheets.FakeSpreadsheet)
+    on_progress: kalles med ImportStats per chunk_rows leste rader og etter skrivingen
+    budget:      sheet_data.ApiBudget for alle kallene (None = ingen grense)
+    """
+    stats = ImportStats()
+    t0 = time.perf_counter()
+    wb = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = wb.active
+        rows = sheet.iter_rows(values_only=True)
+        header = [_text(v) for v in next(rows, ())]
+        bi, ti = _column(header, BRAND_COLS), _column(header, TECH_COLS)
+        if bi is None or ti is None:
+            raise KeyError(
+                f"Missing columns. Found {header}; expected {BRAND_COLS} and {TECH_COLS}."
+            )
+        stats.expected = max((sheet.max_row or 0) - 1, 0)
+        staged = _read(rows, bi, ti, stats, t0, chunk_rows, on_progress)
+    finally:
+        wb.close()
+
+    # Nåværende omfang av fanen: antall rader og brukte kolonner (alt som skal tømmes)
+    ws = api_call("worksheet", spreadsheet.worksheet, worksheet, budget=budget)
+    resp = api_call("values_batch_get", spreadsheet.values_batch_get,
+                    [absolute_range_name(worksheet)], budget=budget)
+    current = resp.get("valueRanges", [{}])[0].get("values", [])
+    width = max([len(HEADER)] + [len(r) for r in current])
+    end = max(len(staged) + 1, len(current))
+    if end > ws.row_count:              # utvid rutenettet (bare rader) før skriving
+        api_call("resize", ws.resize, rows=end, budget=budget)
+
+    blank = [""] * (width - len(HEADER))
+    values = [row + blank for row in staged]
+    values += [[""] * width for _ in range(end - 1 - len(staged))]
+    data = [{"range": absolute_range_name(worksheet, f"A1:{rowcol_to_a1(1, len(HEADER))}"),
+             "values": [HEADER]}]
+    if values:
+        data.append({"range": absolute_range_name(worksheet, f"A2:{rowcol_to_a1(end, width)}"),
+                     "values": values})
+    api_call("values_batch_update", spreadsheet.values_batch_update,
+             {"valueInputOption": "RAW", "data": data}, budget=budget)
+    stats.batches += 1
+    stats.written = len(staged)
+    stats.seconds = time.perf_counter() - t0
+    if on_progress is not None:
+        on_progress(stats)
+    return stats
+
+
+def _read(rows, bi, ti, stats, t0, chunk_rows, on_progress):
+    """Normaliserte [Merke, Tekniker]-rader fra filen, med fremdrift per chunk_rows."""
+    staged = []
+    for row in rows:
+        stats.read += 1
+        brand = _text(row[bi]) if bi < len(row) else ""
+        tech = _text(row[ti]) if ti < len(row) else ""
+        if not brand or not tech:
+            stats.skipped += 1
+        else:
+            staged.append([brand, tech])
+        if on_progress is not None and stats.read % chunk_rows == 0:
+            stats.seconds = time.perf_counter() - t0
+            on_progress(stats)
+    return staged
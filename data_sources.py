@@ -0,0 +1,388 @@
+"""
+Utskiftbare datakilder per visning (Reparert, Innlevert, Inhouse, Arbeidet).
+
+Hver visning kan hentes fra Google Sheets (standard), en lokal fil (CSV/Excel),
+SQLite eller Postgres, valgt i secrets:
+
+    [sources.Innlevert]
+    type  = "sqlite"                  # sheets | csv | excel | sqlite | postgres
+    path  = "data/verksted.sqlite"    # csv/excel/sqlite
+    table = "innlevert"               # sqlite/postgres
+
+    [sources.Inhouse]
+    type  = "postgres"
+    url   = "postgresql+psycopg://user:pw@host/db"   # krever sqlalchemy + psycopg
+    table = "inhouse"
+    max_rows = 50000                  # rader som hentes til tabellvisningen
+
+Filer og tabeller bruker de kanoniske kolonnene (samme som Sheets-byggerne
+forstår): Reparert = Merke, Tekniker · Innlevert = Merke, Innlevert ·
+Inhouse = Merke, Status, Dato · Arbeidet = Merke, Status, Tekniker. Datoer
+lagres som DATE (Postgres) eller ISO-tekst "yyyy-mm-dd" (SQLite).
+
+For databasene regnes KPI-er og telletabeller ut med GROUP BY i databasen
+(SqlCounts), så historikken kan vokse uten at alle rader hentes til pandas –
+bare de max_rows nyeste radene hentes til tabellvisningen.
+
+DataSources samler kildene bak samme grensesnitt som SheetLoader
+(fetch/build/fingerprint + aggregate), så SnapshotRefresher ikke merker forskjell.
+"""
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from aggregates import VIEW_AGGREGATES, build_aggregates
+from date_parsing import parse_dates
+from metrics import METRICS
+from sheet_data import VIEW_BUILDERS
+
+SOURCE_TYPES = ("sheets", "csv", "excel", "sqlite", "postgres")
+
+# Kanoniske kolonner per visning, og hvilke av dem som er datoer
+VIEW_COLUMNS = {
+    "Reparert":  ("Merke", "Tekniker"),
+    "Innlevert": ("Merke", "Innlevert"),
+    "Inhouse":   ("Merke", "Status", "Dato"),
+    "Arbeidet":  ("Merke", "Status", "Tekniker"),
+}
+DATE_COLUMNS = {"Innlevert": "Innlevert", "Inhouse": "Dato"}
+
+DEFAULT_MAX_ROWS = 50_000
+
+
+def frame_values(df):
+    """DataFrame → rå verdier (header + rader som tekst), slik Sheets returnerer dem."""
+    df = df.fillna("").astype(str)
+    return [list(df.columns)] + df.to_numpy().tolist()
+
+
+def _q(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _text(col):
+    return f"COALESCE(TRIM({_q(col)}), '')"
+
+
+def view_where(view):
+    """SQL-filter med samme rensing som frame_*-byggerne (blanke rader/datoer ut)."""
+    cols = VIEW_COLUMNS[view]
+    date = DATE_COLUMNS.get(view)
+    text = [c for c in cols if c != date]
+    if view == "Arbeidet":      # kun helt blanke rader filtreres bort
+        return "(" + " OR ".join(f"{_text(c)} <> ''" for c in text) + ")"
+    parts = [f"{_text(c)} <> ''" for c in text]
+    if date:
+        parts.append(f"COALESCE(CAST({_q(date)} AS TEXT), '') <> ''")
+    return " AND ".join(parts)
+
+
+# ----------------------------
+# Kilder
+# ----------------------------
+class SheetsSource:
+    """Visningene som ligger i Google Sheets – én SheetLoader (én batch per henting)."""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.views = tuple(loader.worksheets)
+
+    def fetch(self):
+        return self.loader.fetch()
+
+    def build(self, values):
+        return self.loader.build(values)
+
+    def fingerprint(self, values):
+        return self.loader.fingerprint(values)
+
+    def invalidate(self):
+        self.loader.invalidate()
+
+
+class FileSource:
+    """Én visning fra en lokal CSV- eller Excel-fil. Leses kun på nytt når filen endres."""
+
+    def __init__(self, view, path, kind=None, sheet=0):
+        self.view = view
+        self.views = (view,)
+        self.path = path
+        self.kind = kind or ("excel" if path.lower().endswith((".xlsx", ".xlsm")) else "csv")
+        self.sheet = sheet
+        self._stamp = None
+
+    def fetch(self):
+        st = os.stat(self.path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp:
+            return None
+        with METRICS.time("rr_stage_seconds", stage="read_file", view=self.view):
+            if self.kind == "excel":
+                df = pd.read_excel(self.path, sheet_name=self.sheet, dtype=str)
+            else:
+                df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+        self._stamp = stamp
+        return {"stamp": stamp, "values": frame_values(df)}
+
+    def build(self, payload):
+        return {self.view: VIEW_BUILDERS[self.view](payload["values"])}
+
+    def fingerprint(self, payload):
+        return repr((self.path, payload["stamp"]))
+
+
+class SqlCounts:
+    """Samme tellinger som aggregates.FrameCounts, men som GROUP BY i databasen."""
+
+    def __init__(self, query, view, table):
+        self.query = query              # sql -> DataFrame
+        self.view = view
+        self.table = _q(table)
+        self.where = view_where(view)
+        self._total = None
+
+    def _expr(self, col):
+        return _q(col) if col == DATE_COLUMNS.get(self.view) else f"TRIM({_q(col)})"
+
+    def total(self):
+        if self._total is None:
+            df = self.query(f"SELECT COUNT(*) AS n FROM {self.table} WHERE {self.where}")
+            self._total = int(df.iloc[0, 0])
+        return self._total
+
+    def nunique(self, col):
+        df = self.query(
+            f"SELECT COUNT(DISTINCT {self._expr(col)}) AS n FROM {self.table} WHERE {self.where}"
+        )
+        return int(df.iloc[0, 0])
+
+    def minimum(self, col):
+        df = self.query(f"SELECT MIN({self._expr(col)}) AS v FROM {self.table} WHERE {self.where}")
+        v = parse_dates(df["v"]).iloc[0] if col == DATE_COLUMNS.get(self.view) else df.iloc[0, 0]
+        return None if pd.isna(v) else v
+
+    def counts(self, col):
+        expr = self._expr(col)
+        df = self.query(
+            f"SELECT {expr} AS {_q(col)}, COUNT(*) AS n FROM {self.table} "
+            f"WHERE {self.where} GROUP BY {expr} ORDER BY n DESC, {expr}"
+        )
+        df["n"] = df["n"].astype("int64")
+        return df
+
+    def day_counts(self, col):
+        df = self.query(
+            f"SELECT {_q(col)} AS {_q(col)}, COUNT(*) AS n FROM {self.table} "
+            f"WHERE {self.where} GROUP BY {_q(col)}"
+        )
+        # Få rader – parse og sorter i pandas (SQLite lagrer dato som tekst)
+        df[col] = parse_dates(df[col])
+        df["n"] = df["n"].astype("int64")
+        return (
+            df.dropna(subset=[col])
+              .groupby(col, as_index=False)["n"].sum()
+              .sort_values(col, ignore_index=True)
+        )
+
+
+class SqlSource:
+    """Én visning fra en SQL-tabell (SQLite eller Postgres).
+
+    Aggregatene regnes ut i databasen (SqlCounts). Til tabellvisningen hentes kun de
+    max_rows nyeste radene (sortert på dato der visningen har en).
+    """
+
+    def __init__(self, view, connect, table, max_rows=DEFAULT_MAX_ROWS):
+        self.view = view
+        self.views = (view,)
+        self.connect = connect          # () -> DBAPI-forbindelse eller SQLAlchemy-engine
+        self.table = table
+        self.max_rows = max_rows
+
+    def _query(self, con):
+        def run(sql):
+            with METRICS.time("rr_sql_seconds", view=self.view):
+                return pd.read_sql_query(sql, con)
+        return run
+
+    def fetch(self):
+        con = self.connect()
+        try:
+            query = self._query(con)
+            with METRICS.time("rr_stage_seconds", stage="aggregate_sql", view=self.view):
+                counts = SqlCounts(query, self.view, self.table)
+                aggregates = VIEW_AGGREGATES[self.view](counts)
+            cols = ", ".join(_q(c) for c in VIEW_COLUMNS[self.view])
+            date = DATE_COLUMNS.get(self.view)
+            order = f" ORDER BY {_q(date)} DESC" if date else ""
+            rows = query(
+                f"SELECT {cols} FROM {_q(self.table)} WHERE {view_where(self.view)}"
+                f"{order} LIMIT {int(self.max_rows)}"
+            )
+        finally:
+            close = getattr(con, "close", None) or getattr(con, "dispose", None)
+            if close is not None:
+                close()
+        return {"aggregates": aggregates, "values": frame_values(rows)}
+
+    def build(self, payload):
+        return {self.view: VIEW_BUILDERS[self.view](payload["values"])}
+
+    def fingerprint(self, payload):
+        agg = payload["aggregates"]
+        key = [(k, v.to_json() if isinstance(v, (pd.DataFrame, pd.Series)) else repr(v))
+               for k, v in sorted(agg.items())]
+        return repr((key, len(payload["values"]), payload["values"][-1:]))
+
+
+def sqlite_connect(path):
+    import sqlite3
+
+    return lambda: sqlite3.connect(path, timeout=30)
+
+
+def sqlalchemy_connect(url):
+    """Engine for Postgres o.l. (valgfri avhengighet: pip install sqlalchemy psycopg)."""
+    try:
+        from sqlalchemy import create_engine
+    except ImportError as e:
+        raise ImportError("SQL-kilder utenom SQLite krever 'sqlalchemy' (og en driver, "
+                          "f.eks. 'psycopg').") from e
+    engine = create_engine(url, pool_pre_ping=True)
+    return engine.connect
+
+
+# ----------------------------
+# Samlet kilde for snapshotet
+# ----------------------------
+class DataSources:
+    """Alle visningenes kilder bak SheetLoader-grensesnittet (fetch/build/fingerprint),
+       pluss aggregate(frames) som bruker databasens GROUP BY der den finnes.
+
+    fetch() returnerer {kilde-nr: rå verdier} – None når ingen kilde er endret.
+    En uendret kilde gjenbruker forrige verdier i et ellers nytt snapshot.
+    Feiler én kilde (manglende fil, database nede), blir unntaket dens verdi og
+    vises som feil i kildens visninger (som parse-feil i build_frames) – de andre
+    visningene oppdateres som vanlig. Bare når alle kildene feiler, feiler fetch.
+    Kildene hentes parallelt (maks max_workers samtidig), så en full oppfrisking tar
+    omtrent like lang tid som den tregeste kilden.
+    """
+
+    def __init__(self, sources, max_workers=4):
+        self.sources = list(sources)
+        self.max_workers = max_workers
+        self._pool = None
+        self._last = {}
+        self._pushed = {}               # visning → aggregater fra databasen (siste build)
+        self._aggregated = {}           # visning → (ramme, aggregater) fra forrige runde
+
+    @property
+    def views(self):
+        return [v for src in self.sources for v in src.views]
+
+    @staticmethod
+    def _fetch_one(src):
+        """src.fetch(), med feilen som verdi i stedet for unntak."""
+        try:
+            return src.fetch()
+        except Exception as e:
+            return e
+
+    def _fetch_all(self):
+        if len(self.sources) < 2:
+            return [self._fetch_one(src) for src in self.sources]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="source-fetch")
+        return list(self._pool.map(self._fetch_one, self.sources))
+
+    def fetch(self):
+        values, changed = {}, False
+        for i, (src, got) in enumerate(zip(self.sources, self._fetch_all())):
+            if got is None:
+                got = self._last.get(i)
+                if got is None:
+                    got = RuntimeError(f"Kilden for {', '.join(src.views)} har ingen data ennå.")
+            else:
+                changed = True
+            values[i] = got
+        errors = [v for v in values.values() if isinstance(v, Exception)]
+        if errors and len(errors) == len(values):
+            raise errors[0]             # ingenting nytt å vise – behold siste snapshot
+        self._last = values
+        return values if changed else None
+
+    def invalidate(self):
+        """Neste fetch henter alle kildene som kan hoppe over uendrede data (Sheets)."""
+        for src in self.sources:
+            if hasattr(src, "invalidate"):
+                src.invalidate()
+
+    def build(self, values):
+        frames, pushed = {}, {}
+        for i, src in enumerate(self.sources):
+            payload = values[i]
+            if isinstance(payload, Exception):
+                frames.update({v: payload for v in src.views})
+                continue
+            try:
+                frames.update(src.build(payload))
+            except Exception as e:
+                frames.update({v: e for v in src.views})
+            if isinstance(payload, dict) and "aggregates" in payload:
+                pushed[src.view] = payload["aggregates"]
+        self._pushed = pushed
+        return frames
+
+    def aggregate(self, frames):
+        """Aggregater per visning. Uendret ramme (samme objekt) gjenbruker forrige svar."""
+        out, todo = {}, {}
+        for view, frame in frames.items():
+            prev = self._aggregated.get(view)
+            if view in self._pushed:
+                out[view] = self._pushed[view]
+            elif prev is not None and prev[0] is frame:
+                out[view] = prev[1]
+            else:
+                todo[view] = frame
+        out.update(build_aggregates(todo))
+        self._aggregated = {v: (frames[v], out[v]) for v in frames}
+        return {v: out[v] for v in frames}
+
+    def fingerprint(self, values):
+        h = hashlib.blake2b(digest_size=16)
+        for i, src in enumerate(self.sources):
+            payload = values[i]
+            key = repr(payload) if isinstance(payload, Exception) else src.fingerprint(payload)
+            h.update(str(key).encode())
+        return h.hexdigest()
+
+
+def make_sources(config, worksheets, sheets_loader, max_workers=4):
+    """DataSources fra secrets-konfigurasjon.
+
+    config:        {visning: {"type": ..., ...}} (visninger uten oppføring → Sheets)
+    worksheets:    {visning: arkfane} for Sheets-visningene
+    sheets_loader: {visning: arkfane} -> SheetLoader (kalles kun hvis noe ligger i Sheets)
+    """
+    sources, on_sheets = [], {}
+    for view, ws in worksheets.items():
+        cfg = dict(config.get(view, {}))
+        kind = cfg.get("type", "sheets")
+        if kind not in SOURCE_TYPES:
+            raise ValueError(f"Ukjent datakilde for {view}: {kind!r} (gyldige: {SOURCE_TYPES})")
+        if kind == "sheets":
+            on_sheets[view] = cfg.get("worksheet", ws)
+        elif kind in ("csv", "excel"):
+            sources.append(FileSource(view, cfg["path"], kind=kind, sheet=cfg.get("sheet", 0)))
+        else:
+            connect = (sqlite_connect(cfg["path"]) if kind == "sqlite"
+                       else sqlalchemy_connect(cfg["url"]))
+            sources.append(SqlSource(
+                view, connect, cfg.get("table", view.lower()),
+                max_rows=int(cfg.get("max_rows", DEFAULT_MAX_ROWS)),
+            ))
+    if on_sheets:
+        sources.insert(0, SheetsSource(sheets_loader(on_sheets)))
+    return DataSources(sources, max_workers=max_workers)
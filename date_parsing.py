@@ -0,0 +1,80 @@
+"""
+Felles dato-parsing for Innlevert og Inhouse.
+
+Arkene blander norske datoer (dd.mm.yyyy), ISO-datoer (yyyy-mm-dd) og
+Excel-seriedatoer (dager siden 1899-12-30). Kolonnen faktoriseres først – et ark
+med år med historikk har bare noen tusen ulike datostrenger – og kun de unike
+verdiene parses, med eksplisitte formater (rask C-sti). Bare verdiene som ikke
+passer går videre til neste steg, og kun det som fortsatt står igjen får den
+trege "mixed"-parsingen. Resultatet spres tilbake til alle rader med take().
+
+Resultatet er datetime64 med dag-presisjon (normalisert til midnatt, enhet
+"s" – pandas støtter ikke [D] i Series), ikke object-kolonner med date-objekter.
+"""
+import numpy as np
+import pandas as pd
+
+EXCEL_ORIGIN = "1899-12-30"
+EXCEL_MAX = 2958465     # 31.12.9999 – større tall er ikke datoer (f.eks. telefonnr.)
+
+# Eksplisitte formater, vanligst først
+FAST_FORMATS = ("%d.%m.%Y", "%Y-%m-%d")
+
+DATE_DTYPE = "datetime64[s]"
+
+
+def _from_excel(nums):
+    """Excel-seriedatoer → datetime; NaN og tall utenfor 1..EXCEL_MAX blir NaT.
+       Kun gyldige tall sendes til to_datetime: pandas kan ellers kaste
+       FloatingPointError/OverflowError på NaN og store tall, også med errors="coerce"."""
+    nums = pd.Series(nums, copy=False)
+    ok = nums.between(1, EXCEL_MAX)
+    out = pd.Series(pd.NaT, index=nums.index, name=nums.name, dtype="datetime64[ns]")
+    if ok.any():
+        out[ok] = pd.to_datetime(nums[ok], unit="D", origin=EXCEL_ORIGIN)
+    return out
+
+
+def _finish(dates):
+    return dates.dt.normalize().astype(DATE_DTYPE)
+
+
+def _parse_text(txt):
+    """Parse unike, strippede strenger. Hvert steg kjøres kun på det som mangler dato."""
+    dates = pd.to_datetime(txt, format=FAST_FORMATS[0], errors="coerce")
+
+    rest = dates.isna() & (txt != "")
+    for fmt in FAST_FORMATS[1:]:
+        if not rest.any():
+            return dates
+        dates[rest] = pd.to_datetime(txt[rest], format=fmt, errors="coerce")
+        rest &= dates.isna()
+
+    if rest.any():
+        dates[rest] = _from_excel(pd.to_numeric(txt[rest], errors="coerce"))
+        rest &= dates.isna()
+
+    if rest.any():
+        dates[rest] = pd.to_datetime(txt[rest], errors="coerce", dayfirst=True, format="mixed")
+    return dates
+
+
+def parse_dates(s):
+    """Parse en kolonne med blandede datoer → datetime64 (dag), NaT der ingenting passer.
+
+    Rekkefølge: dd.mm.yyyy → yyyy-mm-dd → Excel-seriedato → dayfirst "mixed"-parsing.
+    """
+    s = pd.Series(s, copy=False)
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return _finish(s)
+    if pd.api.types.is_numeric_dtype(s):
+        return _finish(_from_excel(s))
+
+    codes, uniques = pd.factorize(s)
+    if len(uniques) == 0:
+        return pd.Series(pd.NaT, index=s.index, name=s.name, dtype=DATE_DTYPE)
+    parsed = _parse_text(pd.Series(uniques, dtype=object).astype(str).str.strip())
+    values = _finish(parsed).to_numpy()
+    out = values.take(codes, mode="clip")
+    out[codes < 0] = np.datetime64("NaT")
+    return pd.Series(out, index=s.index, name=s.name)
@@ -0,0 +1,337 @@
+"""
+Lokal, falsk Google Sheets-backend (ingen nettverk, ingen nøkler).
+
+Datakilden bak SheetLoader er et hvilket som helst objekt med samme lille
+grensesnitt som gspread bruker her:
+
+    client.open_by_key(sheet_id)  -> spreadsheet
+    spreadsheet.values_batch_get(ranges)  -> {"valueRanges": [{"values": [...]}, ...]}
+    spreadsheet.get_lastUpdateTime()      -> tidsstempel (endres ved skriving)
+    spreadsheet.worksheet(title)          -> arkfane med row_count, resize og batch_update
+    spreadsheet.values_batch_update(body) -> skriving av flere områder i ett kall
+                                             (brukes av bulk_import)
+
+FakeClient implementerer dette i minnet med syntetiske ark i valgfri størrelse
+(skitne datoer, Excel-seriedatoer, tomme rader) og simulert latens per kall.
+Feil som Sheets gir under last (429 Too Many Requests, 5xx) kan legges inn
+med fail() (de neste kallene, deterministisk) eller error_rate (tilfeldig andel
+av kallene). De kastes som gspread.exceptions.APIError med samme status og
+Retry-After som API-et, så api_call prøver dem på nytt som i produksjon.
+Brukes av benchmarks/, tests/ og kan velges i appen med data_source = "fake".
+"""
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import requests
+from gspread.exceptions import APIError
+
+BRANDS = ["Samsung", "Apple", "LG", "Sony", "Huawei", "Xiaomi", "OnePlus", "Motorola",
+          "Nokia", "Google", "Asus", "Lenovo", "Acer", "HP", "Dell", "Philips"]
+STATUSES = ["Venter på deler", "Under reparasjon", "Klar for henting", "Sendt til leverandør",
+            "Venter på kunde", "Diagnose", "Kvalitetskontroll"]
+TECHS = ["Ola Nordmann", "Kari Nordmann", "Per Hansen", "Anne Johansen", "Lars Olsen",
+         "Ingrid Larsen", "Nils Berg", "Sofie Dahl"]
+
+# Standard arkfaner (samme som appens standardverdier)
+DEFAULT_WORKSHEETS = {
+    "Reparert":  "Sheet1",
+    "Innlevert": "Sheet2",
+    "Inhouse":   "Sheet3",
+    "Arbeidet":  "Sheet5",
+}
+
+HEADERS = {
+    "Reparert":  ["Merke", "Tekniker"],
+    "Innlevert": ["Merke", "Innlevert"],
+    "Inhouse":   ["Merke", "Statustekst", "Statusdato"],
+    "Arbeidet":  ["Merker", "Status", "Tekniker"],
+}
+
+
+def synthetic_dates(rng, rows, start="2023-01-01", days=1000,
+                    iso=0.10, serial=0.08, dirty=0.02, blank=0.01):
+    """Datostrenger slik arkene faktisk ser ut: mest dd.mm.yyyy, resten ISO,
+       Excel-seriedatoer, skitne varianter (d.m.yyyy, mellomrom, tekst) og tomme."""
+    stamp = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, rows), unit="D")
+    out = np.asarray(stamp.strftime("%d.%m.%Y"), dtype=object)
+    kind = rng.choice(5, size=rows, p=[1 - iso - serial - dirty - blank, iso, serial, dirty, blank])
+    out[kind == 1] = np.asarray(stamp[kind == 1].strftime("%Y-%m-%d"), dtype=object)
+    out[kind == 2] = ((stamp[kind == 2] - pd.Timestamp("1899-12-30")).days).astype(str)
+    messy = np.flatnonzero(kind == 3)
+    for i, j in enumerate(messy):
+        d = stamp[j]
+        out[j] = (f" {d.day}.{d.month}.{d.year} ", f"{d.day}/{d.month}/{d.year}", "ukjent")[i % 3]
+    out[kind == 4] = ""
+    return list(out)
+
+
+def synthetic_workbook(rows, worksheets=None, seed=7, blank_rows=0.005, **date_mix):
+    """{arkfane: rå verdier (header + rader)} for alle fire visningene.
+       blank_rows: andel helt tomme rader (API-et returnerer dem som [])."""
+    worksheets = worksheets or DEFAULT_WORKSHEETS
+    rng = np.random.default_rng(seed)
+    brand = rng.choice(BRANDS, rows).tolist()
+    status = rng.choice(STATUSES, rows).tolist()
+    tech = rng.choice(TECHS, rows).tolist()
+    columns = {
+        "Reparert":  (brand, tech),
+        "Innlevert": (brand, synthetic_dates(rng, rows, **date_mix)),
+        "Inhouse":   (brand, status, synthetic_dates(rng, rows, **date_mix)),
+        "Arbeidet":  (brand, status, tech),
+    }
+    blank = set(np.flatnonzero(rng.random(rows) < blank_rows).tolist())
+    book = {}
+    for view, ws in worksheets.items():
+        body = [[] if i in blank else list(r) for i, r in enumerate(zip(*columns[view]))]
+        book[ws] = [list(HEADERS[view])] + body
+    return book
+
+
+_A1_ROWS = re.compile(r"^[A-Z]+(\d*)(?::[A-Z]+(\d*))?$")
+
+
+def _split_range(rng):
+    """"'Sheet1'!A5:Z" → ("Sheet1", 5, None); "'Sheet1'" → ("Sheet1", 1, None)."""
+    name, _, a1 = rng.partition("!")
+    if name.startswith("'") and name.endswith("'"):
+        name = name[1:-1].replace("''", "'")
+    if not a1:
+        return name, 1, None
+    m = _A1_ROWS.match(a1)
+    if m is None:
+        raise ValueError(f"Unsupported range: {rng}")
+    start = int(m.group(1) or 1)
+    end = int(m.group(2)) if m.group(2) else None
+    return name, start, end
+
+
+_REASONS = {429: "RESOURCE_EXHAUSTED", 500: "INTERNAL", 502: "BAD_GATEWAY",
+            503: "UNAVAILABLE", 504: "DEADLINE_EXCEEDED"}
+
+
+def api_error(status, retry_after=None):
+    """APIError slik gspread kaster den for et feilsvar fra Sheets (status 429, 5xx, …)."""
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({"error": {
+        "code": status, "message": f"Simulert feil {status}",
+        "status": _REASONS.get(status, "UNKNOWN"),
+    }}).encode()
+    if retry_after is not None:
+        response.headers["Retry-After"] = str(retry_after)
+    return APIError(response)
+
+
+def _trim_row(row):
+    row = list(row)
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+class FakeSpreadsheet:
+    """Ett regneark i minnet. latency = sekunder per API-kall (simulert), pluss
+       row_latency sekunder per returnerte rad (store ark tar lengre tid).
+       error_rate: andel kall som feiler med en tilfeldig status fra error_status."""
+
+    def __init__(self, book, latency=0.0, sheet_id="fake", row_latency=0.0,
+                 error_rate=0.0, error_status=(429, 503), seed=None):
+        self.id = sheet_id
+        self.book = book
+        self.latency = latency
+        self.row_latency = row_latency
+        self.error_rate = error_rate
+        self.error_status = tuple(error_status)
+        self.calls = 0
+        self.errors = 0
+        self._failures = []             # [(status, kall eller None, retry_after)]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._modified = datetime.now(timezone.utc)
+
+    def fail(self, status=429, times=1, calls=None, retry_after=None):
+        """La de neste `times` kallene (blant `calls`, f.eks. {"values_batch_get"};
+           None = alle) feile med `status` før de gjør noe."""
+        calls = None if calls is None else frozenset([calls] if isinstance(calls, str) else calls)
+        with self._lock:
+            self._failures.extend([(status, calls, retry_after)] * times)
+
+    def _injected(self, call):
+        """Feilen dette kallet skal få (eller None). Kalles under låsen."""
+        for i, (status, calls, retry_after) in enumerate(self._failures):
+            if calls is None or call in calls:
+                del self._failures[i]
+                return api_error(status, retry_after)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            return api_error(self._rng.choice(self.error_status))
+        return None
+
+    def _wait(self, call, rows=0):
+        with self._lock:
+            self.calls += 1
+            error = self._injected(call)
+            if error is not None:
+                self.errors += 1
+        if error is not None:
+            if self.latency:
+                time.sleep(self.latency)
+            raise error
+        delay = self.latency + rows * self.row_latency
+        if delay:
+            time.sleep(delay)
+
+    def values_batch_get(self, ranges, params=None):
+        out = []
+        for rng in ranges:
+            name, start, end = _split_range(rng)
+            values = self.book[name][start - 1:end]
+            # Som API-et: tomme celler på slutten og tomme rader på slutten utelates
+            values = [_trim_row(r) for r in values]
+            while values and not values[-1]:
+                values.pop()
+            out.append({"range": rng, "values": values})
+        self._wait("values_batch_get", sum(len(vr["values"]) for vr in out))
+        return {"valueRanges": out}
+
+    def get_lastUpdateTime(self):
+        self._wait("get_lastUpdateTime")
+        return self._modified.isoformat()
+
+    def append_rows(self, worksheet, rows):
+        """Legg til rader nederst (simulerer nye registreringer)."""
+        self.book[worksheet].extend(list(r) for r in rows)
+        self._modified = datetime.now(timezone.utc)
+
+    def worksheet(self, title):
+        self._wait("worksheet")
+        if title not in self.book:
+            raise KeyError(title)
+        return FakeWorksheet(self, title)
+
+    def values_batch_update(self, body):
+        """Skriv alle områdene i body["data"] – alt eller ingenting, som i API-et."""
+        self._wait("values_batch_update")
+        staged = {}
+        for item in body["data"]:
+            name, _, a1 = item["range"].partition("!")
+            name = name[1:-1].replace("''", "'") if name.startswith("'") else name
+            first = a1.partition(":")[0]
+            c0, r0 = _A1_CELL.match(first).groups()
+            values = staged.setdefault(name, [list(r) for r in self.book[name]])
+            r0, c0 = int(r0), _col_index(c0)
+            while len(values) < r0 - 1 + len(item["values"]):
+                values.append([])
+            for i, row in enumerate(item["values"]):
+                target = values[r0 - 1 + i]
+                target.extend([""] * (c0 - 1 + len(row) - len(target)))
+                target[c0 - 1:c0 - 1 + len(row)] = [str(v) for v in row]
+        with self._lock:
+            self.book.update(staged)    # ett oppslag per fane: lesere ser gammel eller ny
+            self._modified = datetime.now(timezone.utc)
+        return {"totalUpdatedRows": sum(len(d["values"]) for d in body["data"])}
+
+
+_A1_CELL = re.compile(r"^([A-Z]+)(\d+)$")
+
+
+def _col_index(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+class FakeWorksheet:
+    """Skrivbar arkfane i en FakeSpreadsheet (rutenett med fast størrelse som i Sheets)."""
+
+    def __init__(self, spreadsheet, title):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        values = spreadsheet.book[title]
+        self.row_count = max(len(values), 1000)
+        self.col_count = max((len(r) for r in values), default=0) or 26
+
+    @property
+    def _values(self):
+        return self.spreadsheet.book[self.title]
+
+    def fail(self, status=429, times=1, calls=("resize", "batch_update"), retry_after=None):
+        """Som FakeSpreadsheet.fail, men standard bare for skrivekallene på fanen."""
+        self.spreadsheet.fail(status, times, calls, retry_after)
+
+    def _touch(self, call):
+        self.spreadsheet._wait(call)
+        self.spreadsheet._modified = datetime.now(timezone.utc)
+
+    def resize(self, rows=None, cols=None):
+        self._touch("resize")
+        if rows is not None:
+            self.row_count = rows
+            del self._values[rows:]
+        if cols is not None:
+            self.col_count = cols
+            for row in self._values:
+                del row[cols:]
+
+    def batch_update(self, data, raw=True, **kwargs):
+        self._touch("batch_update")
+        for item in data:
+            first, _, last = item["range"].partition(":")
+            c0, r0 = _A1_CELL.match(first).groups()
+            r1 = int(_A1_CELL.match(last or first).group(2))
+            r0, c0 = int(r0), _col_index(c0)
+            if r1 > self.row_count:
+                raise ValueError(f"Range {item['range']} exceeds grid limits ({self.row_count} rows)")
+            values = self._values
+            while len(values) < r0 - 1 + len(item["values"]):
+                values.append([])
+            for i, row in enumerate(item["values"]):
+                target = values[r0 - 1 + i]
+                target.extend([""] * (c0 - 1 + len(row) - len(target)))
+                target[c0 - 1:c0 - 1 + len(row)] = [str(v) for v in row]
+        return {"totalUpdatedRows": sum(len(d["values"]) for d in data)}
+
+
+class FakeClient:
+    """Erstatning for gspread.Client: open_by_key gir samme FakeSpreadsheet.
+
+    per_key: hver nøkkel (butikk) får sitt eget syntetiske regneark, med frø fra
+             nøkkelen – så flere butikker har ulike, men stabile tall.
+    """
+
+    def __init__(self, book=None, rows=1000, latency=0.0, row_latency=0.0, per_key=False,
+                 error_rate=0.0, **kwargs):
+        self.spreadsheet = FakeSpreadsheet(
+            book if book is not None else synthetic_workbook(rows, **kwargs),
+            latency=latency, row_latency=row_latency, error_rate=error_rate,
+        )
+        self.per_key = per_key and book is None
+        self._make = dict(rows=rows, latency=latency, row_latency=row_latency,
+                          error_rate=error_rate, kwargs=kwargs)
+        self._sheets = {}
+        self._lock = threading.Lock()
+
+    def _for_key(self, key):
+        with self._lock:
+            sh = self._sheets.get(key)
+            if sh is None:
+                m = self._make
+                seed = zlib.crc32(str(key).encode())
+                sh = self._sheets[key] = FakeSpreadsheet(
+                    synthetic_workbook(m["rows"], seed=seed, **m["kwargs"]),
+                    latency=m["latency"], sheet_id=key, row_latency=m["row_latency"],
+                    error_rate=m["error_rate"],
+                )
+        return sh
+
+    def open_by_key(self, key):
+        sh = self._for_key(key) if self.per_key else self.spreadsheet
+        sh._wait("open_by_key")
+        return sh
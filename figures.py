@@ -0,0 +1,126 @@
+"""
+Prosess-felles cache for Plotly-figurer.
+
+Å bygge en px-figur (px.bar + update_traces/update_layout) koster ~80 ms, mens
+selve JSON-serialiseringen i st.plotly_chart koster ~4 ms. Figurene bygges derfor
+én gang per unike (diagramtype, spesifikasjon, innhold i aggregattabellen) og
+deles mellom alle sesjoner og rerun. Nøkkelen er innholdsbasert, så et nytt
+snapshot med like tall gir treff, mens endrede tall gir en ny figur.
+
+Figurene som returneres er DELTE og skal ikke endres av den som kaller.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from metrics import METRICS
+
+MARGIN = dict(l=10, r=10, t=30, b=10)
+
+
+def _px():
+    """plotly.express (~100 ms å importere) lastes først når den første figuren bygges –
+       ikke ved innlogging eller på sider uten grafer."""
+    import plotly.express as px
+    return px
+
+
+def frame_digest(df):
+    """Innholdshash for en (liten) aggregattabell: verdier, indeks, kolonner og dtyper."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def chart_key(kind, df, spec):
+    """Cache-nøkkel for en figur: diagramtype + spesifikasjon + tabellinnhold."""
+    return (kind, tuple(sorted(spec.items())), frame_digest(df))
+
+
+# ---- diagramtyper (samme utseende som visningene alltid har hatt) ----
+def _bar(df, x, y):
+    fig = _px().bar(df, x=x, y=y, text=y)
+    fig.update_traces(textposition="outside", cliponaxis=False)
+    fig.update_layout(margin=MARGIN, xaxis_tickangle=-35)
+    return fig
+
+
+def _stacked_bar(df, x, y, color):
+    fig = _px().bar(df, x=x, y=y, color=color)
+    fig.update_layout(margin=MARGIN, barmode="stack")
+    return fig
+
+
+def _line(df, x, y):
+    fig = _px().line(df, x=x, y=y, markers=True)
+    fig.update_layout(margin=MARGIN)
+    return fig
+
+
+def _multi_line(df, x, y, color):
+    fig = _px().line(df, x=x, y=y, color=color)
+    fig.update_layout(margin=MARGIN, legend_title_text="")
+    return fig
+
+
+def _pie(df, names, values):
+    fig = _px().pie(df, names=names, values=values, hole=0.6)
+    fig.update_traces(textinfo="percent+label")
+    fig.update_layout(showlegend=True, margin=MARGIN)
+    return fig
+
+
+CHART_BUILDERS = {
+    "bar":         _bar,
+    "stacked_bar": _stacked_bar,
+    "line":        _line,
+    "multi_line":  _multi_line,
+    "pie":         _pie,
+}
+
+
+class FigureCache:
+    """Trådsikker LRU-cache med ferdige figurer. Teller treff/bom og byggetid."""
+
+    def __init__(self, max_entries=128):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._figures = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.build_seconds = 0.0
+
+    def get(self, kind, df, view="-", **spec):
+        """Ferdig figur for `kind` (se CHART_BUILDERS) bygget fra df med gitt spesifikasjon.
+           view: visningen dataene kommer fra (metrikk-label, ikke del av cache-nøkkelen)."""
+        key = chart_key(kind, df, spec)
+        with self._lock:
+            fig = self._figures.get(key)
+            if fig is not None:
+                self._figures.move_to_end(key)
+                self.hits += 1
+                METRICS.inc("rr_cache_requests_total", cache="figures", result="hit")
+                return fig
+
+        # Bygg utenfor låsen; to samtidige bom gir i verste fall samme figur to ganger
+        t0 = time.perf_counter()
+        fig = CHART_BUILDERS[kind](df, **spec)
+        elapsed = time.perf_counter() - t0
+        METRICS.inc("rr_cache_requests_total", cache="figures", result="miss")
+        METRICS.observe("rr_stage_seconds", elapsed, stage="figure_build", view=view, chart=kind)
+
+        with self._lock:
+            self.misses += 1
+            self.build_seconds += elapsed
+            self._figures[key] = fig
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+        return fig
+
+    def __len__(self):
+        return len(self._figures)
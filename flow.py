@@ -0,0 +1,213 @@
+"""
+Flyt gjennom verkstedet: inntak (Innlevert), ferdig (Reparert) og beholdning
+(Inhouse) per dag og merke, med Little's lov (W = L / λ).
+
+Kildene kobles på heltallsnøkler: dag (dager siden 1970) × merkekode fra den
+felles ordboken sheet_data.BRANDS, så samme merke har samme kode i alle arkene
+og i arkivet. Hver kilde telles til en serie per nøkkel, og seriene kobles med
+én hash-join (pd.concat på indeksen) – ingen merge på tekstkolonner.
+
+  inntak      Innlevert-datoer
+  ferdig      repair_history-arkivet (tidligere dager) + dagens Reparert-ark
+  beholdning  dagens Inhouse-antall, regnet bakover med inntak − ferdig per dag
+
+En dag som ikke er arkivert har ukjent ferdig-tall (ikke 0). Bakover-regningen
+stopper derfor ved første hull i arkivet: bare de sammenhengende arkiverte
+dagene før i dag (+ i dag) er "dekket", og ferdig/beholdning/L/λ/W regnes kun
+over dem. L/λ/W vises først når minst MIN_COVERED_DAYS dager er dekket.
+
+Resultatet (FlowTables) er tette matriser dag × merke per snapshot; rapporter
+for et merkefilter er bare summer over kolonner.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from metrics import METRICS
+from sheet_data import BRANDS
+
+FLOW_DAYS = 90              # dager med serier (til og med i dag)
+LITTLE_DAYS = 30            # vindu for Little's lov
+MIN_COVERED_DAYS = 7        # dekkede dager før L/λ/W vises
+
+
+def _days(values):
+    """datetime64-verdier → heltall dager siden 1970 (NaT → None-maske)."""
+    d = np.asarray(values, dtype="datetime64[D]")
+    return d.astype(np.int64), ~np.isnat(d)
+
+
+def keyed_counts(days, codes, n_brands, weights=None):
+    """Antall (eller sum av weights) per nøkkel dag * n_brands + merkekode."""
+    keys = days * n_brands + codes
+    if weights is None:
+        return pd.Series(keys).value_counts()
+    return pd.Series(weights, index=keys).groupby(level=0).sum()
+
+
+@dataclass
+class FlowTables:
+    """Tette matriser [dag, merke] for vinduet first_day..first_day + len(days) - 1."""
+    days: pd.DatetimeIndex
+    brands: list
+    intake: np.ndarray
+    completed: np.ndarray
+    backlog: np.ndarray         # beholdning ved dagens slutt (estimert bakover fra i dag)
+    missing: tuple = ()         # kilder som ikke kunne leses
+    covered_from: int = 0       # første dekkede dag (indeks i days); før den er ferdig/beholdning ukjent
+
+    def report(self, brands=()):
+        """Daglige serier + Little's lov, totalt og per merke (valgfritt merkefilter).
+           Ferdig og beholdning er tomme (NaN) før covered_from; L/λ/W er None til
+           minst MIN_COVERED_DAYS dager er dekket."""
+        cols = [i for i, b in enumerate(self.brands) if not brands or b in brands]
+        cf = self.covered_from
+        inn = self.intake[:, cols]
+        done = self.completed[cf:, cols]
+        back = np.maximum(self.backlog[cf:, cols], 0)
+        unknown = np.full(cf, np.nan)
+
+        daily = pd.DataFrame({
+            "Dato": self.days,
+            "Inn": inn.sum(axis=1),
+            "Ferdig": np.concatenate([unknown, done.sum(axis=1)]),
+            "Beholdning": np.concatenate([unknown, back.sum(axis=1)]),
+        })
+        covered = len(self.days) - cf          # i dag er alltid dekket
+        enough = covered >= MIN_COVERED_DAYS
+        window = slice(-LITTLE_DAYS, None)      # innenfor de dekkede dagene
+        per_brand = pd.DataFrame({
+            "Merke": [self.brands[i] for i in cols],
+            "Inn": inn.sum(axis=0),
+            "Ferdig": done.sum(axis=0),
+            "Beholdning": back[-1],
+            "L": back[window].mean(axis=0).round(1) if enough else np.nan,
+            "λ per dag": done[window].mean(axis=0).round(2) if enough else np.nan,
+        })
+        per_brand["W dager"] = (per_brand["L"] / per_brand["λ per dag"].where(per_brand["λ per dag"] > 0)).round(1)
+        per_brand = per_brand[per_brand[["Inn", "Ferdig", "Beholdning"]].sum(axis=1) > 0]
+        per_brand = per_brand.sort_values("Beholdning", ascending=False, ignore_index=True)
+        per_brand.index = pd.RangeIndex(1, len(per_brand) + 1)
+
+        L = lam = None
+        if enough:
+            L = round(float(back[window].sum(axis=1).mean()), 1)
+            lam = round(float(done[window].sum(axis=1).mean()), 2)
+        return {
+            "daily": daily,
+            "series": daily.melt(id_vars="Dato", var_name="Serie", value_name="Antall"),
+            "per_brand": per_brand,
+            "L": L,
+            "lambda": lam,
+            "W": round(L / lam, 1) if lam else None,
+            "intake_rate": round(float(daily["Inn"].iloc[window].mean()), 2) if len(daily) else 0.0,
+            "covered": (self.days[cf].date(), self.days[-1].date()),
+            "covered_days": covered,
+            "little_days": min(covered, LITTLE_DAYS),
+            "missing": self.missing,
+        }
+
+
+def build_flow(frames, history, today, days=FLOW_DAYS):
+    """FlowTables fra snapshotets rammer ({visning: DataFrame/Exception}) og arkivet."""
+    first = np.datetime64(today, "D") - (days - 1)
+    first_day = int(first.astype(np.int64))
+    missing = []
+
+    def frame(view):
+        obj = frames.get(view)
+        if isinstance(obj, pd.DataFrame):
+            return obj
+        missing.append(view)
+        return None
+
+    inn, rep, inh = frame("Innlevert"), frame("Reparert"), frame("Inhouse")
+    # Alle merkene kodes med den felles ordboken (arkivet har merkene som tekst)
+    hist = history.query(pd.Timestamp(first).date(), today - timedelta(days=1))
+    archived = history.archived_days(pd.Timestamp(first).date(), today - timedelta(days=1))
+    codes = {
+        view: BRANDS.encode(df["Merke"]).cat.codes.to_numpy()
+        for view, df in (("Innlevert", inn), ("Reparert", rep), ("Inhouse", inh), ("Arkiv", hist))
+        if df is not None
+    }
+    n_brands = max(len(BRANDS), 1)
+    today_day = first_day + days - 1
+
+    series = {}
+    if inn is not None:
+        d, ok = _days(inn["Innlevert"])
+        ok &= (d >= first_day) & (codes["Innlevert"] >= 0)
+        series["Inn"] = keyed_counts(d[ok], codes["Innlevert"][ok], n_brands)
+    done = []
+    if not hist.empty:
+        d, ok = _days(hist["Dato"])
+        ok &= codes["Arkiv"] >= 0
+        done.append(keyed_counts(d[ok], codes["Arkiv"][ok], n_brands, hist["Antall"].to_numpy()[ok]))
+    if rep is not None:
+        c = codes["Reparert"]
+        c = c[c >= 0]
+        done.append(keyed_counts(np.full(len(c), today_day), c, n_brands))
+    if done:
+        series["Ferdig"] = pd.concat(done).groupby(level=0).sum()
+
+    # Hash-join på nøkkelen: én rad per (dag, merke) som finnes i minst én kilde
+    joined = pd.concat(series, axis=1).fillna(0) if series else pd.DataFrame()
+    intake = np.zeros((days, n_brands), dtype=np.int64)
+    completed = np.zeros((days, n_brands), dtype=np.int64)
+    if not joined.empty:
+        keys = joined.index.to_numpy()
+        row, col = keys // n_brands - first_day, keys % n_brands
+        ok = (row >= 0) & (row < days)
+        for name, target in (("Inn", intake), ("Ferdig", completed)):
+            if name in joined:
+                np.add.at(target, (row[ok], col[ok]), joined[name].to_numpy(dtype=np.int64)[ok])
+
+    # Dekket: i dag + sammenhengende arkiverte dager bakover fra i går. Uten dagens
+    # Reparert er heller ikke i går kjent (B[i går] trenger ferdig i dag).
+    covered_from = days - 1
+    if rep is not None:
+        while covered_from > 0 and (today - timedelta(days=days - covered_from)) in archived:
+            covered_from -= 1
+
+    # Beholdning: dagens Inhouse, og bakover: B[t-1] = B[t] − inn[t] + ferdig[t]
+    now = np.zeros(n_brands, dtype=np.int64)
+    if inh is not None:
+        c = codes["Inhouse"]
+        now = np.bincount(c[c >= 0], minlength=n_brands)
+    net = intake - completed
+    after = np.cumsum(net[::-1], axis=0)[::-1] - net     # sum av netto for dagene etter t
+    backlog = now - after
+
+    return FlowTables(
+        days=pd.date_range(pd.Timestamp(first), periods=days, freq="D"),
+        brands=[str(b) for b in BRANDS.dtype().categories[:n_brands]],
+        intake=intake,
+        completed=completed,
+        backlog=backlog,
+        missing=tuple(missing),
+        covered_from=covered_from,
+    )
+
+
+class FlowEngine:
+    """Siste FlowTables per (snapshot-generasjon, dag, arkivversjon). Trådsikker."""
+
+    def __init__(self, history):
+        self.history = history
+        self._lock = threading.Lock()
+        self._key = None
+        self._tables = None
+
+    def tables(self, snap, today):
+        key = (snap.generation, today, self.history.version)
+        with self._lock:
+            if key == self._key:
+                return self._tables
+        with METRICS.time("rr_stage_seconds", stage="flow", view="Oversikt"):
+            tables = build_flow(snap.frames, self.history, today)
+        with self._lock:
+            self._key, self._tables = key, tables
+        return tables
@@ -0,0 +1,163 @@
+"""
+Felles filter for visningene (periode, merke, tekniker, status) med indekser.
+
+Hver delt visningsramme får en FrameIndex første gang den filtreres:
+
+  - dato:       radposisjonene sortert på dato + de sorterte datoene, så en
+                periode er to searchsorted og ett utsnitt (ingen skann av rader)
+  - kategorier: Merke/Tekniker/Status er kategoriske; et valg blir en liten
+                oppslagstabell over kategoriene som indekseres med kodene
+
+Filtrene kombineres som bitmap-AND. Filtrerte aggregater regnes med de samme
+funksjonene som per snapshot (aggregates.VIEW_AGGREGATES) og caches per
+(ramme, visning, filter), så samme filter i flere sesjoner/fragmenter regnes én gang.
+Et filter som ikke gjelder en visning (f.eks. periode for "Arbeidet") ignoreres.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from aggregates import VIEW_AGGREGATES
+from data_sources import DATE_COLUMNS
+from metrics import METRICS
+
+# Filterfelt → kolonne i visningsrammene (periode → data_sources.DATE_COLUMNS)
+FILTER_COLUMNS = {"brands": "Merke", "techs": "Tekniker", "statuses": "Status"}
+
+MAX_ENTRIES = 64
+
+
+@dataclass(frozen=True)
+class Filters:
+    """Valgt filter. Tomme tupler/None betyr "alle"."""
+    start: object = None        # datetime.date (inklusiv)
+    end: object = None          # datetime.date (inklusiv)
+    brands: tuple = ()
+    techs: tuple = ()
+    statuses: tuple = ()
+
+    def active(self):
+        """Delene som er satt: "dates" og/eller kolonnenavn."""
+        out = {"dates"} if self.start or self.end else set()
+        return out | {col for f, col in FILTER_COLUMNS.items() if getattr(self, f)}
+
+    def for_view(self, view, columns):
+        """Bare delene av filteret som gjelder visningen (None = ingenting å filtrere)."""
+        date_col = DATE_COLUMNS.get(view)
+        parts = {
+            "dates": (self.start, self.end) if date_col in columns and (self.start or self.end) else None,
+            **{col: tuple(getattr(self, f)) for f, col in FILTER_COLUMNS.items()
+               if col in columns and getattr(self, f)},
+        }
+        parts = {k: v for k, v in parts.items() if v}
+        return tuple(sorted(parts.items())) or None
+
+
+def _lookup(s, values):
+    """Bool per rad: verdien i `values`. Kategorier slås opp på kodene."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        hit = np.append(s.cat.categories.isin(list(values)), False)   # kode -1 → False
+        return hit[s.cat.codes.to_numpy()]
+    return s.isin(list(values)).to_numpy()
+
+
+class FrameIndex:
+    """Sorterte datoindekser for én delt, skrivebeskyttet ramme."""
+
+    def __init__(self, df, date_col=None):
+        self.df = df
+        self.date_col = date_col if date_col in df.columns else None
+        self._lock = threading.Lock()
+        self._dates = None          # (sorterte datoer, radposisjoner i samme rekkefølge)
+
+    def _date_index(self):
+        with self._lock:
+            if self._dates is None:
+                values = self.df[self.date_col].to_numpy(dtype="datetime64[s]")
+                pos = np.flatnonzero(~np.isnat(values))
+                order = np.argsort(values[pos], kind="stable")
+                self._dates = (values[pos][order], pos[order])
+        return self._dates
+
+    def date_positions(self, start=None, end=None):
+        """Radposisjoner med dato i [start, end] (begge inklusive, None = åpen)."""
+        dates, pos = self._date_index()
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "s"), "left")
+        hi = len(dates) if end is None else np.searchsorted(
+            dates, np.datetime64(end + timedelta(days=1), "s"), "left"
+        )
+        return pos[lo:hi]
+
+    def mask(self, parts):
+        """Bitmap for Filters.for_view(...)-deler, eller None når ingenting filtreres."""
+        if not parts:
+            return None
+        mask = np.ones(len(self.df), dtype=bool)
+        for key, value in parts:
+            if key == "dates":
+                m = np.zeros(len(self.df), dtype=bool)
+                m[self.date_positions(*value)] = True
+            else:
+                m = _lookup(self.df[key], value)
+            mask &= m
+        return mask
+
+
+class _Lru:
+    """Liten trådsikker LRU. Verdiene holder rammen sin i live, så id(df) i nøkkelen
+       kan ikke gjenbrukes av en annen ramme mens oppføringen finnes."""
+
+    def __init__(self, name, max_entries=MAX_ENTRIES):
+        self.name = name
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, make):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+        METRICS.inc("rr_cache_requests_total", cache=self.name,
+                    result="miss" if value is None else "hit")
+        if value is None:
+            value = make()          # bygges utenfor låsen
+            with self._lock:
+                self._items[key] = value
+                while len(self._items) > self.max_entries:
+                    self._items.popitem(last=False)
+        return value
+
+
+_indexes = _Lru("frame_index", 16)
+_aggregates = _Lru("filtered_aggregates")
+
+
+def index_for(view, df):
+    """Delt FrameIndex per ramme-objekt."""
+    return _indexes.get((id(df), view), lambda: FrameIndex(df, DATE_COLUMNS.get(view)))
+
+
+def row_mask(view, df, filters):
+    """Bitmap over radene i df som matcher filteret, eller None (alle rader)."""
+    parts = filters.for_view(view, df.columns) if filters else None
+    return index_for(view, df).mask(parts) if parts else None
+
+
+def filtered_aggregates(view, df, filters, default=None):
+    """Visningens aggregater for radene som matcher filteret. Uten filter som gjelder
+       visningen returneres `default` (de ferdige aggregatene fra snapshotet)."""
+    parts = filters.for_view(view, df.columns) if filters else None
+    if not parts:
+        return default if default is not None else VIEW_AGGREGATES[view](df)
+
+    def make():
+        with METRICS.time("rr_stage_seconds", stage="filter", view=view):
+            rows = df.iloc[np.flatnonzero(index_for(view, df).mask(parts))]
+            return df, VIEW_AGGREGATES[view](rows)
+
+    return _aggregates.get((id(df), view, parts), make)[1]
@@ -0,0 +1,187 @@
+"""
+Prosess-felles måling av hot-path (tider, tellere) med Prometheus-endepunkt.
+
+Alle steg måles i samme registry: henting fra Sheets (antall kall + latens),
+parsing og aggregering per visning, figurbygging, innlogging, lesing og
+rendering per visning. Tider lagres som summary (antall, sum og de siste
+SAMPLE_SIZE målingene for p50/p95), tellere som vanlige counters.
+
+    with METRICS.time("rr_stage_seconds", stage="parse", view="Innlevert"):
+        ...
+    METRICS.inc("rr_cache_requests_total", cache="figures", result="hit")
+
+serve(port) starter en liten HTTP-tråd som svarer på /metrics i tekstformatet
+Prometheus forventer. Kun stdlib + numpy.
+"""
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+SAMPLE_SIZE = 1024          # siste N målinger per serie (for kvantiler)
+QUANTILES = (0.5, 0.95)
+
+HELP = {
+    "rr_stage_seconds":          "Tid per steg i lasting/rendering.",
+    "rr_sheets_api_seconds":     "Latens per kall mot Google Sheets/Drive.",
+    "rr_sheets_api_errors_total": "Feilede kall mot Google Sheets/Drive.",
+    "rr_sheets_api_retries_total": "Nye forsøk (backoff) mot Google Sheets/Drive.",
+    "rr_sheets_api_wait_seconds": "Ventetid på token og ledig plass i det felles API-budsjettet.",
+    "rr_sheets_api_coalesced_total": "Kall som delte et likt kall i flukt i stedet for å hente selv.",
+    "rr_sheets_api_throttled_total": "Kall som måtte vente på token (lesekvoten).",
+    "rr_sql_seconds":            "Latens per spørring mot SQL-kilder.",
+    "rr_cache_requests_total":   "Oppslag i cacher, fordelt på treff/bom.",
+    "rr_snapshot_refresh_total": "Oppfriskinger av snapshotet, fordelt på resultat.",
+}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class _Summary:
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=SAMPLE_SIZE)
+
+
+class Metrics:
+    """Trådsikkert register med summaries (tider) og counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._summaries = {}
+        self._counters = {}
+
+    # ---- registrering ----
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            s = self._summaries.get(key)
+            if s is None:
+                s = self._summaries[key] = _Summary()
+            s.count += 1
+            s.total += seconds
+            s.samples.append(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    @contextmanager
+    def time(self, name, **labels):
+        """Mål blokken – også når den avsluttes med unntak (f.eks. st.stop())."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0, **labels)
+
+    def timed(self, name, **labels):
+        """Dekoratør-variant av time()."""
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                with self.time(name, **labels):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    # ---- lesing ----
+    def summary_rows(self, name):
+        """[{labels..., count, p50_ms, p95_ms, total_s}] for én tidsserie, til admin-panelet."""
+        with self._lock:
+            items = [
+                (dict(k[1]), s.count, s.total, np.array(s.samples))
+                for k, s in self._summaries.items() if k[0] == name
+            ]
+        rows = []
+        for labels, count, total, samples in items:
+            p50, p95 = np.quantile(samples, QUANTILES) if len(samples) else (0.0, 0.0)
+            rows.append({
+                **labels,
+                "count": count,
+                "p50_ms": round(p50 * 1000, 1),
+                "p95_ms": round(p95 * 1000, 1),
+                "total_s": round(total, 2),
+            })
+        return rows
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(_key(name, labels), 0)
+
+    def exposition(self):
+        """Alle serier i Prometheus' tekstformat (0.0.4)."""
+        with self._lock:
+            summaries = [
+                (k, s.count, s.total, np.array(s.samples)) for k, s in self._summaries.items()
+            ]
+            counters = list(self._counters.items())
+
+        out = []
+        seen = set()
+
+        def header(name, kind):
+            if name not in seen:
+                seen.add(name)
+                out.append(f"# HELP {name} {HELP.get(name, name)}")
+                out.append(f"# TYPE {name} {kind}")
+
+        for (name, pairs), count, total, samples in sorted(summaries, key=lambda x: x[0]):
+            header(name, "summary")
+            if len(samples):
+                for q, v in zip(QUANTILES, np.quantile(samples, QUANTILES)):
+                    out.append(f"{name}{_labels(pairs, [('quantile', q)])} {v:.6f}")
+            out.append(f"{name}_sum{_labels(pairs)} {total:.6f}")
+            out.append(f"{name}_count{_labels(pairs)} {count}")
+        for (name, pairs), value in sorted(counters):
+            header(name, "counter")
+            out.append(f"{name}{_labels(pairs)} {value}")
+        return "\n".join(out) + "\n"
+
+
+METRICS = Metrics()
+
+
+def serve(port, host="127.0.0.1", registry=METRICS):
+    """Start /metrics på host:port i en daemon-tråd. Returnerer serveren."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.exposition().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):   # ingen støy i Streamlit-loggen
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,139 @@
+"""
+Historikk for "Reparert" (Sheet1), partisjonert per måned.
+
+Sheet1 viser bare dagens reparasjoner og nullstilles hver dag. Ved hvert
+oppfrisk arkiveres dagens antall per (Merke, Tekniker) under dagens dato –
+siste henting for en dag vinner. Hver måned er en egen tabell
+(reparert_YYYY_MM), så et datoområde leser kun månedene det overlapper.
+Hvilke dager som er arkivert (også dager uten reparasjoner) står i
+arkiverte_dager – en dag som mangler der er ukjent, ikke null.
+"""
+import os
+import sqlite3
+import threading
+from datetime import date
+
+import pandas as pd
+
+def _partition(d):
+    return f"reparert_{d.year:04d}_{d.month:02d}"
+
+
+def _months(start, end):
+    """Alle (år, måned) fra start til og med end."""
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        yield date(y, m, 1)
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+class RepairHistory:
+    """Månedspartisjonert SQLite-arkiv med daglige reparasjonstall."""
+
+    def __init__(self, path):
+        self.path = path
+        self.version = 0            # økes ved hver arkivering (cache-nøkkel)
+        self._lock = threading.Lock()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def archive(self, day, frame):
+        """Erstatt dagens partisjonsrader med antall per (Merke, Tekniker) fra frame.
+           Er tallene de samme som lagret (og dagen allerede arkivert), skrives ingenting
+           og version beholdes – cachene som bruker den som nøkkel forblir gyldige."""
+        counts = (
+            frame.groupby(["Merke", "Tekniker"], observed=True).size()
+                 .reset_index(name="Antall")
+        )
+        table = _partition(day)
+        rows = [
+            (day.isoformat(), str(b), str(t), int(n))
+            for b, t, n in counts.itertuples(index=False)
+        ]
+        with self._lock, self._connect() as con:
+            con.execute(
+                f'CREATE TABLE IF NOT EXISTS "{table}" ('
+                "Dato TEXT NOT NULL, Merke TEXT NOT NULL, Tekniker TEXT NOT NULL, "
+                "Antall INTEGER NOT NULL, PRIMARY KEY (Dato, Merke, Tekniker))"
+            )
+            con.execute("CREATE TABLE IF NOT EXISTS arkiverte_dager (Dato TEXT PRIMARY KEY)")
+            new_day = con.execute(
+                "INSERT OR IGNORE INTO arkiverte_dager VALUES (?)", (day.isoformat(),)
+            ).rowcount
+            stored = con.execute(
+                f'SELECT Dato, Merke, Tekniker, Antall FROM "{table}" WHERE Dato = ?',
+                (day.isoformat(),),
+            ).fetchall()
+            if set(stored) == set(rows):
+                if new_day:
+                    self.version += 1   # dekningen (flow.py) er endret, tallene ikke
+                return
+            con.execute(f'DELETE FROM "{table}" WHERE Dato = ?', (day.isoformat(),))
+            con.executemany(f'INSERT INTO "{table}" VALUES (?, ?, ?, ?)', rows)
+            self.version += 1
+
+    @staticmethod
+    def _parts(con, start, end):
+        """Partisjonstabellene som finnes for månedene start..end overlapper."""
+        existing = {
+            r[0] for r in con.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'reparert_%'"
+            )
+        }
+        return [t for t in map(_partition, _months(start, end)) if t in existing]
+
+    def archived_days(self, start, end):
+        """Datoene i start..end som er arkivert. Arkiv fra før arkiverte_dager fantes
+           telles via partisjonene (der mangler bare dager uten reparasjoner)."""
+        with self._connect() as con:
+            selects = [
+                f'SELECT Dato FROM "{t}" WHERE Dato BETWEEN ? AND ?'
+                for t in self._parts(con, start, end)
+            ]
+            if con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='arkiverte_dager'"
+            ).fetchone():
+                selects.append("SELECT Dato FROM arkiverte_dager WHERE Dato BETWEEN ? AND ?")
+            if not selects:
+                return set()
+            params = [start.isoformat(), end.isoformat()] * len(selects)
+            rows = con.execute(" UNION ".join(selects), params).fetchall()
+        return {date.fromisoformat(r[0]) for r in rows}
+
+    def query(self, start, end):
+        """Daglige rader (Dato, Merke, Tekniker, Antall) for start..end (inklusiv).
+           Leser kun partisjonene (månedene) området overlapper."""
+        with self._connect() as con:
+            parts = self._parts(con, start, end)
+            if not parts:
+                return pd.DataFrame(
+                    {"Dato": pd.Series(dtype="datetime64[s]"), "Merke": [], "Tekniker": [],
+                     "Antall": pd.Series(dtype="int64")}
+                )
+            sql = " UNION ALL ".join(
+                f'SELECT Dato, Merke, Tekniker, Antall FROM "{t}" WHERE Dato BETWEEN ? AND ?'
+                for t in parts
+            )
+            params = [start.isoformat(), end.isoformat()] * len(parts)
+            df = pd.read_sql_query(sql, con, params=params)
+        df["Dato"] = pd.to_datetime(df["Dato"]).astype("datetime64[s]")
+        return df
+
+
+def throughput(df, freq="D", by="Tekniker"):
+    """Antall reparasjoner per periode og per Tekniker/Merke.
+       freq: pandas period-frekvens – "D" (dag), "W" (uke, start mandag) eller "M" (måned).
+       Kolonner: Periode, <by>, Antall."""
+    if df.empty:
+        return pd.DataFrame(columns=["Periode", by, "Antall"])
+    period = df["Dato"].dt.to_period(freq).dt.start_time
+    return (
+        df.assign(Periode=period)
+          .groupby(["Periode", by])["Antall"].sum()
+          .reset_index()
+          .sort_values(["Periode", "Antall"], ascending=[True, False], ignore_index=True)
+    )
@@ -1,16 +1,17 @@
-
 import json
-from datetime import datetime
+import os
+import time
+from urllib.parse import urlencode
+from datetime import date, datetime, timedelta
 
-import pandas as pd
 import streamlit as st
-import plotly.express as px
-
-import gspread
-from google.oauth2.service_account import Credentials
 import streamlit_authenticator as stauth
-from streamlit_autorefresh import st_autorefresh
-import locale
+
+from metrics import METRICS, serve as serve_metrics
+from tenants import load_tenants, tenant_path
+
+# Start på denne kjøringen av skriptet (for tidsmåling av grafer per rerun)
+RUN_STARTED = time.perf_counter()
 NOR_MONTHS = [
     "januar", "februar", "mars", "april", "mai", "juni",
     "juli", "august", "september", "oktober", "november", "desember"
@@ -18,16 +19,8 @@ NOR_MONTHS = [
 
 def format_no_date(d):
     """Returner '3. oktober 2025' for en date/datetime (norsk, uten locale)."""
-    if d is None:
+    if d is None or d != d:         # None eller NaT/NaN (ulik seg selv)
         return "-"
-    # pandas NaT-sjekk
-    try:
-        import pandas as pd
-        if pd.isna(d):
-            return "-"
-    except Exception:
-        pass
-    from datetime import datetime, date
     if isinstance(d, datetime):
         d = d.date()
     day = d.day
@@ -35,6 +28,16 @@ def format_no_date(d):
     year = d.year
     return f"{day}. {month} {year}"
 
+
+def format_age(seconds):
+    """'3 min', '2 t 5 min', '1 d 4 t' – kort alder for statuslinjer."""
+    m = int(seconds // 60)
+    if m < 60:
+        return f"{m} min"
+    if m < 24 * 60:
+        return f"{m // 60} t {m % 60} min"
+    return f"{m // (24 * 60)} d {(m // 60) % 24} t"
+
   
 # ----------------------------
 # Page config
@@ -45,151 +48,28 @@ st.set_page_config(
     initial_sidebar_state="collapsed"   # <- VIKTIG
 )
 
-# --- Globalt design-tema (farger/typografi) ---
-ACCENT = "#e73f3f"  # samme som menyen
-st.markdown(f"""
-<style>
-:root {{
-  --accent: {ACCENT};
-  --text: #0f1115;
-  --muted: #6b7280;
-  --card-bg: rgba(255,255,255,0.04);
-  --card-bd: rgba(255,255,255,0.10);
-}}
-
-/* Global font/antialias */
-html, body, [data-testid="stAppViewContainer"] * {{
-  -webkit-font-smoothing: antialiased;
-  -moz-osx-font-smoothing: grayscale;
-  color: var(--text);
-}}
-
-/* Overskrifter */
-h1, h2, h3 {{
-  letter-spacing: .2px;
-  line-height: 1.15;
-}}
-
-/* Understrek (accent) på seksjons-overskrifter */
-.block-header {{
-  display:flex; align-items:center; gap:.6rem; margin: .25rem 0 1rem 0;
-}}
-.block-header .dot {{
-  width:10px; height:10px; border-radius:50%; background: var(--accent);
-  box-shadow: 0 0 0 4px rgba(231,63,63,.12);
-}}
-.block-header h2, .block-header h3 {{ margin:0; }}
-</style>
-""", unsafe_allow_html=True)
-
-
-# All CSS i ÉN blokk (IKKE fler st.markdown med <style> under)
-css = '''
-<style>
-/* ————— SLANK HEADER (la den være synlig slik at burgeren kan vises) ————— */
-header[data-testid="stHeader"]{
-  background: transparent;
-  height: 2rem;          /* tynn */
-  min-height: 2rem;
-}
-
-/* Ikke skjul toolbaren – la Streamlit håndtere den. */
-main .block-container{
-  padding-top: .2rem;
-  margin-top: -.6rem;    /* justér ved behov (mer negativt = mindre luft) */
-}
+# All CSS (tema, kort, KPI-er, meny) ligger i ÉN fil og injiseres én gang per kjøring
+CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "dashboard.css")
 
-/* Dato høyre */
-.date-right{ text-align:right; font-size:1rem; margin:0; padding-top:.2rem; }
 
-/* KPI-kort */
-div[data-testid="stMetric"]{
-  min-height:150px; height:150px;
-  display:flex; flex-direction:column; justify-content:center; align-items:center; text-align:center;
-  background:rgba(255,255,255,0.03); border:1px solid rgba(255,255,255,0.08);
-  border-radius:12px; padding:16px 18px; box-shadow:0 6px 16px rgba(0,0,0,.25);
-}
-div[data-testid="stMetricValue"]{ font-size:2.2rem; font-weight:700; text-align:center; width:100%; }
-div[data-testid="stMetricLabel"]{ font-size:.95rem; opacity:.9; text-align:center; width:100%; }
+@st.cache_resource(show_spinner=False)
+def page_css():
+    """Innholdet i assets/dashboard.css som <style>-blokk (leses fra disk én gang)."""
+    with open(CSS_PATH, encoding="utf-8") as fh:
+        return f"<style>\n{fh.read()}</style>"
 
-/* Cards for grafer/tabeller */
-.rr-card{
-  background:rgba(255,255,255,0.03); border:1px solid rgba(255,255,255,0.08);
-  border-radius:12px; padding:16px; box-shadow:0 6px 16px rgba(0,0,0,.25); margin-bottom:1rem;
-}
-.stPlotlyChart, .plotly, .js-plotly-plot{ background:transparent !important; }
-
-/* Slankere, moderne kort (flyttet INNI <style>) */
-.rr-card, [data-testid="stContainer"] > div:has(> .rr-card-inner) { 
-  background: var(--card-bg);
-  border: 1px solid var(--card-bd);
-  border-radius: 14px;
-  box-shadow: 0 8px 18px rgba(0,0,0,.18);
-  padding: 14px 16px;
-}
-.rr-card-inner { margin: 0; }
-</style>
-'''
-st.markdown(css, unsafe_allow_html=True)
 
+st.markdown(page_css(), unsafe_allow_html=True)
 
 
 # --- KONSTANTER (må komme før de brukes) ---
 TITLE = "Retail Repair Dashboard"
-BRAND_COLS = ["Merke", "Product brand", "Brand"]
-TECH_COLS  = ["Tekniker", "Service technician", "Technician"]
-
-# Felles kandidater (robust på kolonnenavn)
-BRAND_COLS = ["Merke", "Product brand", "Brand"]
-STATUS_COLS = ["Statustekst", "Status", "Repair status", "State"]
-DATE_COLS   = ["Statusdato", "Dato", "Innlevert", "Received date", "Date"]
-
-# Hvilke arkfaner (kan overstyres i secrets)
-WORKSHEET_REPARERT   = st.secrets.get("worksheet", "Sheet1")
-WORKSHEET_INNLEVERT  = st.secrets.get("worksheet_innlevert", "Sheet2")
-WORKSHEET_INHOUSE    = st.secrets.get("worksheet_inhouse", "Sheet3")  # NY
-WORKSHEET_ARBEIDET   = st.secrets.get("worksheet_arbeidet", "Sheet5")
-
-# Kompakt layout + kort-stil (uthev hver kolonne/boks)
-st.markdown("""
-<style>
-  /* KPI-bokser (st.metric) som "cards" + lik høyde og midtjustert innhold */
-  div[data-testid="stMetric"]{
-    background: rgba(255,255,255,0.03);     
-    border: 1px solid rgba(255,255,255,0.08);
-    border-radius: 12px;
-    padding: 16px 18px;
-    box-shadow: 0 6px 16px rgba(0,0,0,0.25);
-    min-height: 150px;            /* fast høyde */
-    height: 150px;                /* tving samme høyde */
-    display: flex;
-    flex-direction: column;
-    justify-content: center;      /* vertikalt sentrert */
-    align-items: center;          /* horisontalt sentrert */
-    text-align: center;
-  }
-
-  /* KPI-verdier (store tall) */
-  div[data-testid="stMetricValue"] { 
-    font-size: 2.2rem; 
-    font-weight: 700;
-    text-align: center;
-    width: 100%;
-  }
-
-  /* KPI-labels */
-  div[data-testid="stMetricLabel"] {
-    font-size: 0.95rem;
-    opacity: 0.9;
-    text-align: center;
-    width: 100%;
-  }
-</style>
-""", unsafe_allow_html=True)
+# Kolonnekandidatene (BRAND_COLS, TECH_COLS, …) ligger i sheet_data.py
 
+# Butikker med regneark, arkfaner og kilder (tenants.py). Uten [stores] i secrets
+# er det én butikk fra sheet_id/worksheet/worksheet_innlevert/… som før.
+TENANTS = load_tenants(st.secrets)
 
-# Auto-refresh every 5 minutes
-st_autorefresh(interval=5 * 60 * 1000, key="auto_refresh_5min")
 
 # ----------------------------
 # Authentication
@@ -210,8 +90,26 @@ authenticator = stauth.Authenticate(
     auth_cfg.get("cookie_expiry_days", 7),
 )
 
+# /metrics (Prometheus) på egen port – Streamlit-serveren kan ikke få egne ruter
+METRICS_PORT = int(st.secrets.get("metrics_port", 9464))   # 0 = av
+
+
+@st.cache_resource(show_spinner=False)
+def metrics_server():
+    """Start /metrics-endepunktet én gang per prosess (lokalt grensesnitt)."""
+    if not METRICS_PORT:
+        return None
+    try:
+        return serve_metrics(METRICS_PORT, host=st.secrets.get("metrics_host", "127.0.0.1"))
+    except OSError:
+        return None     # porten er opptatt (f.eks. to apper på samme maskin)
+
+
+metrics_server()
+
 # Vis skjema (ny API: login() returnerer ingenting, men setter session_state)
-authenticator.login(location="main", fields={"Form name": "Login"})
+with METRICS.time("rr_stage_seconds", stage="login"):
+    authenticator.login(location="main", fields={"Form name": "Login"})
 
 # Les status fra session_state
 auth_status = st.session_state.get("authentication_status", None)
@@ -225,16 +123,78 @@ elif auth_status is False:
     st.error("Invalid username/password")
     st.stop()
 # Hvis True, fortsetter appen videre
+role = credentials_dict["usernames"][username].get("role", "viewer")
+
+# ----------------------------
+# Tunge moduler – lastes først etter innlogging (innloggingssiden trenger ingen av
+# dem). gspread/google-auth lastes i gspread_client(), plotly ved første figur
+# (figures.py) og openpyxl ved import av Excel (bulk_import.py).
+# ----------------------------
+import pandas as pd
+
+# Delte snapshot-rammer: Copy-on-Write hindrer at avledede rammer endrer originalen
+pd.set_option("mode.copy_on_write", True)
+
+from sheet_data import ApiBudget, SheetLoader, api_call
+from snapshot_cache import SnapshotRefresher
+from snapshot_store import SnapshotStore, SyncStore
+from repair_history import RepairHistory, throughput
+from aging import AgingEngine
+from flow import LITTLE_DAYS, MIN_COVERED_DAYS, FlowEngine
+from figures import FigureCache
+from table_pages import PAGE_SIZES, pager_for
+from frame_filters import Filters, filtered_aggregates, row_mask
+from data_sources import VIEW_COLUMNS, make_sources
 
 # ----------------------------
 # Google Sheets helpers (+ støtte for Innlevert)
 # ----------------------------
 
-# Kolonnenavn som kan forekomme for dato i "Innlevert"
-DATE_COLS = ["Innlevert", "Received date", "Date"]
+def secret_bool(key, default):
+    """Boolsk secret: true/false (TOML), 1/0 eller tekst som "true"/"false", "ja"/"nei".
+       bool("false") er True, så tekst må tolkes eksplisitt."""
+    v = st.secrets.get(key, default)
+    if isinstance(v, str):
+        text = v.strip().lower()
+        if text in ("1", "true", "yes", "on", "ja"):
+            return True
+        if text in ("0", "false", "no", "off", "nei", ""):
+            return False
+        raise ValueError(f"Ugyldig verdi for {key}: {v!r} (forventet true/false)")
+    return bool(v)
+
+
+# "sheets" (Google) eller "fake" (syntetiske ark i minnet – demo/ytelsestest uten nøkler)
+DATA_SOURCE = st.secrets.get("data_source", "sheets")
+
+# Parallell henting: maks samtidige kall (delt HTTP-pool) og om hver arkfane skal
+# hentes i et eget kall (raskere ved store ark, men ett kall per fane mot kvoten –
+# derfor av som standard: én samlet values_batch_get per oppfrisking)
+FETCH_WORKERS = int(st.secrets.get("fetch_workers", 4))
+FETCH_SPLIT = secret_bool("fetch_split", False)
+
+# Felles budsjett for ALLE butikkene: maks samtidige kall mot Sheets/Drive
+# (prosessen deler kvoten til ett Google-prosjekt, uansett antall regneark)
+SHEETS_MAX_CONCURRENT = int(st.secrets.get("sheets_max_concurrent", FETCH_WORKERS))
+
+# Lesekvoten (per bruker/tjenestekonto per minutt) – token-bøtten holder oss under den.
+# 0 = ingen struping. burst = kall som kan gå med en gang før raten tar over.
+SHEETS_READS_PER_MINUTE = int(st.secrets.get("sheets_reads_per_minute", 60))
+SHEETS_BURST = int(st.secrets.get("sheets_burst", 10))
+
 
 @st.cache_resource(show_spinner=False)
+@METRICS.timed("rr_stage_seconds", stage="gspread_client")
 def gspread_client():
+    if DATA_SOURCE == "fake":
+        from fake_sheets import FakeClient
+        return FakeClient(
+            rows=int(st.secrets.get("fake_rows", 5000)),
+            latency=float(st.secrets.get("fake_latency", 0.3)),
+            error_rate=float(st.secrets.get("fake_error_rate", 0.0)),
+            worksheets=next(iter(TENANTS.values())).worksheets,
+            per_key=len(TENANTS) > 1,
+        )
     svc_raw = st.secrets.get("gcp_service_account")
     if isinstance(svc_raw, str):
         svc_info = json.loads(svc_raw)
@@ -244,169 +204,222 @@ def gspread_client():
         st.error("Missing gcp_service_account in secrets.")
         st.stop()
 
+    import gspread
+    from google.oauth2.service_account import Credentials
+    from requests.adapters import HTTPAdapter
+
     scopes = [
         "https://www.googleapis.com/auth/spreadsheets",
         "https://www.googleapis.com/auth/drive",
     ]
     creds = Credentials.from_service_account_info(svc_info, scopes=scopes)
-    return gspread.authorize(creds)
+    gc = gspread.authorize(creds)
+    # Gjenbruk TCP/TLS-tilkoblinger: én pool med plass til alle parallelle kall
+    # (budsjettet slipper aldri flere enn SHEETS_MAX_CONCURRENT samtidig)
+    session = getattr(getattr(gc, "http_client", None), "session", None)
+    if session is not None:
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(SHEETS_MAX_CONCURRENT, 1))
+        session.mount("https://", adapter)
+    return gc
+
+
+# Bakgrunnstråden sjekker Drive modifiedTime (billig) og henter kun ved endring
+REFRESH_SECONDS = int(st.secrets.get("refresh_seconds", 60))
+
+# Hvor ofte hver sesjon sjekker om snapshotet har ny versjon (kun i minnet)
+POLL_SECONDS = int(st.secrets.get("poll_seconds", 10))
+
+# Lokal kopi av siste vellykkede henting (rask oppstart + drift når Google er nede).
+# Med flere butikker ligger filene i en undermappe per butikk (tenants.tenant_path).
+SNAPSHOT_DB = st.secrets.get("snapshot_db", ".cache/snapshot.sqlite")
+
+# Daglig arkiv av Reparert (Sheet1 nullstilles hver dag), partisjonert per måned
+HISTORY_DB = st.secrets.get("history_db", ".cache/reparert_history.sqlite")
+
+# Innlevert er append-only: hent kun nye rader (full resynk ved endret header/krymping)
+INNLEVERT_INCREMENTAL = secret_bool("innlevert_incremental", True)
+
+
+# Alt under er per butikk: cache_resource-nøkkelen er butikknøkkelen, så hver butikk
+# har egen bakgrunnstråd, eget snapshot, arkiv, aldring og flyt.
+@st.cache_resource(show_spinner=False)
+def api_budget():
+    """Ett API-budsjett for hele prosessen, delt av alle butikkenes loadere: like kall i
+       flukt slås sammen, og lesekall strupes til kvoten (token-bøtte)."""
+    return ApiBudget(SHEETS_MAX_CONCURRENT, SHEETS_READS_PER_MINUTE or None, SHEETS_BURST)
+
+
+@st.cache_resource(show_spinner=False)
+def repair_history(tenant):
+    return RepairHistory(tenant_path(HISTORY_DB, tenant))
+
+
+@st.cache_resource(show_spinner=False)
+def flow_engine(tenant):
+    """Inntak/ferdig/beholdning per dag og merke (flow.py) – bygges per snapshot."""
+    return FlowEngine(repair_history(tenant))
+
+
+@st.cache_resource(show_spinner=False)
+def aging_engine(tenant):
+    """Aldring av Inhouse (aging.py) – telles i bakgrunnstråden ved nytt snapshot."""
+    return AgingEngine()
 
 
-@st.cache_data(ttl=300, show_spinner=False)  # 5 min cache – juster fritt
+@st.cache_resource(show_spinner=False)
+def snapshot_refresher(tenant):
+    """Én prosess-felles bakgrunnstråd per butikk som henter alle kildene (Sheets: open_by_key
+       én gang + parallelle values_batch_get), bygger visningenes DataFrames og bytter inn nytt snapshot."""
+    cfg = TENANTS[tenant]
+
+    synced = {}                         # append-only-visninger: {visning: arkfane}
+
+    def sheets_loader(worksheets):
+        loader = SheetLoader(
+            gspread_client(),
+            cfg.sheet_id,
+            worksheets,
+            append_only=("Innlevert",) if INNLEVERT_INCREMENTAL and "Innlevert" in worksheets else (),
+            split=FETCH_SPLIT,
+            max_workers=FETCH_WORKERS,
+            budget=api_budget(),
+            sync_store=SyncStore(tenant_path(SNAPSHOT_DB, tenant)),   # Innlevert-rader, samme fil
+        )
+        synced.update({view: sync.worksheet for view, sync in loader.syncs.items()})
+        return loader
+
+    sources = make_sources(cfg.sources, cfg.worksheets, sheets_loader, max_workers=FETCH_WORKERS)
+    store = SnapshotStore(tenant_path(SNAPSHOT_DB, tenant), synced=synced)   # synced: bygges fra SyncStore
+    history = repair_history(tenant)
+    aging = aging_engine(tenant)
+    flows = flow_engine(tenant)
+
+    def on_refresh(snap):
+        store.save(snap)
+        frame = snap.frames.get("Reparert")
+        if isinstance(frame, pd.DataFrame):
+            history.archive(datetime.fromtimestamp(snap.fetched_at).date(), frame)
+        inhouse = snap.frames.get("Inhouse")
+        if isinstance(inhouse, pd.DataFrame):
+            aging.update(inhouse)       # inn/ut måles mellom snapshots, ikke mellom visninger
+        flows.tables(snap, datetime.now().date())   # etter arkivering (ferdig i dag)
+
+    refresher = SnapshotRefresher(
+        fetch=sources.fetch,
+        build=sources.build,
+        aggregate=sources.aggregate,
+        fingerprint=sources.fingerprint,
+        on_refresh=on_refresh,
+        invalidate=sources.invalidate,
+        interval=REFRESH_SECONDS,
+        name=f"snapshot-refresher-{tenant}",
+    )
+    try:
+        saved = store.load()
+    except Exception:
+        saved = None    # ødelagt/inkompatibel kopi – hent på nytt
+    if saved is not None:
+        refresher.seed(*saved)   # vis lagret kopi med en gang
+    return refresher.start()
+
+
+@st.cache_resource(show_spinner=False)
+def start_refreshers():
+    """Start alle butikkenes bakgrunnstråder med en gang (én gang per prosess): de laster
+       samtidig, og API-budsjettet holder antall kall mot Google nede."""
+    return {key: snapshot_refresher(key) for key in TENANTS}
+
+
+def read_snapshot(tenant=None):
+    """Siste ferdige snapshot for butikken (standard: valgt butikk). O(1); blokkerer kun
+       ved aller første lasting."""
+    return snapshot_refresher(tenant or TENANT.key).current()
+
+
+# Rammene er DELT mellom alle sesjoner (ingen pickle/kopi) – skal aldri muteres.
+# Copy-on-Write er slått på øverst, så avledede rammer kan ikke endre originalen.
+@METRICS.timed("rr_stage_seconds", stage="read", view="Reparert")
 def read_df():
-    """Les data for 'Reparert' fra worksheet WORKSHEET_REPARERT (default Sheet1)."""
-    gc = gspread_client()
-    sh = gc.open_by_key(st.secrets.get("sheet_id"))
-    ws = sh.worksheet(WORKSHEET_REPARERT)
-    rows = ws.get_all_records()
-    if not rows:
-        return pd.DataFrame(columns=["Merke", "Tekniker"])
-    return pd.DataFrame(rows)
+    """Les data for 'Reparert' fra butikkens arkfane (worksheet, default Sheet1)."""
+    return read_snapshot().frame("Reparert")
 
 
-@st.cache_data(ttl=300, show_spinner=False)
+@METRICS.timed("rr_stage_seconds", stage="read", view="Innlevert")
 def read_df_innlevert():
-    """Les 'Innlevert' fra WORKSHEET_INNLEVERT (default Sheet2)."""
-    gc = gspread_client()
-    sh = gc.open_by_key(st.secrets.get("sheet_id"))
-    ws = sh.worksheet(WORKSHEET_INNLEVERT)
-    rows = ws.get_all_records()
-    if not rows:
-        return pd.DataFrame(columns=["Merke", "Innlevert"])
-
-    df = pd.DataFrame(rows)
-
-    # Finn aktuelle kolonner
-    def pick(cands, df_):
-        for c in cands:
-            if c in df_.columns:
-                return c
-        return None
-
-    bcol = pick(BRAND_COLS, df) or "Merke"
-    dcol = pick(DATE_COLS,  df) or "Innlevert"
-
-    # Rens og robust dato-parsing
-    df[bcol] = df[bcol].astype(str).str.strip()
-    dates = pd.to_datetime(df[dcol], errors="coerce", dayfirst=True, infer_datetime_format=True)
-    needs_excel = dates.isna()
-    if needs_excel.any():
-        as_num = pd.to_numeric(df.loc[needs_excel, dcol], errors="coerce")
-        conv = pd.to_datetime(as_num, errors="coerce", unit="D", origin="1899-12-30")
-        dates.loc[needs_excel] = conv
-    df[dcol] = dates.dt.date
-
-    df = df[(df[bcol] != "") & df[dcol].notna()]
-    out = df[[bcol, dcol]].copy()
-    out.columns = ["Merke", "Innlevert"]
-    return out
+    """Les 'Innlevert' fra butikkens arkfane (worksheet_innlevert, default Sheet2)."""
+    return read_snapshot().frame("Innlevert")
 
 
-@st.cache_data(ttl=300, show_spinner=False)
+@METRICS.timed("rr_stage_seconds", stage="read", view="Inhouse")
 def read_df_inhouse():
-    """Les 'Inhouse' fra WORKSHEET_INHOUSE.
+    """Les 'Inhouse' fra butikkens arkfane (worksheet_inhouse, default Sheet3).
        Forventer A=Merke, B=Statustekst, C=Statusdato (tekst eller Excel-seriedato)."""
-    gc = gspread_client()
-    sh = gc.open_by_key(st.secrets.get("sheet_id"))
-    ws = sh.worksheet(WORKSHEET_INHOUSE)
-    rows = ws.get_all_records()
-    if not rows:
-        return pd.DataFrame(columns=["Merke", "Status", "Dato"])
-
-    df = pd.DataFrame(rows)
-
-    # Case-insensitive plukking av kolonner
-    colmap = {c.lower().strip(): c for c in df.columns}
-
-    def pick_casefold(cands):
-        for cand in cands:
-            real = colmap.get(cand.lower())
-            if real:
-                return real
-        return None
+    return read_snapshot().frame("Inhouse")
 
-    brand_col  = pick_casefold(["Merke", "Product brand", "Brand"])
-    status_col = pick_casefold(["Statustekst", "Status", "Repair status", "State"])
-    date_col   = pick_casefold(["Statusdato", "Dato", "Innlevert", "Received date", "Date"])
-
-    # Snill feilmelding hvis noe mangler
-    missing = []
-    if brand_col is None:  missing.append("Merke")
-    if status_col is None: missing.append("Statustekst")
-    if date_col is None:   missing.append("Statusdato")
-    if missing:
-        raise KeyError(", ".join(missing))
-
-    # Rens / normaliser
-    df[brand_col]  = df[brand_col].astype(str).str.strip()
-    df[status_col] = df[status_col].astype(str).str.strip()
-
-    # Robust dato-parsing
-    dates = pd.to_datetime(df[date_col], errors="coerce", dayfirst=True, infer_datetime_format=True)
-    needs_excel = dates.isna()
-    if needs_excel.any():
-        as_num = pd.to_numeric(df.loc[needs_excel, date_col], errors="coerce")
-        conv = pd.to_datetime(as_num, errors="coerce", unit="D", origin="1899-12-30")
-        dates.loc[needs_excel] = conv
-    df[date_col] = dates.dt.date
-
-    df = df[(df[brand_col] != "") & (df[status_col] != "") & df[date_col].notna()].copy()
-
-    # Standardiser ut-kolonner
-    out = df[[brand_col, status_col, date_col]].copy()
-    out.columns = ["Merke", "Status", "Dato"]
-    return out
-    
-@st.cache_data(ttl=300, show_spinner=False)
+
+@METRICS.timed("rr_stage_seconds", stage="read", view="Arbeidet")
 def read_df_arbeidet():
-    """
-    Leser dagens arbeid fra WORKSHEET_ARBEIDET (Sheet5).
-    Forventer minst tre kolonner (variasjoner håndteres case-insensitivt):
-      - Merker  (f.eks 'Merker', 'Merke', 'Brand')
-      - Status  (f.eks 'Statusteks', 'Statustekst', 'Status')
-      - Tekniker (f.eks 'Tekniker', 'Technician', 'Service technician')
-    Returnerer alltid kolonnene: Merke, Status, Tekniker
-    """
-    gc = gspread_client()
-    sh = gc.open_by_key(st.secrets.get("sheet_id"))
-    ws = sh.worksheet(WORKSHEET_ARBEIDET)
-
-    values = ws.get_all_values()
-    if not values or len(values) < 2:
-        return pd.DataFrame(columns=["Merke", "Status", "Tekniker"])
-
-    header = [h.strip() for h in values[0]]
-    rows = values[1:]
-    df = pd.DataFrame(rows, columns=header)
-
-    # Case-insensitive mapping
-    colmap = {c.lower().strip(): c for c in df.columns}
-
-    def pick_casefold(cands):
-        for cand in cands:
-            real = colmap.get(cand.lower())
-            if real:
-                return real
-        return None
+    """Leser dagens arbeid fra butikkens arkfane (worksheet_arbeidet, default Sheet5).
+       Returnerer alltid kolonnene: Merke, Status, Tekniker"""
+    return read_snapshot().frame("Arbeidet")
+
 
-    brand_col = pick_casefold(["Merker", "Merke", "Brand"])
-    status_col = pick_casefold(["Statusteks", "Statustekst", "Status"])
-    tech_col = pick_casefold(["Tekniker", "Technician", "Service technician"])
+@st.cache_data(show_spinner=False, max_entries=64)
+def read_history(tenant, start, end, freq, by, version):
+    """Reparasjoner per periode fra butikkens arkiv. `version` gjør at cachen følger nye arkiveringer."""
+    return throughput(repair_history(tenant).query(start, end), freq=freq, by=by)
 
-    if brand_col is None or status_col is None or tech_col is None:
-        # Returner tomt i riktig format (unngå krasj i UI)
-        return pd.DataFrame(columns=["Merke", "Status", "Tekniker"])
 
-    # Rens litt
-    df[brand_col] = df[brand_col].astype(str).str.strip()
-    df[status_col] = df[status_col].astype(str).str.strip()
-    df[tech_col] = df[tech_col].astype(str).str.strip()
+def read_aggregates(view):
+    """Ferdige tall/telletabeller for en visning – beregnet én gang per snapshot."""
+    return read_snapshot().aggregate(view)
+
+
+@st.cache_resource(show_spinner=False)
+def figure_cache():
+    """Prosess-felles figurcache (nøkkel = innhold i aggregattabellen + diagramtype)."""
+    return FigureCache()
+
 
-    out = df[[brand_col, status_col, tech_col]].copy()
-    out.columns = ["Merke", "Status", "Tekniker"]
-    # Filtrer bort helt blanke rader
-    out = out[(out["Merke"] != "") | (out["Status"] != "") | (out["Tekniker"] != "")]
-    return out.reset_index(drop=True)
+# Tid brukt på grafer i DENNE kjøringen (bygging/oppslag + st.plotly_chart)
+run_timing = {"figures": 0.0, "charts": 0}
+
+
+def chart(kind, df, data_view, height="content", **spec):
+    """Vis en delt, ferdig bygget figur (se figures.py) og mål tiden det tar.
+       data_view: visningen dataene kommer fra (metrikk-label, ikke siden som vises)."""
+    t0 = time.perf_counter()
+    st.plotly_chart(figure_cache().get(kind, df, view=data_view, **spec),
+                    use_container_width=True, height=height)
+    run_timing["figures"] += time.perf_counter() - t0
+    run_timing["charts"] += 1
+
+
+def show_run_timing():
+    """Admin: hvor stor del av denne kjøringen som gikk med til grafer, og p50/p95
+       per steg for hele prosessen (samme tall som /metrics)."""
+    total = time.perf_counter() - RUN_STARTED
+    METRICS.observe("rr_stage_seconds", total, stage="rerun", view=view)
+    if role != "admin":
+        return
+    figs = run_timing["figures"]
+    cache = figure_cache()
+    st.sidebar.caption(
+        f"Grafer: {figs * 1000:.0f} ms av {total * 1000:.0f} ms "
+        f"({figs / total:.0%}) · {run_timing['charts']} figurer · "
+        f"cache {cache.hits} treff / {cache.misses} bygget"
+    )
+    with st.sidebar.expander("Ytelse (p50/p95)", expanded=False):
+        stages = pd.DataFrame(METRICS.summary_rows("rr_stage_seconds"))
+        api = pd.DataFrame(METRICS.summary_rows("rr_sheets_api_seconds"))
+        if not stages.empty:
+            st.dataframe(stages.sort_values("p95_ms", ascending=False), hide_index=True)
+        if not api.empty:
+            budget = api_budget()
+            st.caption(f"Sheets API · {budget.coalesced} sammenslått · {budget.throttled} strupet")
+            st.dataframe(api, hide_index=True)
+        if METRICS_PORT:
+            st.caption(f"Prometheus: http://localhost:{METRICS_PORT}/metrics")
 
 
 # ----------------------------
@@ -418,43 +431,57 @@ view = qp.get("view") or "Reparert"
 if isinstance(view, list):
     view = view[0]
 
+# Alle butikkene lastes i bakgrunnen fra første kjøring (også for "Alle butikker")
+start_refreshers()
+
+
+def tenant_picker():
+    """Valgt butikk (?butikk=, lagret i URL-en). Velgeren vises bare med flere butikker."""
+    if len(TENANTS) == 1:
+        return next(iter(TENANTS.values()))
+    key = st.sidebar.selectbox(
+        "Butikk", list(TENANTS), format_func=lambda k: TENANTS[k].name,
+        key="butikk", bind="query-params",
+    )
+    return TENANTS[key]
+
+
+TENANT = tenant_picker()
+
+# Filterlinjen lagres i URL-en (bind="query-params"); lenkene tar den med videre
+FILTER_KEYS = ("periode", "datoer", "merke", "tekniker", "status")
+NAV_QUERY = urlencode([(k, v) for k in FILTER_KEYS for v in qp.get_all(k)])
+
+
+def view_href(v, tenant=None):
+    """Lenke til en visning med gjeldende (eller angitt) butikk og filter."""
+    query = [("view", v)]
+    if len(TENANTS) > 1:
+        query.append(("butikk", tenant or TENANT.key))
+    return "?" + urlencode(query) + (f"&{NAV_QUERY}" if NAV_QUERY else "")
+
+
+# "Alle butikker" (sum på tvers) i menyen når det finnes mer enn én butikk
+ROLLUP_ITEM = f"""
+  <a href="{view_href('Butikker')}" target="_self" class="menu-item{' active' if view=='Butikker' else ''}">
+    <span class="emoji">🏬</span> Alle butikker
+  </a>""" if len(TENANTS) > 1 else ""
+
 st.sidebar.markdown(f"""
-<style>
-.sidebar-menu {{
-  font-family: 'Inter', system-ui, -apple-system, Segoe UI, Roboto, Arial, sans-serif;
-  margin-top: 6px;
-}}
-.sidebar-menu .menu-item {{
-  display: flex; align-items: center; gap: 10px;
-  color: #111 !important; text-decoration: none;
-  padding: 10px 14px; border-radius: 10px;
-  transition: all .18s ease-in-out;
-}}
-.sidebar-menu .menu-item:hover {{
-  background: rgba(0,0,0,0.07);
-  color: #000 !important;
-}}
-.sidebar-menu .menu-item.active {{
-  background: #e73f3f;
-  color: #000 !important;
-  box-shadow: 0 6px 16px rgba(231,63,63,.35);
-}}
-.sidebar-menu .emoji {{
-  width: 20px; display: inline-flex; justify-content: center;
-}}
-</style>
-
-<div class="sidebar-menu">
-  <a href="?view=Reparert"  target="_self" class="menu-item{' active' if view=='Reparert'  else ''}">
+<div class="sidebar-menu">{ROLLUP_ITEM}
+  <a href="{view_href('Oversikt')}"  target="_self" class="menu-item{' active' if view=='Oversikt'  else ''}">
+    <span class="emoji">📊</span> Oversikt
+  </a>
+  <a href="{view_href('Reparert')}"  target="_self" class="menu-item{' active' if view=='Reparert'  else ''}">
     <span class="emoji">🧰</span> Reparert
   </a>
-  <a href="?view=Innlevert" target="_self" class="menu-item{' active' if view=='Innlevert' else ''}">
+  <a href="{view_href('Innlevert')}" target="_self" class="menu-item{' active' if view=='Innlevert' else ''}">
     <span class="emoji">📦</span> Innlevert
   </a>
-  <a href="?view=Inhouse"   target="_self" class="menu-item{' active' if view=='Inhouse'   else ''}">
+  <a href="{view_href('Inhouse')}"   target="_self" class="menu-item{' active' if view=='Inhouse'   else ''}">
     <span class="emoji">🏠</span> Inhouse
   </a>
-    <a href="?view=Arbeidet" target="_self" class="menu-item{' active' if view=='Arbeidet' else ''}">
+    <a href="{view_href('Arbeidet')}" target="_self" class="menu-item{' active' if view=='Arbeidet' else ''}">
     <span class="emoji">🛠️</span> Arbeidet på
   </a>
 </div>
@@ -463,12 +490,16 @@ st.sidebar.markdown(f"""
 
 # Header (tittel venstre, dato høyre)
 VIEW_TITLES = {
+    "Butikker":  "Alle butikker",
+    "Oversikt":  "Oversikt",
     "Reparert":  "Reparert",
     "Innlevert": "Innlevert",
     "Inhouse":   "Inhouse",
     "Arbeidet":  "Arbeidet på",
 }
 page_h1 = VIEW_TITLES.get(view, TITLE)  # faller tilbake til global TITLE om noe er ukjent
+if len(TENANTS) > 1 and view != "Butikker":
+    page_h1 += f" · {TENANT.name}"
 
 h_left, h_right = st.columns([6, 1])
 with h_left:
@@ -479,76 +510,356 @@ with h_right:
         unsafe_allow_html=True
     )
 
+# ----------------------------
+# Endringsstyrt oppdatering (erstatter fast 5-min autorefresh)
+# ----------------------------
+def view_tenants():
+    """Butikkene siden viser: alle i "Alle butikker", ellers den valgte."""
+    return list(TENANTS) if view == "Butikker" else [TENANT.key]
+
+
+def data_version():
+    """(generasjoner, dato) – siden må bygges på nytt når én av dem endres."""
+    snaps = [snapshot_refresher(key).peek() for key in view_tenants()]
+    return (tuple(s.generation if s else None for s in snaps), datetime.now().date())
+
+
+# Versjonen denne kjøringen av siden bygges fra
+st.session_state["rendered_version"] = data_version()
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def data_status():
+    """Eneste fragment som poller: kjører alene hvert POLL_SECONDS (ingen nettverk, ingen
+       grafer) og rerunner siden kun ved ny generasjon eller ny dato. KPI-er og grafer
+       poller ikke selv – uendrede data sendes ikke til nettleseren på nytt.
+       (st.rerun(scope="fragment") kan bare kjøre fragmentet som kaller den, og et
+       fragment som hopper over tegningen mister innholdet sitt – derfor hele siden.)"""
+    if data_version() != st.session_state.get("rendered_version"):
+        st.rerun()
+
+    snaps = [s for s in (snapshot_refresher(key).peek() for key in view_tenants()) if s]
+    if not snaps:
+        return
+    snap = max(snaps, key=lambda s: s.age)     # eldste data bestemmer varselet
+    stamp = datetime.fromtimestamp(snap.fetched_at)
+    if snap.source == "disk" or snap.age > 2 * REFRESH_SECONDS + 60:
+        st.warning(
+            f"Viser lagret kopi fra {stamp:%d.%m %H:%M} ({format_age(snap.age)} gammel) – "
+            "henter ferske data i bakgrunnen."
+        )
+    else:
+        st.caption(f"Data sjekket {stamp:%H:%M} · v{snap.generation}")
+
+
+# Datastatus i sidebar (feil vises i selve visningen)
+with st.sidebar:
+    data_status()
+
+
+# ----------------------------
+# Filterlinje (felles for alle visninger – se frame_filters.py)
+# ----------------------------
+# Periode → antall dager bakover fra i dag (None = alle, "custom" = egendefinert)
+PERIODS = {
+    "Alle datoer":    None,
+    "I dag":          0,
+    "Siste 7 dager":  6,
+    "Siste 30 dager": 29,
+    "Egendefinert":   "custom",
+}
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def filter_options(tenant, generation):
+    """{kolonne: verdier som finnes i minst én visning} for en butikks snapshot (sortert)."""
+    snap = read_snapshot(tenant)
+    out = {}
+    for col in ("Merke", "Tekniker", "Status"):
+        values = set()
+        for obj in snap.frames.values():
+            if isinstance(obj, pd.DataFrame) and col in obj.columns:
+                values.update(str(v) for v in obj[col].dropna().unique())
+        out[col] = sorted(values, key=str.lower)
+    return out
+
+
+def check_param(key, validate):
+    """Valider ?key= fra lenken før widgeten leser den. Streamlit forkaster ugyldige
+       verdier stille; her nullstilles parameteren og brukeren får beskjed."""
+    values = st.query_params.get_all(key)
+    if not values:
+        return
+    try:
+        validate(values)
+    except (ValueError, KeyError) as e:
+        del st.query_params[key]
+        st.session_state.pop(key, None)
+        st.warning(f"Filteret «{key}» i lenken er ugyldig og ble nullstilt ({e}).")
+
+
+def _check_dates(values, today):
+    for v in (d for value in values for d in value.split(",") if d):
+        if date.fromisoformat(v.replace("/", "-")) > today:
+            raise ValueError(f"{v} er etter i dag")
+
+
+def _check_known(values, known):
+    unknown = [v for v in values if v not in known]
+    if unknown:
+        raise ValueError(", ".join(unknown))
+
+
+def filter_bar():
+    """Periode, merke, tekniker og status. En endring kjører hele siden på nytt (alt
+       avhenger av filteret); selve filtreringen er indeksoppslag + cache."""
+    found = {"Merke": set(), "Tekniker": set(), "Status": set()}
+    for key in view_tenants():
+        snap = snapshot_refresher(key).wait()
+        if snap is None:                # lastingen feilet – feilen vises i visningen
+            continue
+        for col, values in filter_options(key, snap.generation).items():
+            found[col].update(values)
+    opts = {col: sorted(values, key=str.lower) for col, values in found.items()}
+    today = datetime.now().date()
+    st.markdown("**Filter**")
+    check_param("periode", lambda v: PERIODS[v[-1]])
+    check_param("datoer", lambda v: _check_dates(v, today))
+    for key, col in (("merke", "Merke"), ("tekniker", "Tekniker"), ("status", "Status")):
+        if opts[col]:                   # uten data ennå kan ingenting avvises
+            check_param(key, lambda v, known=set(opts[col]): _check_known(v, known))
+    period = st.selectbox("Periode", list(PERIODS), key="periode", bind="query-params")
+    start = end = None
+    if PERIODS[period] == "custom":
+        picked = st.date_input(
+            "Fra – til", value=(today - timedelta(days=7), today), max_value=today,
+            format="DD.MM.YYYY", key="datoer", bind="query-params",
+        )
+        if isinstance(picked, (tuple, list)) and len(picked) == 2:
+            start, end = picked
+    elif PERIODS[period] is not None:
+        start, end = today - timedelta(days=PERIODS[period]), today
+    brands = st.multiselect("Merke", opts["Merke"], key="merke", bind="query-params")
+    techs = st.multiselect("Tekniker", opts["Tekniker"], key="tekniker", bind="query-params")
+    statuses = st.multiselect("Status", opts["Status"], key="status", bind="query-params")
+    return Filters(start, end, tuple(brands), tuple(techs), tuple(statuses))
+
+
+with st.sidebar:
+    FILTERS = filter_bar()
+
+
+def view_aggregates(view, snap=None):
+    """Aggregater for en visning med filterlinjen brukt. Uten filter som gjelder visningen
+       er dette de ferdige tallene fra snapshotet; ellers regnes de fra indeksene."""
+    snap = snap or read_snapshot()
+    agg = snap.aggregate(view)
+    if not FILTERS.for_view(view, VIEW_COLUMNS[view]):
+        return agg
+    return filtered_aggregates(view, snap.frame(view), FILTERS, default=agg)
+
+
+def filter_note(view):
+    """Vis hvilke filter som gjelder (og ikke gjelder) for visningen."""
+    labels = {"dates": "periode", "Merke": "merke", "Tekniker": "tekniker", "Status": "status"}
+    wanted = FILTERS.active()
+    if not wanted:
+        return
+    applied = {k for k, _ in FILTERS.for_view(view, VIEW_COLUMNS[view]) or ()}
+    note = "Filtrert på " + ", ".join(labels[k] for k in sorted(applied)) if applied else "Ingen filter gjelder her"
+    skipped = wanted - applied
+    if skipped:
+        note += " · gjelder ikke her: " + ", ".join(labels[k] for k in sorted(skipped))
+    st.caption(note)
+
+
+# ----------------------------
+# Fragmenter: KPI-rad, graf-kort og tabell-expandere kjøres hver for seg
+# ----------------------------
+# En interaksjon inne i et fragment (f.eks. åpne "Vis tabell") kjører BARE det
+# fragmentet – ikke innlogging, CSS og alle grafene på nytt. Fragmentene poller
+# ikke selv: data_status sjekker generasjonen hvert POLL_SECONDS og bygger siden
+# på nytt bare når snapshotet er endret (figurene kommer da fra figurcachen).
+
+def kpis_reparert(agg):
+    return [
+        ("Total Repairs", agg["total"], None),
+        ("Brands", agg["brands"], None),
+        ("Top Technician", agg["top_tech"], f"{agg['top_tech_count']} repairs"),
+    ]
+
+
+def kpis_innlevert(agg):
+    today = pd.Timestamp(datetime.now().date())
+    return [
+        ("Totalt innlevert", agg["total"], None),                     # antall rader (uten header)
+        ("Merker", agg["brands"], None),                              # unike merker
+        ("Innlevert i dag", int(agg["by_day"].get(today, 0)), None),  # innlevert i dag
+    ]
+
+
+def kpis_inhouse(agg):
+    eldste = agg["oldest"]
+    top_brand_count = agg["top_brand_count"]
+    return [
+        ("Total", agg["total"], None),
+        ("Eldste Inhouse", format_no_date(eldste) if eldste else "-", None),
+        ("Topp-merke", agg["top_brand"], f"{top_brand_count} stk" if top_brand_count else None),
+    ]
+
+
+def kpis_arbeidet(agg):
+    top_status_count, top_tech_count = agg["top_status_count"], agg["top_tech_count"]
+    return [
+        ("Totalt i dag", agg["total"], None),
+        ("Mest satt status", agg["top_status"], f"{top_status_count} stk" if top_status_count else None),
+        ("Top technician", agg["top_tech"], f"{top_tech_count} jobber" if top_tech_count else None),
+    ]
+
+
+# Visning → (etikett, verdi, delta) for KPI-raden
+VIEW_KPIS = {
+    "Reparert":  kpis_reparert,
+    "Innlevert": kpis_innlevert,
+    "Inhouse":   kpis_inhouse,
+    "Arbeidet":  kpis_arbeidet,
+}
+
+
+def live_aggregates(view):
+    """Aggregater (med filter) for et data-fragment; viser feilen i fragmentet i stedet
+       for å stoppe siden (siden selv stopper allerede ved første kjøring hvis visningen feiler)."""
+    try:
+        return view_aggregates(view)
+    except Exception as e:
+        st.error(f"Kunne ikke lese '{VIEW_TITLES[view]}': {e}")
+        return None
+
+
+@st.fragment
+def kpi_row(view):
+    """KPI-raden (sentrert, like store kort, liten avstand) – forhåndsberegnet per snapshot."""
+    agg = live_aggregates(view)
+    if agg is None:
+        return
+    # Ytre «spacere» for å sentrere hele KPI-raden, og tre like brede kolonner i midten
+    sp_l, c1, c2, c3, sp_r = st.columns([1, 3, 3, 3, 1], gap="small")
+    for col, (label, value, delta) in zip((c1, c2, c3), VIEW_KPIS[view](agg)):
+        with col:
+            st.metric(label, value, delta)
+
+
+def card(view, title, table, kind, spec, empty, border=True, height="content"):
+    """Ett graf-kort for data fra `view`: overskrift + figur, eller en melding når tabellen er tom."""
+    with st.container(border=border):   # ekte "card" uten ekstra tom rad
+        st.subheader(title)
+        if table.empty:
+            st.info(empty)
+        else:
+            chart(kind, table, view, height=height, **spec)
+
+
+@st.fragment
+def chart_card(view, title, key, kind, spec, empty, border=True):
+    """Graf-kort for aggregatet `key` i en visning (eget fragment)."""
+    agg = live_aggregates(view)
+    if agg is not None:
+        card(view, title, agg[key], kind, spec, empty, border=border)
+
+
+@st.fragment
+def table_expander(label, body, key):
+    """Tabell-expander som eget fragment. Åpning/lukking kjører bare dette fragmentet,
+       og body() (tabellene) bygges og sendes kun mens expanderen er åpen."""
+    exp = st.expander(label, expanded=False, key=key, on_change="rerun")
+    if exp.open:
+        with exp:
+            body()
+
+
+def paged_table(view, df, column_config=None, filter_col="Merke"):
+    """Server-side paginert tabell (table_pages.py): søk, filter og sortering skjer her,
+       og bare den synlige siden sendes til nettleseren."""
+    pager = pager_for(df)
+    key = f"table_{view}"
+
+    def first_page():
+        st.session_state[f"{key}_page"] = 1
+
+    c_search, c_filter, c_sort, c_desc = st.columns([3, 2, 2, 1])
+    with c_search:
+        search = st.text_input("Søk", key=f"{key}_search", placeholder="Søk i alle kolonner",
+                               on_change=first_page)
+    with c_filter:
+        chosen = st.multiselect(filter_col, pager.options(filter_col), key=f"{key}_filter",
+                                on_change=first_page)
+    with c_sort:
+        sort = st.selectbox("Sorter etter", ["Rad", *df.columns], key=f"{key}_sort")
+    with c_desc:
+        descending = st.toggle("Synkende", key=f"{key}_desc")
+    page_size = st.session_state.get(f"{key}_size", 50)
+
+    with METRICS.time("rr_stage_seconds", stage="table_page", view=view):
+        page = pager.page(
+            search=search,
+            sort=None if sort == "Rad" else sort,
+            ascending=not descending,
+            filters={filter_col: chosen},
+            page=st.session_state.get(f"{key}_page", 1) - 1,
+            page_size=page_size,
+            where=row_mask(view, df, FILTERS),
+        )
+    st.dataframe(page.rows, use_container_width=True, column_config=column_config)
+
+    p_info, p_size, p_page = st.columns([4, 1, 1])
+    with p_info:
+        st.caption(f"{page.matches:,} av {len(df):,} rader · side {page.page + 1} av {page.pages}")
+    with p_size:
+        st.selectbox("Rader per side", PAGE_SIZES, index=PAGE_SIZES.index(50), key=f"{key}_size",
+                     on_change=first_page)
+    with p_page:
+        st.session_state[f"{key}_page"] = page.page + 1   # klippet til gyldig side
+        st.number_input("Side", min_value=1, max_value=page.pages, step=1, key=f"{key}_page")
+
 
 # ----------------------------
 # Innlevert – visning og logikk (kjører bare når valgt)
 # ----------------------------
+def table_innlevert():
+    with st.container(border=True):
+        paged_table(
+            "Innlevert", read_df_innlevert(),  # allerede 1-basert indeks
+            column_config={"Innlevert": st.column_config.DateColumn(format="DD.MM.YYYY")},
+        )
+
+
+@METRICS.timed("rr_stage_seconds", stage="render", view="Innlevert")
 def render_innlevert():
     try:
-        df_inn = read_df_innlevert()
+        read_aggregates("Innlevert")
     except Exception as e:
         st.error(f"Kunne ikke lese 'Innlevert': {e}")
         st.stop()
-
-    # KPI-er
-    total_inn = len(df_inn)                       # antall rader (uten header – get_all_records dropper header)
-    unique_brands_inn = df_inn["Merke"].nunique() # unike merker
-    today = datetime.now().date()
-    today_inn = int((df_inn["Innlevert"] == today).sum())  # innlevert i dag
+    filter_note("Innlevert")
 
     # KPI-rad
-    sp_l, c1, c2, c3, sp_r = st.columns([1, 3, 3, 3, 1], gap="small")
-    with c1:
-        st.metric("Totalt innlevert", total_inn)
-    with c2:
-        st.metric("Merker", unique_brands_inn)
-    with c3:
-        st.metric("Innlevert i dag", today_inn)
+    kpi_row("Innlevert")
 
     # ----- Grafer -----
     left, right = st.columns(2)
 
     # Innlevert per merke (bar)
-    per_brand_inn = (
-        df_inn.groupby("Merke").size()
-        .reset_index(name="Innlevert")
-        .sort_values("Innlevert", ascending=False, ignore_index=True)
-    )
     with left:
-        with st.container(border=True):  # ekte "card" uten ekstra tom rad
-            st.subheader("Innlevert per merke")
-            if per_brand_inn.empty:
-                st.info("Ingen innleveringer.")
-            else:
-                fig_b = px.bar(per_brand_inn, x="Merke", y="Innlevert", text="Innlevert")
-                fig_b.update_traces(textposition="outside", cliponaxis=False)
-                fig_b.update_layout(margin=dict(l=10, r=10, t=30, b=10), xaxis_tickangle=-35)
-                st.plotly_chart(fig_b, use_container_width=True)
+        chart_card("Innlevert", "Innlevert per merke", "per_brand", "bar",
+                   dict(x="Merke", y="Innlevert"), "Ingen innleveringer.")
 
     # Innlevert per dag (linje)
-    per_day = (
-        pd.Series(df_inn["Innlevert"])
-        .value_counts()
-        .rename_axis("Dato")
-        .reset_index(name="Innlevert")
-        .sort_values("Dato")
-    )
     with right:
-        with st.container(border=True):
-            st.subheader("Innlevert per dag")
-            if per_day.empty:
-                st.info("Ingen innleveringer.")
-            else:
-                fig_d = px.line(per_day, x="Dato", y="Innlevert", markers=True)
-                fig_d.update_layout(margin=dict(l=10, r=10, t=30, b=10))
-                st.plotly_chart(fig_d, use_container_width=True)
+        chart_card("Innlevert", "Innlevert per dag", "per_day", "line",
+                   dict(x="Dato", y="Innlevert"), "Ingen innleveringer.")
 
     # Tabell
-    with st.expander("Vis tabell", expanded=False):
-        with st.container(border=True):
-            df_show = df_inn.copy()
-            df_show.index = range(1, len(df_show) + 1)  # 1-basert indeks
-            st.dataframe(df_show, use_container_width=True)
+    table_expander("Vis tabell", table_innlevert, key="table_innlevert")
 
 
 # Hvis "Reparert" er valgt, fortsetter filen som før
@@ -559,263 +870,346 @@ def render_innlevert():
 # Skjul "Logged in as"
 # st.caption(f"Logged in as **{name}**")
 
+def table_inhouse():
+    with st.container(border=True):
+        paged_table(
+            "Inhouse", read_df_inhouse(),
+            column_config={"Dato": st.column_config.DateColumn(format="DD.MM.YYYY")},
+        )
+
+
+@st.fragment
+def aging_card():
+    """Aldring: p50/p90 dager i huset, enheter over 14 dager og bøtter (0–2, 3–7, 8–14,
+       15+) per status og merke. Regnes på en kompakt telletabell (aging.py)."""
+    try:
+        df = read_df_inhouse()
+    except Exception as e:
+        st.error(f"Kunne ikke lese 'Inhouse': {e}")
+        return
+    rep = aging_engine(TENANT.key).report(
+        df, datetime.now().date(), brands=FILTERS.brands, statuses=FILTERS.statuses,
+        start=FILTERS.start, end=FILTERS.end,
+    )
+    units = rep["units"]
+    with st.container(border=True):
+        st.subheader("Aldring (dager i huset)")
+        c1, c2, c3 = st.columns(3)
+        with c1:
+            st.metric("Median (p50)", f"{rep['p50']} d" if rep["p50"] is not None else "-")
+        with c2:
+            st.metric("p90", f"{rep['p90']} d" if rep["p90"] is not None else "-")
+        with c3:
+            st.metric("Over 14 dager", rep["over_14"],
+                      f"{rep['over_14'] / units:.0%} av {units}" if units else None, delta_color="off")
+        if rep["status_buckets"].empty:
+            st.info("Ingen enheter med dato.")
+        else:
+            chart("stacked_bar", rep["status_buckets"], "Inhouse", x="Status", y="Antall", color="Alder")
+        t_status, t_brand = st.tabs(["Per status", "Per merke"])
+        with t_status:
+            st.dataframe(rep["per_status"], use_container_width=True)
+        with t_brand:
+            st.dataframe(rep["per_brand"], use_container_width=True)
+        if rep["undated"]:
+            st.caption(f"{rep['undated']} enheter uten gyldig dato er ikke med.")
+
+
+@METRICS.timed("rr_stage_seconds", stage="render", view="Inhouse")
 def render_inhouse():
     try:
-        df_inh = read_df_inhouse()
+        read_aggregates("Inhouse")
     except Exception as e:
         st.error(f"Kunne ikke lese 'Inhouse': {e}")
         st.stop()
-
-    # KPI-er
-    total_inhouse = len(df_inh)
-    eldste = df_inh["Dato"].min() if not df_inh.empty else None
-    eldste_txt = format_no_date(eldste) if eldste else "-"
-
-    top_brand = "-"
-    top_brand_count = 0
-    if not df_inh.empty:
-        vc = df_inh["Merke"].value_counts()
-        if not vc.empty:
-            top_brand = vc.idxmax()
-            top_brand_count = int(vc.max())
+    filter_note("Inhouse")
 
     # KPI-rad
-    sp_l, c1, c2, c3, sp_r = st.columns([1, 3, 3, 3, 1], gap="small")
-    with c1:
-        st.metric("Total", total_inhouse)
-    with c2:
-        st.metric("Eldste Inhouse", eldste_txt)
-    with c3:
-        st.metric("Topp-merke", top_brand, f"{top_brand_count} stk" if top_brand_count else None)
+    kpi_row("Inhouse")
 
     # Grafer
     left, right = st.columns(2)
 
     # Bar: antall per status
-    per_status = (
-        df_inh.groupby("Status").size()
-             .reset_index(name="Antall")
-             .sort_values("Antall", ascending=False, ignore_index=True)
-    )
     with left:
-        with st.container(border=True):
-            st.subheader("Antall per status")
-            if per_status.empty:
-                st.info("Ingen registrerte enheter.")
-            else:
-                fig_s = px.bar(per_status, x="Status", y="Antall", text="Antall")
-                fig_s.update_traces(textposition="outside", cliponaxis=False)
-                fig_s.update_layout(margin=dict(l=10, r=10, t=30, b=10), xaxis_tickangle=-35)
-                st.plotly_chart(fig_s, use_container_width=True)
+        chart_card("Inhouse", "Antall per status", "per_status", "bar",
+                   dict(x="Status", y="Antall"), "Ingen registrerte enheter.")
 
     # Bar: antall per dato (søyle i stedet for linje)
-    per_day = (
-        df_inh.groupby("Dato").size()
-             .reset_index(name="Antall")
-             .sort_values("Dato")
-    )
     with right:
-        with st.container(border=True):
-            st.subheader("Antall per dato")
-            if per_day.empty:
-                st.info("Ingen registrerte enheter.")
-            else:
-                fig_d = px.bar(per_day, x="Dato", y="Antall", text="Antall")
-                fig_d.update_traces(textposition="outside", cliponaxis=False)
-                fig_d.update_layout(margin=dict(l=10, r=10, t=30, b=10), xaxis_tickangle=-35)
-                st.plotly_chart(fig_d, use_container_width=True)
+        chart_card("Inhouse", "Antall per dato", "per_day", "bar",
+                   dict(x="Dato", y="Antall"), "Ingen registrerte enheter.")
 
+    # Aldring (dager i huset per status/merke)
+    aging_card()
 
     # Tabell
-    with st.expander("Vis tabell", expanded=False):
-        with st.container(border=True):
-            df_show = df_inh.copy()
-            df_show.index = range(1, len(df_show) + 1)
-            st.dataframe(df_show, use_container_width=True)
+    table_expander("Vis tabell", table_inhouse, key="table_inhouse")
 
-def render_arbeidet():
-    try:
-        df_arb = read_df_arbeidet()   # <- MÅ være her før vi bruker df_arb
-    except Exception as e:
-        st.error(f"Kunne ikke lese 'Arbeidet på': {e}")
-        st.stop()
 
-       # ---------- KPI-er ----------
-    def pick_casefold(cands, cols):
-        cmap = {c.lower().strip(): c for c in cols}
-        for cand in cands:
-            real = cmap.get(cand.lower())
-            if real:
-                return real
-        return None
+def tables_arbeidet():
+    # Samme ferdige (1-baserte) tabeller som grafene
+    agg = view_aggregates("Arbeidet")
+    t_left, t_right = st.columns(2)
 
-    status_col  = pick_casefold(["Statustekst", "Statusteks", "Status"], df_arb.columns) or "Statustekst"
-    tech_col    = pick_casefold(["Tekniker", "Technician", "Service technician"], df_arb.columns) or "Tekniker"
-    brand_col   = pick_casefold(["Merke", "Brand", "Product brand", "Merker"], df_arb.columns) or "Merke"
+    # Merker i dag (tabell)
+    with t_left:
+        st.write("Merker i dag")
+        st.dataframe(agg["per_brand"], use_container_width=True)
 
-    total = len(df_arb)
+    # Teknikere i dag (tabell)
+    with t_right:
+        st.write("Teknikere i dag")
+        st.dataframe(agg["per_tech"], use_container_width=True)
 
-    top_status = "-"
-    top_status_count = 0
-    if status_col in df_arb.columns and not df_arb.empty:
-        sc = df_arb[status_col].astype(str).str.strip().value_counts()
-        if not sc.empty:
-            top_status = sc.idxmax()
-            top_status_count = int(sc.max())
 
-    top_tech = "-"
-    top_tech_count = 0
-    if tech_col in df_arb.columns and not df_arb.empty:
-        tc = df_arb[tech_col].astype(str).str.strip().value_counts()
-        if not tc.empty:
-            top_tech = tc.idxmax()
-            top_tech_count = int(tc.max())
+@METRICS.timed("rr_stage_seconds", stage="render", view="Arbeidet")
+def render_arbeidet():
+    try:
+        read_aggregates("Arbeidet")   # forhåndsberegnet per snapshot
+    except Exception as e:
+        st.error(f"Kunne ikke lese 'Arbeidet på': {e}")
+        st.stop()
+    filter_note("Arbeidet")
 
-    # KPI-rad
-    sp_l, c1, c2, c3, sp_r = st.columns([1, 3, 3, 3, 1], gap="small")
-    with c1:
-        st.metric("Totalt i dag", total)
-    with c2:
-        st.metric("Mest satt status", top_status, f"{top_status_count} stk" if top_status_count else None)
-    with c3:
-        st.metric("Top technician", top_tech, f"{top_tech_count} jobber" if top_tech_count else None)
+    # ---------- KPI-er ----------
+    kpi_row("Arbeidet")
 
     # ---------- Grafer ----------
     left, right = st.columns(2)
 
     # VENSTRE: Merker i dag (SØYLE)
     with left:
-        with st.container(border=True):
-            st.subheader("Merker i dag (antall)")
-            per_brand = (
-                df_arb.groupby(brand_col).size()
-                      .reset_index(name="Antall")
-                      .rename(columns={brand_col: "Merke"})
-                      .sort_values("Antall", ascending=False, ignore_index=True)
-            )
-            if per_brand.empty:
-                st.info("Ingen rader i dag.")
-            else:
-                fig_b = px.bar(per_brand, x="Merke", y="Antall", text="Antall")
-                fig_b.update_traces(textposition="outside", cliponaxis=False)
-                fig_b.update_layout(margin=dict(l=10, r=10, t=30, b=10), xaxis_tickangle=-35)
-                st.plotly_chart(fig_b, use_container_width=True)
+        chart_card("Arbeidet", "Merker i dag (antall)", "per_brand", "bar",
+                   dict(x="Merke", y="Antall"), "Ingen rader i dag.")
 
     # HØYRE: Status i dag (SØYLE)
     with right:
-        with st.container(border=True):
-            st.subheader("Status i dag (antall)")
-            per_status = (
-                df_arb.groupby(status_col).size()
-                      .reset_index(name="Antall")
-                      .rename(columns={status_col: "Status"})
-                      .sort_values("Antall", ascending=False, ignore_index=True)
-            )
-            if per_status.empty:
-                st.info("Ingen rader i dag.")
-            else:
-                fig_s = px.bar(per_status, x="Status", y="Antall", text="Antall")
-                fig_s.update_traces(textposition="outside", cliponaxis=False)
-                fig_s.update_layout(margin=dict(l=10, r=10, t=30, b=10), xaxis_tickangle=-35)
-                st.plotly_chart(fig_s, use_container_width=True)
+        chart_card("Arbeidet", "Status i dag (antall)", "per_status", "bar",
+                   dict(x="Status", y="Antall"), "Ingen rader i dag.")
 
-    
     # ---------- TABELLER (under, i expander) ----------
-    with st.expander("Vis tabeller", expanded=False):
-        t_left, t_right = st.columns(2)
-
-        # Merker i dag (tabell)
-        with t_left:
-            st.write("Merker i dag")
-            tbl_brand = (
-                df_arb.groupby(brand_col).size()
-                      .reset_index(name="Antall")
-                      .rename(columns={brand_col: "Merke"})
-                      .sort_values("Antall", ascending=False, ignore_index=True)
-            )
-            tbl_brand.index = range(1, len(tbl_brand) + 1)  # 1-basert indeks
-            st.dataframe(tbl_brand, use_container_width=True)
-
-        # Teknikere i dag (tabell)
-        with t_right:
-            st.write("Teknikere i dag")
-            tbl_tech = (
-                df_arb.groupby(tech_col).size()
-                      .reset_index(name="Antall")
-                      .rename(columns={tech_col: "Tekniker"})
-                      .sort_values("Antall", ascending=False, ignore_index=True)
-            )
-            tbl_tech.index = range(1, len(tbl_tech) + 1)
-            st.dataframe(tbl_tech, use_container_width=True)
+    table_expander("Vis tabeller", tables_arbeidet, key="tables_arbeidet")
+
+
+# ----------------------------
+# Oversikt – KPI-er og små grafer fra alle fire visningene på én side
+# ----------------------------
+# (visning, korttittel, aggregat, diagramtype, spesifikasjon)
+OVERVIEW_CHARTS = [
+    ("Reparert",  "Reparert per merke",  "per_brand",  "bar",  dict(x="Brand", y="Repairs")),
+    ("Innlevert", "Innlevert per dag",   "per_day",    "line", dict(x="Dato", y="Innlevert")),
+    ("Inhouse",   "Inhouse per status",  "per_status", "bar",  dict(x="Status", y="Antall")),
+    ("Arbeidet",  "Status i dag",        "per_status", "bar",  dict(x="Status", y="Antall")),
+]
+OVERVIEW_CHART_HEIGHT = 260
+
+
+def overview_kpis(view, agg):
+    """(hovedtall, undertekst) for en visning i oversikten."""
+    if view == "Reparert":
+        return agg["total"], f"Topp: {agg['top_tech']} ({agg['top_tech_count']})"
+    if view == "Innlevert":
+        today = pd.Timestamp(datetime.now().date())
+        return agg["total"], f"I dag: {int(agg['by_day'].get(today, 0))}"
+    if view == "Inhouse":
+        oldest = format_no_date(agg["oldest"]) if agg["oldest"] else "-"
+        return agg["total"], f"Eldste: {oldest}"
+    return agg["total"], f"Mest satt: {agg['top_status']} ({agg['top_status_count']})"
+
+
+@st.fragment
+def overview_chart(snap, view, title, key, kind, spec):
+    """Ett graf-kort. Som fragment strømmes kortene ut etter KPI-raden, og kan
+       kjøres alene uten resten av siden. Får samme snapshot som KPI-ene."""
+    with st.container(border=True):
+        st.markdown(f"**{title}** · [Åpne]({view_href(view)})")
+        try:
+            table = view_aggregates(view, snap)[key]
+        except Exception as e:
+            st.warning(f"Kunne ikke lese '{VIEW_TITLES[view]}': {e}")
+            return
+        if table.empty:
+            st.info("Ingen data.")
+        else:
+            chart(kind, table, view, height=OVERVIEW_CHART_HEIGHT, **spec)
+
+
+@st.fragment
+def flow_section(snap):
+    """Inntak mot ferdig og beholdning per dag (flow.py), med Little's lov: gjennomsnittlig
+       tid i huset W = beholdning L / ferdig per dag λ over de siste LITTLE_DAYS dagene arkivet dekker."""
+    try:
+        flow = flow_engine(TENANT.key).tables(snap, datetime.now().date()).report(brands=FILTERS.brands)
+    except Exception as e:
+        st.warning(f"Kunne ikke beregne flyt: {e}")
+        return
+    with st.container(border=True):
+        st.subheader("Flyt: inntak, ferdig og beholdning")
+        c1, c2, c3, c4 = st.columns(4)
+        with c1:
+            st.metric("Inntak per dag", flow["intake_rate"])
+        with c2:
+            st.metric("Ferdig per dag (λ)", flow["lambda"] if flow["lambda"] is not None else "-")
+        with c3:
+            st.metric("Beholdning (L)", flow["L"] if flow["L"] is not None else "-")
+        with c4:
+            st.metric("Tid i huset (W = L/λ)", f"{flow['W']} d" if flow["W"] is not None else "-")
+        chart("multi_line", flow["series"], "Oversikt", x="Dato", y="Antall", color="Serie")   # som FlowEngine
+        start, end = flow["covered"]
+        notes = [f"Arkivet dekker {start:%d.%m.%Y}–{end:%d.%m.%Y} ({flow['covered_days']} dager)."]
+        if flow["L"] is None:
+            notes.append(f"L, λ og W vises når minst {MIN_COVERED_DAYS} dager er dekket.")
+        else:
+            notes.append(f"Snitt over siste {flow['little_days']} dekkede dager (maks {LITTLE_DAYS}).")
+        notes.append("Beholdning bakover er estimert fra dagens Inhouse.")
+        if flow["missing"]:
+            notes.append("Mangler: " + ", ".join(VIEW_TITLES[v] for v in flow["missing"]) + ".")
+        st.caption(" ".join(notes))
+        with st.expander("Per merke", expanded=False):
+            st.dataframe(flow["per_brand"], use_container_width=True)
+
+
+@METRICS.timed("rr_stage_seconds", stage="render", view="Oversikt")
+def render_oversikt():
+    # ÉTT snapshot for hele siden – alle tall og grafer er fra samme henting
+    snap = read_snapshot()
+
+    # KPI-rad først (kun ferdige tall, ingen figurer)
+    for col, v in zip(st.columns(len(VIEW_COLUMNS), gap="small"), VIEW_COLUMNS):
+        with col:
+            try:
+                value, note = overview_kpis(v, view_aggregates(v, snap))
+            except Exception as e:
+                st.warning(f"Kunne ikke lese '{VIEW_TITLES[v]}': {e}")
+                continue
+            st.metric(VIEW_TITLES[v], value)
+            st.caption(note)
+
+    # Grafer (2 × 2) – hvert kort er et eget fragment
+    for row in (OVERVIEW_CHARTS[:2], OVERVIEW_CHARTS[2:]):
+        for col, (v, title, key, kind, spec) in zip(st.columns(2), row):
+            with col:
+                overview_chart(snap, v, title, key, kind, spec)
+
+    # Flyt på tvers av visningene (samme snapshot)
+    flow_section(snap)
+
+
+# ----------------------------
+# Alle butikker (sum på tvers av butikkene)
+# ----------------------------
+# (visning, tittel, aggregatnøkkel, x, y) – tabellene legges sammen med butikk som farge
+ROLLUP_CHARTS = [
+    ("Reparert", "Reparert per merke", "per_brand",  "Brand",  "Repairs"),
+    ("Inhouse",  "Inhouse per status", "per_status", "Status", "Antall"),
+]
+
+
+def rollup_row(key, snap):
+    """Hovedtallene for én butikk (filterlinjen brukt). None der en visning mangler."""
+    row = {"Butikk": TENANTS[key].name}
+    for v in VIEW_COLUMNS:
+        try:
+            agg = view_aggregates(v, snap)
+        except Exception:
+            row[VIEW_TITLES[v]] = None
+            continue
+        row[VIEW_TITLES[v]] = agg["total"]
+        if v == "Inhouse":
+            row["Eldste inhouse"] = agg["oldest"]
+    row["Data"] = format_age(snap.age)
+    row["Åpne"] = view_href("Oversikt", tenant=key)
+    return row
+
+
+@METRICS.timed("rr_stage_seconds", stage="render", view="Butikker")
+def render_butikker():
+    # Ett snapshot per butikk – alle lastes samtidig i hver sin bakgrunnstråd
+    snaps, failed = {}, {}
+    for key in TENANTS:
+        try:
+            snaps[key] = read_snapshot(key)
+        except Exception as e:
+            failed[key] = e
+    for key, e in failed.items():
+        st.warning(f"Kunne ikke lese '{TENANTS[key].name}': {e}")
+    if not snaps:
+        return
+
+    rows = pd.DataFrame([rollup_row(key, snap) for key, snap in snaps.items()])
+    for col, v in zip(st.columns(len(VIEW_COLUMNS), gap="small"), VIEW_COLUMNS):
+        with col:
+            st.metric(VIEW_TITLES[v], int(rows[VIEW_TITLES[v]].fillna(0).sum()))
+            st.caption(f"{rows[VIEW_TITLES[v]].notna().sum()} av {len(TENANTS)} butikker")
+    if FILTERS.active():
+        st.caption("Filteret er brukt i hver butikk der det gjelder (som i visningene).")
+
+    for col, (v, title, key, x, y) in zip(st.columns(2), ROLLUP_CHARTS):
+        with col, st.container(border=True):
+            st.markdown(f"**{title}**")
+            parts = []
+            for t, snap in snaps.items():
+                try:
+                    table = view_aggregates(v, snap)[key]
+                except Exception:
+                    continue
+                parts.append(table.assign(Butikk=TENANTS[t].name))
+            table = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+            if table.empty:
+                st.info("Ingen data.")
+            else:
+                chart("stacked_bar", table, v, height=OVERVIEW_CHART_HEIGHT, x=x, y=y, color="Butikk")
+
+    st.dataframe(
+        rows, hide_index=True, use_container_width=True,
+        column_config={
+            "Eldste inhouse": st.column_config.DateColumn(format="DD.MM.YYYY"),
+            "Åpne": st.column_config.LinkColumn(display_text="Oversikt"),
+        },
+    )
 
 
 # ----------------------------
 # Ruting mellom visninger (må komme ETTER at funksjonene er definert)
 # ----------------------------
-if view == "Innlevert":
+if view == "Butikker":
+    render_butikker()
+    show_run_timing()
+    st.stop()
+elif view == "Oversikt":
+    render_oversikt()
+    show_run_timing()
+    st.stop()
+elif view == "Innlevert":
     render_innlevert()
+    show_run_timing()
     st.stop()
 elif view == "Inhouse":
     render_inhouse()
+    show_run_timing()
     st.stop()
 elif view == "Arbeidet":
     render_arbeidet()
+    show_run_timing()
     st.stop()
 
 
 # ----------------------------
-# Load and clean data
+# Load data (tall og tabeller er forhåndsberegnet per snapshot)
 # ----------------------------
+render_started = time.perf_counter()
 try:
-    df = read_df()
+    read_aggregates("Reparert")
 except Exception as e:
     st.error(f"Could not read data source: {e}")
     st.stop()
-
-def pick(cands, df):
-    for c in cands:
-        if c in df.columns:
-            return c
-    return None
-
-brand_col = pick(BRAND_COLS, df)
-tech_col  = pick(TECH_COLS, df)
-
-if brand_col is None or tech_col is None:
-    st.error(f"Missing columns. Found {list(df.columns)}; expected {BRAND_COLS} and {TECH_COLS}.")
-    st.stop()
-
-df[brand_col] = df[brand_col].astype(str).str.strip()
-df[tech_col]  = df[tech_col].astype(str).str.strip()
-df = df[(df[brand_col] != "") & (df[tech_col] != "")]
+filter_note("Reparert")
 
 # -------------------------------
-# KPI-tall (sentrert, like store kort, liten avstand)
+# KPI-tall
 # -------------------------------
-total_repairs = len(df)
-unique_brands = df[brand_col].nunique()
-
-repairs_per_tech = (
-    df.groupby(tech_col).size()
-      .reset_index(name="Repairs")
-      .rename(columns={tech_col: "Technician"})
-      .sort_values("Repairs", ascending=False, ignore_index=True)
-)
-top_tech_name = repairs_per_tech.iloc[0]["Technician"] if not repairs_per_tech.empty else "-"
-top_tech_reps = int(repairs_per_tech.iloc[0]["Repairs"]) if not repairs_per_tech.empty else 0
-
-# Ytre «spacere» for å sentrere hele KPI-raden,
-# og tre like brede kolonner i midten
-sp_l, c1, c2, c3, sp_r = st.columns([1, 3, 3, 3, 1], gap="small")
-
-with c1:
-    st.metric("Total Repairs", total_repairs)
-
-with c2:
-    st.metric("Brands", unique_brands)
-
-with c3:
-    st.metric("Top Technician", top_tech_name, f"{top_tech_reps} repairs")
+kpi_row("Reparert")
 
 
 # -------------------------------
@@ -824,76 +1218,121 @@ with c3:
 left, right = st.columns(2)
 
 # Brand counts
-repairs_per_brand = (df.groupby(brand_col).size()
-                     .reset_index(name="Repairs")
-                     .rename(columns={brand_col: "Brand"})
-                     .sort_values("Repairs", ascending=False, ignore_index=True))
-
 with left:
-    st.subheader("Repairs by Brand")
-    if repairs_per_brand.empty:
-        st.info("Ingen registreringer i dag.")
-    else:
-        repairs_per_brand["Brand"] = repairs_per_brand["Brand"].astype(str)
-        repairs_per_brand["Repairs"] = repairs_per_brand["Repairs"].astype(int)
-        fig_b = px.bar(repairs_per_brand, x="Brand", y="Repairs", text="Repairs")
-        fig_b.update_traces(textposition="outside", cliponaxis=False)
-        fig_b.update_layout(margin=dict(l=10, r=10, t=30, b=10), xaxis_tickangle=-35)
-        st.plotly_chart(fig_b, use_container_width=True)
+    chart_card("Reparert", "Repairs by Brand", "per_brand", "bar",
+               dict(x="Brand", y="Repairs"), "Ingen registreringer i dag.", border=False)
 
 with right:
-    st.subheader("Repairs by Technician")
-    if repairs_per_tech.empty:
-        st.info("Ingen registreringer i dag.")
-    else:
-        repairs_per_tech["Technician"] = repairs_per_tech["Technician"].astype(str)
-        repairs_per_tech["Repairs"] = repairs_per_tech["Repairs"].astype(int)
-        fig_t = px.pie(repairs_per_tech, names="Technician", values="Repairs", hole=0.6)
-        fig_t.update_traces(textinfo="percent+label")
-        fig_t.update_layout(showlegend=True, margin=dict(l=10, r=10, t=30, b=10))
-        st.plotly_chart(fig_t, use_container_width=True)
+    chart_card("Reparert", "Repairs by Technician", "per_tech", "pie",
+               dict(names="Technician", values="Repairs"), "Ingen registreringer i dag.", border=False)
 
 
 # ----------------------------
 # Tables (expander)
 # ----------------------------
-with st.expander("Show tables", expanded=False):
+def tables_reparert():
+    agg = view_aggregates("Reparert")
     t_left, t_right = st.columns(2)
     with t_left:
         st.write("Repairs per Brand")
-        tbl_brand = repairs_per_brand.copy()
-        tbl_brand.index = range(1, len(tbl_brand) + 1)
-        st.dataframe(tbl_brand, use_container_width=True)
+        st.dataframe(agg["per_brand"], use_container_width=True)
 
     with t_right:
         st.write("Repairs per Technician")
-        tbl_tech = repairs_per_tech.copy()
-        tbl_tech.index = range(1, len(tbl_tech) + 1)
-        st.dataframe(tbl_tech, use_container_width=True)
+        st.dataframe(agg["per_tech"], use_container_width=True)
+
 
+table_expander("Show tables", tables_reparert, key="tables_reparert")
+
+
+
+# ----------------------------
+# History (archived days from Sheet1)
+# ----------------------------
+HISTORY_FREQS = {"Day": "D", "Week": "W", "Month": "M"}
+
+
+@st.fragment
+def history_section():
+    """Periode/oppløsning/fordeling endres uten å kjøre resten av siden på nytt."""
+    st.subheader("Repair history")
+    h_range, h_freq, h_by = st.columns([2, 1, 1])
+    today = datetime.now().date()
+    with h_range:
+        period = st.date_input(
+            "Period", value=(today - timedelta(days=30), today), max_value=today, format="DD.MM.YYYY"
+        )
+    with h_freq:
+        freq_label = st.radio("Resolution", list(HISTORY_FREQS), horizontal=True)
+    with h_by:
+        by = st.radio("Split by", ["Tekniker", "Merke"], horizontal=True)
+
+    if isinstance(period, (tuple, list)) and len(period) == 2:
+        start, end = period
+        hist = read_history(TENANT.key, start, end, HISTORY_FREQS[freq_label], by,
+                            repair_history(TENANT.key).version)
+        if hist.empty:
+            st.info("Ingen arkiverte dager i perioden ennå.")
+        else:
+            chart("stacked_bar", hist, "Reparert", x="Periode", y="Antall", color=by)
+    else:
+        st.info("Velg start- og sluttdato.")
+
+
+history_section()
+METRICS.observe("rr_stage_seconds", time.perf_counter() - render_started,
+                stage="render", view="Reparert")
 
 
 # ----------------------------
 # Admin: replace data
 # ----------------------------
-role = credentials_dict["usernames"][username].get("role", "viewer")
+def replace_data(uploaded):
+    """Strøm Excel-filen inn i butikkens Reparert-fane (bulk_import.py) med fremdrift, og
+       oppfrisk snapshotet med en gang. Bare arkfanen som er endret parses på nytt –
+       de andre visningene, aggregatene og figurene gjenbrukes fra cachen."""
+    from bulk_import import import_excel     # openpyxl trengs bare her
+
+    bar = st.progress(0.0, text="Reading file …")
+
+    def progress(stats):
+        frac = min(stats.read / stats.expected, 1.0) if stats.expected else 0.0
+        bar.progress(frac, text=f"{stats.read:,} rows read · {stats.rows_per_second:,.0f} rows/s")
+
+    budget = api_budget()
+    sh = api_call("open_by_key", gspread_client().open_by_key, TENANT.sheet_id,
+                  budget=budget, coalesce=TENANT.sheet_id)
+    stats = import_excel(uploaded, sh, TENANT.worksheets["Reparert"], on_progress=progress,
+                         budget=budget)
+    bar.progress(1.0, text="Refreshing dashboard …")
+    snapshot_refresher(TENANT.key).refresh(force=True)     # ikke stol på modifiedTime
+    bar.empty()
+    return stats
+
+
 with st.expander("Admin: Replace data (upload new Excel)", expanded=False):
     if role != "admin":
         st.info("Viewer access only.")
+    elif TENANT.sources.get("Reparert", {}).get("type", "sheets") != "sheets":
+        st.info("Import is only available when 'Reparert' is stored in Google Sheets.")
     else:
         uploaded = st.file_uploader("Upload Excel (.xlsx) with columns Merke/Tekniker", type=["xlsx"])
-        if uploaded is not None:
+        if uploaded is not None and st.button("Replace data"):
             try:
-                new_df = pd.read_excel(uploaded)
-                replace_data(new_df)
-                st.success("Data replaced successfully. Click to reload.")
-                if st.button("Reload now"):
-                    st.experimental_rerun()
+                stats = replace_data(uploaded)
+                st.session_state["import_result"] = (
+                    f"Data replaced: {stats.written:,} rows ({stats.skipped:,} empty skipped) "
+                    f"in {stats.seconds:.1f} s – {stats.rows_per_second:,.0f} rows/s, "
+                    f"{stats.batches} batch writes."
+                )
             except Exception as e:
                 st.error(f"Upload failed: {e}")
+        if "import_result" in st.session_state:
+            st.success(st.session_state["import_result"])
 
 # ----------------------------
 # Logout
 # ----------------------------
 authenticator.logout("Logout", "sidebar")
 st.sidebar.caption("Secure dashboard")
+show_run_timing()
@@ -0,0 +1,724 @@
+"""
+Datalag for Retail Repair Dashboard.
+
+Henter alle arkfanene i ÉN runde mot Sheets API (open_by_key + values_batch_get)
+og bygger standardiserte DataFrames per visning fra det felles øyeblikksbildet.
+Ingen Streamlit her – modulen kan importeres uten å starte appen.
+"""
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+from requests.exceptions import ConnectionError as HTTPConnectionError, Timeout
+
+from date_parsing import parse_dates
+from metrics import METRICS
+
+# Felles kandidater (robust på kolonnenavn)
+BRAND_COLS = ["Merke", "Product brand", "Brand"]
+TECH_COLS  = ["Tekniker", "Service technician", "Technician"]
+
+# Kolonnenavn som kan forekomme for dato i "Innlevert"
+INNLEVERT_DATE_COLS = ["Innlevert", "Received date", "Date"]
+
+# Siste kolonne som leses fra append-only-ark (A1-notasjon, f.eks. A{n}:Z)
+APPEND_ONLY_LAST_COL = "Z"
+# Antall lagrede rader (med headeren) som sammenlignes med arket ved hver delta-synk,
+# og maks tid mellom fulle synker (fanger endringer halen ikke ser)
+APPEND_ONLY_TAIL_ROWS = 50
+APPEND_ONLY_RESYNC_SECONDS = 6 * 3600
+
+# Nye forsøk mot Sheets/Drive: kvote (429) og serverfeil (5xx), eksponentiell
+# backoff med full jitter (0..min(CAP, BASE * 2^forsøk)) – eller Retry-After.
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RETRIES = 5
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 32.0
+
+
+# ----------------------------
+# Kompakte, kategoriske kolonner
+# ----------------------------
+class Vocabulary:
+    """Prosess-felles, stabil ordbok verdi → kode for en kategorisk kolonne.
+
+    Nye verdier legges alltid til på slutten, så en kode betyr det samme i alle
+    snapshots og i alle arkene (f.eks. Merke i Innlevert og Inhouse).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._values = []
+        self._index = {}
+        self._dtype = pd.CategoricalDtype([])
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._values)
+
+    def code(self, value):
+        """Kode for en verdi, eller -1 hvis den aldri er sett."""
+        return self._index.get(value, -1)
+
+    def dtype(self, values=()):
+        """CategoricalDtype som dekker alle kjente verdier pluss `values`."""
+        new = [v for v in pd.unique(pd.Series(values, dtype=object)) if v not in self._index]
+        if new:
+            with self._lock:
+                for v in new:
+                    if v not in self._index:
+                        self._index[v] = len(self._values)
+                        self._values.append(v)
+                self._dtype = pd.CategoricalDtype(list(self._values))
+        return self._dtype
+
+    def encode(self, s):
+        """Serie → kategorisk med ordbokens (stabile) kategorier."""
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            dtype = self.dtype(s.cat.categories)
+            return s.cat.set_categories(dtype.categories)
+        return s.astype(self.dtype(s))
+
+
+BRANDS      = Vocabulary("Merke")
+STATUSES    = Vocabulary("Status")
+TECHNICIANS = Vocabulary("Tekniker")
+
+CATEGORY_COLUMNS = {"Merke": BRANDS, "Status": STATUSES, "Tekniker": TECHNICIANS}
+
+
+def compact_frame(df):
+    """Kanoniske kolonner (Merke/Status/Tekniker) → category med felles ordbok.
+       Datokolonnene er allerede datetime64 (8 B/rad) fra parse_dates."""
+    for col, vocab in CATEGORY_COLUMNS.items():
+        if col in df.columns:
+            df[col] = vocab.encode(df[col])
+    return df
+
+
+def canonical(df):
+    """Ferdig, delt ramme: kompakte dtyper + 1-basert indeks (slik tabellene viser den),
+       så visningene kan sende den rett til st.dataframe uten kopi/omindeksering."""
+    df = compact_frame(df)
+    df.index = pd.RangeIndex(1, len(df) + 1)
+    return df
+
+
+def records_frame(values):
+    """Som ws.get_all_records(): første rad er header, resten er rader.
+       Korte rader fylles ut med "" (API-et dropper tomme celler på slutten)."""
+    if not values or len(values) < 2:
+        return pd.DataFrame()
+    header = list(values[0])
+    width = len(header)
+    rows = [(list(r) + [""] * width)[:width] for r in values[1:]]
+    return pd.DataFrame(rows, columns=header)
+
+
+def _pick(cands, df):
+    for c in cands:
+        if c in df.columns:
+            return c
+    return None
+
+
+def frame_reparert(values):
+    """'Reparert' (Sheet1) → kolonnene Merke, Tekniker (rensede, uten blanke rader)."""
+    df = records_frame(values)
+    if df.empty:
+        return pd.DataFrame(columns=["Merke", "Tekniker"])
+
+    brand_col = _pick(BRAND_COLS, df)
+    tech_col  = _pick(TECH_COLS, df)
+    if brand_col is None or tech_col is None:
+        raise KeyError(
+            f"Missing columns. Found {list(df.columns)}; expected {BRAND_COLS} and {TECH_COLS}."
+        )
+
+    out = df[[brand_col, tech_col]].astype(str)
+    out.columns = ["Merke", "Tekniker"]
+    out["Merke"] = out["Merke"].str.strip()
+    out["Tekniker"] = out["Tekniker"].str.strip()
+    out = out[(out["Merke"] != "") & (out["Tekniker"] != "")]
+    return canonical(out)
+
+
+def frame_innlevert(values):
+    """'Innlevert' (Sheet2) → kolonnene Merke, Innlevert."""
+    df = records_frame(values)
+    if df.empty:
+        return pd.DataFrame(columns=["Merke", "Innlevert"])
+
+    # Finn aktuelle kolonner
+    bcol = _pick(BRAND_COLS, df) or "Merke"
+    dcol = _pick(INNLEVERT_DATE_COLS, df) or "Innlevert"
+
+    # Rens og robust dato-parsing (→ datetime64, dag-presisjon)
+    df[bcol] = df[bcol].astype(str).str.strip()
+    df[dcol] = parse_dates(df[dcol])
+
+    df = df[(df[bcol] != "") & df[dcol].notna()]
+    out = df[[bcol, dcol]].copy()
+    out.columns = ["Merke", "Innlevert"]
+    return canonical(out)
+
+
+def frame_inhouse(values):
+    """'Inhouse' (Sheet3) → kolonnene Merke, Status, Dato.
+       Forventer A=Merke, B=Statustekst, C=Statusdato (tekst eller Excel-seriedato)."""
+    df = records_frame(values)
+    if df.empty:
+        return pd.DataFrame(columns=["Merke", "Status", "Dato"])
+
+    # Case-insensitive plukking av kolonner
+    colmap = {c.lower().strip(): c for c in df.columns}
+
+    def pick_casefold(cands):
+        for cand in cands:
+            real = colmap.get(cand.lower())
+            if real:
+                return real
+        return None
+
+    brand_col  = pick_casefold(["Merke", "Product brand", "Brand"])
+    status_col = pick_casefold(["Statustekst", "Status", "Repair status", "State"])
+    date_col   = pick_casefold(["Statusdato", "Dato", "Innlevert", "Received date", "Date"])
+
+    # Snill feilmelding hvis noe mangler
+    missing = []
+    if brand_col is None:  missing.append("Merke")
+    if status_col is None: missing.append("Statustekst")
+    if date_col is None:   missing.append("Statusdato")
+    if missing:
+        raise KeyError(", ".join(missing))
+
+    # Rens / normaliser
+    df[brand_col]  = df[brand_col].astype(str).str.strip()
+    df[status_col] = df[status_col].astype(str).str.strip()
+    df[date_col]   = parse_dates(df[date_col])
+
+    df = df[(df[brand_col] != "") & (df[status_col] != "") & df[date_col].notna()].copy()
+
+    # Standardiser ut-kolonner
+    out = df[[brand_col, status_col, date_col]].copy()
+    out.columns = ["Merke", "Status", "Dato"]
+    return canonical(out)
+
+
+def frame_arbeidet(values):
+    """
+    Dagens arbeid (Sheet5).
+    Forventer minst tre kolonner (variasjoner håndteres case-insensitivt):
+      - Merker  (f.eks 'Merker', 'Merke', 'Brand')
+      - Status  (f.eks 'Statusteks', 'Statustekst', 'Status')
+      - Tekniker (f.eks 'Tekniker', 'Technician', 'Service technician')
+    Returnerer alltid kolonnene: Merke, Status, Tekniker
+    """
+    if not values or len(values) < 2:
+        return pd.DataFrame(columns=["Merke", "Status", "Tekniker"])
+
+    header = [h.strip() for h in values[0]]
+    width = len(header)
+    rows = [(list(r) + [""] * width)[:width] for r in values[1:]]
+    df = pd.DataFrame(rows, columns=header)
+
+    # Case-insensitive mapping
+    colmap = {c.lower().strip(): c for c in df.columns}
+
+    def pick_casefold(cands):
+        for cand in cands:
+            real = colmap.get(cand.lower())
+            if real:
+                return real
+        return None
+
+    brand_col = pick_casefold(["Merker", "Merke", "Brand"])
+    status_col = pick_casefold(["Statusteks", "Statustekst", "Status"])
+    tech_col = pick_casefold(["Tekniker", "Technician", "Service technician"])
+
+    if brand_col is None or status_col is None or tech_col is None:
+        # Returner tomt i riktig format (unngå krasj i UI)
+        return pd.DataFrame(columns=["Merke", "Status", "Tekniker"])
+
+    # Rens litt
+    df[brand_col] = df[brand_col].astype(str).str.strip()
+    df[status_col] = df[status_col].astype(str).str.strip()
+    df[tech_col] = df[tech_col].astype(str).str.strip()
+
+    out = df[[brand_col, status_col, tech_col]].copy()
+    out.columns = ["Merke", "Status", "Tekniker"]
+    # Filtrer bort helt blanke rader
+    out = out[(out["Merke"] != "") | (out["Status"] != "") | (out["Tekniker"] != "")]
+    return canonical(out)
+
+
+# Visning → byggefunksjon (brukes når et nytt snapshot bygges)
+VIEW_BUILDERS = {
+    "Reparert":  frame_reparert,
+    "Innlevert": frame_innlevert,
+    "Inhouse":   frame_inhouse,
+    "Arbeidet":  frame_arbeidet,
+}
+
+
+def build_frames(values, worksheets):
+    """Bygg alle visningenes DataFrames fra rå verdier.
+       worksheets: {visning: arkfane}. Feil lagres per visning i stedet for å kastes."""
+    frames = {}
+    for view, ws in worksheets.items():
+        try:
+            with METRICS.time("rr_stage_seconds", stage="parse", view=view):
+                frames[view] = VIEW_BUILDERS[view](values.get(ws, []))
+        except Exception as e:
+            frames[view] = e
+    return frames
+
+
+def _status(e):
+    """HTTP-status for en feil fra gspread/requests, eller None."""
+    code = getattr(e, "code", None)
+    if isinstance(code, int) and code > 0:
+        return code
+    return getattr(getattr(e, "response", None), "status_code", None)
+
+
+def _retry_delay(e, attempt):
+    """Sekunder før neste forsøk, eller None hvis feilen ikke skal prøves på nytt."""
+    if isinstance(e, (HTTPConnectionError, Timeout)):
+        status = None
+    else:
+        status = _status(e)
+        if status not in RETRY_STATUS:
+            return None
+    after = getattr(getattr(e, "response", None), "headers", {}).get("Retry-After")
+    if after and str(after).isdigit():
+        return min(float(after), BACKOFF_CAP)
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+
+class TokenBucket:
+    """Token-bøtte: `rate` tokens per sekund, maks `capacity` på lager. Trådsikker.
+
+    Et kall reserverer sitt token med en gang (beholdningen kan gå under null), så
+    ventende kall slipper til i ankomstrekkefølge uten å kjempe om neste token.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        """Ta ett token. Returnerer sekundene kallet måtte vente (0.0 = ikke strupet)."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+
+# Kall som går mot Drive-kvoten (modifiedTime), ikke mot lesekvoten til Sheets
+DRIVE_CALLS = {"get_lastUpdateTime"}
+
+
+class ApiBudget:
+    """Felles budsjett for kall mot Sheets/Drive for alle butikkene i prosessen (de deler
+       kvoten til ett Google-prosjekt). Et kall går gjennom tre ledd:
+
+      1. coalesce:  like kall (samme nøkkel) som er i flukt samtidig deler ÉN henting
+      2. token-bøtte dimensjonert etter lesekvoten: `burst` kall kan gå med en gang,
+         deretter (reads_per_minute − burst) per minutt – aldri over kvoten i et
+         60-sekunders vindu (None = ingen grense)
+      3. tak på samtidige kall (max_concurrent)
+
+    Sammenslåtte og strupede kall telles (rr_sheets_api_coalesced_total /
+    rr_sheets_api_throttled_total), og ventetiden måles (rr_sheets_api_wait_seconds).
+    """
+
+    def __init__(self, max_concurrent=4, reads_per_minute=None, burst=10):
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max(int(max_concurrent), 1))
+        self.bucket = None
+        if reads_per_minute:
+            burst = max(1, min(int(burst), int(reads_per_minute) // 2))
+            self.bucket = TokenBucket((reads_per_minute - burst) / 60.0, burst)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+        self.throttled = 0
+
+    def coalesce(self, key, fn):
+        """fn() én gang for samtidige kall med samme nøkkel; de andre venter og får samme
+           resultat (eller samme feil). Resultatet deles og skal ikke endres."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            METRICS.inc("rr_sheets_api_coalesced_total", call=key[0])
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    @contextmanager
+    def slot(self, call):
+        """Vent på token (lesekall) og ledig plass rundt ETT kall."""
+        t0 = time.perf_counter()
+        if self.bucket is not None and call not in DRIVE_CALLS and self.bucket.take() > 0:
+            with self._lock:
+                self.throttled += 1
+            METRICS.inc("rr_sheets_api_throttled_total", call=call)
+        with self._slots:
+            METRICS.observe("rr_sheets_api_wait_seconds", time.perf_counter() - t0, call=call)
+            yield
+
+
+def api_call(call, fn, *args, retries=RETRIES, budget=None, coalesce=None, **kwargs):
+    """Kall mot Sheets/Drive med telling, latensmåling (rr_sheets_api_*) og nye forsøk
+       med backoff + jitter ved 429/5xx og nettverksfeil. Med `budget` (ApiBudget) venter
+       hvert forsøk på token og ledig plass; backoff-pausen holder ingen plass.
+       coalesce: nøkkel for kallet (f.eks. regneark + områder) – samtidige kall med samme
+       nøkkel deler ett kall i flukt, inkludert nye forsøk (krever budget)."""
+    if budget is not None and coalesce is not None:
+        return budget.coalesce(
+            (call, coalesce),
+            lambda: api_call(call, fn, *args, retries=retries, budget=budget, **kwargs),
+        )
+    attempt = 0
+    while True:
+        t0 = time.perf_counter()
+        try:
+            if budget is None:
+                return fn(*args, **kwargs)
+            with budget.slot(call):
+                t0 = time.perf_counter()        # latens uten ventetiden i køen
+                return fn(*args, **kwargs)
+        except Exception as e:
+            METRICS.inc("rr_sheets_api_errors_total", call=call, status=_status(e) or "-")
+            delay = _retry_delay(e, attempt) if attempt < retries else None
+            if delay is None:
+                raise
+        finally:
+            METRICS.observe("rr_sheets_api_seconds", time.perf_counter() - t0, call=call)
+        METRICS.inc("rr_sheets_api_retries_total", call=call)
+        time.sleep(delay)
+        attempt += 1
+
+
+def absolute_range_name(sheet, rng=None):
+    """'Ark'!A1:B – fra gspread.utils, importert først når Sheets faktisk brukes (gspread
+       er tregt å importere og trengs ikke med andre kilder eller demo-data)."""
+    from gspread.utils import absolute_range_name as a1
+    return a1(sheet, rng)
+
+
+def _trim(row):
+    """Rad uten tomme celler på slutten (API-et utelater dem uansett)."""
+    row = list(row or [])
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+class AppendOnlySheet:
+    """Inkrementell synk av et ark der nye rader kun legges til nederst (Innlevert).
+
+    Husker header + alle innleste rader, og henter deretter kun A{n}:Z – der rad n
+    er den første av de siste tail_rows lagrede radene – pluss headerraden. Disse
+    radene må være like i arket; nye rader under dem parses og legges til den
+    lagrede rammen. Full resynk når headeren er endret eller halen er endret
+    (rader slettet/flyttet – en slettet rad forskyver halen, også når en lik rad
+    er lagt til nederst), og uansett etter resync_seconds siden forrige fulle synk.
+    Den gamle rammen vises til den fulle synken er ferdig.
+
+    Rammen bygges FØR header/rader lagres, så et ark byggeren ikke forstår aldri
+    etterlater en halv tilstand; SheetLoader nullstiller synken og viser feilen
+    (error) i visningen – de andre visningene påvirkes ikke.
+
+    store: valgfri snapshot_store.SyncStore – rå rader lagres lokalt og leses inn
+    igjen ved første henting etter omstart (så bare halen hentes fra Sheets).
+    """
+
+    def __init__(self, worksheet, builder, store=None, tail_rows=APPEND_ONLY_TAIL_ROWS,
+                 resync_seconds=APPEND_ONLY_RESYNC_SECONDS):
+        self.worksheet = worksheet
+        self.builder = builder          # values -> DataFrame (f.eks. frame_innlevert)
+        self.store = store
+        self.tail_rows = max(int(tail_rows), 1)
+        self.resync_seconds = resync_seconds
+        self._restored = store is None
+        self.header = None
+        self.rows = []                  # rå rader under headeren
+        self.frame = None
+        self.synced_at = 0.0            # tidspunkt for siste fulle synk
+        self._full = True               # ranges() ba om hele arket
+        self.error = None               # feil fra siste synk (vises i stedet for rammen)
+        self.full_syncs = 0
+        self.appended_rows = 0
+
+    def reset(self):
+        self.header = None
+        self.rows = []
+        self.frame = None
+        self.synced_at = 0.0
+
+    def _restore(self):
+        """Les lagrede rader (én gang). Feil i den lokale kopien gir bare full synk."""
+        self._restored = True
+        try:
+            saved = self.store.load(self.worksheet)
+            if saved is None:
+                return
+            header, rows, synced_at = saved
+            frame = self.builder([header] + rows)
+        except Exception:
+            return
+        self.header, self.rows, self.frame, self.synced_at = header, rows, frame, synced_at
+
+    def _persist(self, start):
+        try:
+            self.store.save(self.worksheet, self.header, self.rows[start:], start=start,
+                            synced_at=self.synced_at if start == 0 else None)
+        except Exception:
+            pass            # lokal kopi er bare en snarvei – synken virker uten
+
+    def _check_rows(self):
+        """De siste lagrede radene (med headeren) som må gjenfinnes i arket."""
+        known = min(self.tail_rows, len(self.rows) + 1)
+        return ([self.header] + self.rows)[-known:]
+
+    def ranges(self):
+        """A1-områder for neste henting (full første gang, ellers header + hale)."""
+        if not self._restored:
+            self._restore()
+        col = APPEND_ONLY_LAST_COL
+        self._full = (self.header is None
+                      or time.time() - self.synced_at >= self.resync_seconds)
+        if self._full:
+            return [absolute_range_name(self.worksheet, f"A1:{col}")]
+        first = len(self.rows) + 2 - len(self._check_rows())     # header = rad 1
+        return [
+            absolute_range_name(self.worksheet, f"A1:{col}1"),
+            absolute_range_name(self.worksheet, f"A{first}:{col}"),
+        ]
+
+    def apply(self, results):
+        """Ta imot verdiene for ranges(). Returnerer False hvis full resynk trengs."""
+        if self._full:
+            values = results[0] if results else []
+            frame = self.builder(values)
+            self.header = list(values[0]) if values else []
+            self.rows = [list(r) for r in values[1:]]
+            self.frame = frame
+            self.synced_at = time.time()
+            self._full = False
+            self.full_syncs += 1
+            if self.store is not None:
+                self._persist(0)
+            return True
+
+        header_vals, tail = results
+        header = header_vals[0] if header_vals else []
+        check = self._check_rows()
+        if (_trim(header) != _trim(self.header) or len(tail) < len(check)
+                or any(_trim(a) != _trim(b) for a, b in zip(tail, check))):
+            return False
+
+        new_rows = [list(r) for r in tail[len(check):]]
+        if new_rows:
+            added = self.builder([self.header] + new_rows)
+            # Samme (utvidede) kategorier på begge, ellers faller concat tilbake til object
+            old = compact_frame(self.frame.copy())
+            self.frame = canonical(pd.concat([old, compact_frame(added)], ignore_index=True))
+            self.rows.extend(new_rows)
+            self.appended_rows += len(new_rows)
+            if self.store is not None:
+                self._persist(len(self.rows) - len(new_rows))
+        return True
+
+    def values(self):
+        return [self.header] + self.rows if self.header else []
+
+
+class SheetLoader:
+    """Henter alle arkfanene i ÉN values_batch_get per oppfrisking.
+
+    worksheets:  {visning: arkfane}
+    append_only: visninger som synkes inkrementelt (se AppendOnlySheet)
+    check_modified: spør Drive om modifiedTime først og hopp over hentingen hvis
+                    regnearket ikke er endret (men hent uansett etter max_skip sekunder)
+    split:       én values_batch_get per arkfane, kjørt parallelt på en trådpool med
+                 max_workers tråder (tid ≈ tregeste ark), i stedet for ÉN samlet batch
+    budget:      ApiBudget som deles med de andre butikkenes loadere (None = ingen grense)
+    sync_store:  snapshot_store.SyncStore for append-only-arkenes rå rader (se AppendOnlySheet)
+    """
+
+    def __init__(self, gc, sheet_id, worksheets, append_only=(),
+                 check_modified=True, max_skip=900, split=False, max_workers=4, budget=None,
+                 sync_store=None):
+        self.gc = gc
+        self.sheet_id = sheet_id
+        self.worksheets = dict(worksheets)
+        self.syncs = {
+            view: AppendOnlySheet(self.worksheets[view], VIEW_BUILDERS[view], store=sync_store)
+            for view in append_only
+        }
+        self.check_modified = check_modified
+        self.max_skip = max_skip
+        self.skipped = 0
+        self._sh = None
+        self._modified = None          # modifiedTime ved siste fulle henting
+        self._fetched_at = 0.0
+        self._built = {}               # visning → (innholdsnøkkel, ramme) fra forrige build
+        self.split = split
+        self.max_workers = max_workers
+        self.budget = budget
+        self._pool = None
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="sheets-fetch")
+        return self._pool
+
+    def _get(self, sh, groups):
+        """Verdier for hver gruppe A1-områder: samlet i ÉN values_batch_get, eller (split)
+           én forespørsel per gruppe parallelt. Klienten (og HTTP-sesjonen) deles."""
+        def one(ranges):
+            resp = api_call("values_batch_get", sh.values_batch_get, ranges,
+                            budget=self.budget, coalesce=(self.sheet_id, tuple(ranges)))
+            return [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+
+        if self.split and len(groups) > 1:
+            return list(self._executor().map(one, groups))
+        flat = one([r for g in groups for r in g])
+        out, i = [], 0
+        for g in groups:
+            out.append(flat[i:i + len(g)])
+            i += len(g)
+        return out
+
+    def _spreadsheet(self):
+        if self._sh is None:
+            self._sh = api_call("open_by_key", self.gc.open_by_key, self.sheet_id,   # én gang
+                                budget=self.budget, coalesce=self.sheet_id)
+        return self._sh
+
+    def _modified_time(self, sh):
+        """Drive modifiedTime (én liten forespørsel), eller None hvis ukjent."""
+        try:
+            getter = getattr(sh, "get_lastUpdateTime", None)
+            if getter is None:
+                return sh.lastUpdateTime
+            return api_call("get_lastUpdateTime", getter, budget=self.budget, coalesce=self.sheet_id)
+        except Exception:
+            return None
+
+    def invalidate(self):
+        """Neste fetch henter alt uansett modifiedTime (f.eks. etter en import – Drive
+           kan melde samme modifiedTime en stund etter en skriving)."""
+        self._modified = None
+
+    def fetch(self):
+        """Returnerer {arkfane: rå verdier} – én batch-forespørsel (to ved resynk).
+           Returnerer None (uten å hente verdier) hvis regnearket er uendret."""
+        with METRICS.time("rr_stage_seconds", stage="fetch"):
+            return self._fetch()
+
+    def _fetch(self):
+        sh = self._spreadsheet()
+        modified = self._modified_time(sh) if self.check_modified else None
+        if (modified is not None and modified == self._modified
+                and time.time() - self._fetched_at <= self.max_skip):
+            self.skipped += 1
+            return None
+        full = list(dict.fromkeys(
+            ws for view, ws in self.worksheets.items() if view not in self.syncs
+        ))
+        groups = [[absolute_range_name(ws)] for ws in full]
+        groups += [sync.ranges() for sync in self.syncs.values()]
+        got = self._get(sh, groups)
+        values = {ws: got[i][0] for i, ws in enumerate(full)}
+
+        for (view, sync), results in zip(self.syncs.items(), got[len(full):]):
+            ok = self._apply(view, sync, results)
+            if ok is False:
+                sync.synced_at = 0.0        # full synk; den gamle rammen beholdes til den er ferdig
+                results = self._get(sh, [sync.ranges()])[0]     # nettverksfeil feiler hentingen
+                self._apply(view, sync, results)
+            values[sync.worksheet] = sync.values()
+        self._modified = modified
+        self._fetched_at = time.time()
+        return values
+
+    @staticmethod
+    def _apply(view, sync, results):
+        """sync.apply(results) med parse-feil per visning (som build_frames): feilen lagres
+           i sync.error og synken nullstilles, så neste henting starter med full synk.
+           Returnerer apply-resultatet, eller None ved feil."""
+        try:
+            with METRICS.time("rr_stage_seconds", stage="parse", view=view):
+                ok = sync.apply(results)
+        except Exception as e:
+            sync.reset()
+            sync.error = e
+            return None
+        sync.error = None
+        return ok
+
+    def fingerprint(self, values):
+        """Billig innholdsnøkkel for et sett rå verdier (lik nøkkel = samme data).
+           Append-only-ark representeres av header, antall rader og siste rad."""
+        h = hashlib.blake2b(digest_size=16)
+        synced = {sync.worksheet: sync for sync in self.syncs.values()}
+        for ws in sorted(values):
+            sync = synced.get(ws)
+            if sync is not None:
+                key = (sync.header, len(sync.rows), sync.rows[-1] if sync.rows else None,
+                       sync.full_syncs, repr(sync.error))
+            else:
+                key = values[ws]
+            h.update(ws.encode())
+            h.update(repr(key).encode())
+        return h.hexdigest()
+
+    def build(self, values):
+        """{visning: DataFrame/Exception}; append-only-visninger bruker lagret ramme.
+           En arkfane med uendret innhold gjenbruker forrige ramme (samme objekt), så
+           bare visningene som faktisk er endret parses, aggregeres og lagres på nytt."""
+        frames = {}
+        for view, ws in self.worksheets.items():
+            if view in self.syncs:
+                sync = self.syncs[view]
+                frames[view] = sync.error if sync.error is not None else sync.frame
+                continue
+            raw = values.get(ws, [])
+            key = hashlib.blake2b(repr(raw).encode(), digest_size=16).digest()
+            prev = self._built.get(view)
+            if prev is not None and prev[0] == key:
+                frames[view] = prev[1]
+                continue
+            frames.update(build_frames(values, {view: ws}))
+            self._built[view] = (key, frames[view])
+        return frames
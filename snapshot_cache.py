@@ -0,0 +1,199 @@
+"""
+Prosess-felles øyeblikksbilde av regnearket med bakgrunnsoppfrisking.
+
+Én tråd henter og parser arkene litt FØR de går ut på dato, og bytter inn et
+nytt, ferdig bygget Snapshot atomisk. Sesjonene leser alltid siste ferdige
+snapshot (O(1)) og blokkerer aldri på Google – bortsett fra aller første
+lasting etter oppstart når det ikke finnes noen lagret kopi (se seed()).
+"""
+import threading
+import time
+from dataclasses import dataclass, field, replace
+
+from metrics import METRICS
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Ett ferdig bygget øyeblikksbilde. Skal behandles som skrivebeskyttet."""
+    generation: int
+    fetched_at: float                       # time.time() ved ferdig henting
+    values: dict                            # {arkfane: rå verdier}
+    frames: dict = field(default_factory=dict)  # {visning: DataFrame eller Exception}
+    aggregates: dict = field(default_factory=dict)  # {visning: dict eller Exception}
+    source: str = "sheets"                  # "sheets" (ferskt) eller "disk" (lagret kopi)
+    content_key: str = None                 # innholdsnøkkel (samme nøkkel = samme data)
+
+    @property
+    def age(self):
+        """Sekunder siden snapshotet ble hentet."""
+        return time.time() - self.fetched_at
+
+    def frame(self, view):
+        """DataFrame for en visning. Parse-feil for akkurat den visningen kastes her,
+           slik at de andre visningene fortsatt fungerer."""
+        obj = self.frames[view]
+        if isinstance(obj, Exception):
+            raise obj
+        return obj
+
+    def aggregate(self, view):
+        """Forhåndsberegnede tall/tabeller for en visning (se aggregates.py)."""
+        obj = self.aggregates[view]
+        if isinstance(obj, Exception):
+            raise obj
+        return obj
+
+
+class SnapshotRefresher:
+    """Bakgrunnstråd som holder et Snapshot ferskt.
+
+    fetch()            -> {arkfane: rå verdier}, eller None hvis kilden er uendret
+    build(values)      -> {visning: DataFrame/Exception} (CPU)
+    aggregate(frames)  -> {visning: dict/Exception}      (CPU, valgfri)
+    fingerprint(values) – innholdsnøkkel; uendret innhold gir ingen ny generasjon
+    on_refresh(snap)   – kalles etter hvert vellykkede oppfrisk (f.eks. lagring til disk)
+    invalidate()       – neste fetch henter alt (refresh(force=True)), valgfri
+    interval       – sekunder mellom vellykkede oppfriskinger
+    retry_interval – sekunder før nytt forsøk etter feil (siste gode snapshot beholdes)
+    name           – trådnavn (f.eks. én refresher per butikk)
+    """
+
+    def __init__(self, fetch, build, aggregate=None, fingerprint=None, on_refresh=None,
+                 invalidate=None, interval=240, retry_interval=30, name="snapshot-refresher"):
+        self._fetch = fetch
+        self._invalidate = invalidate
+        self._build = build
+        self._aggregate = aggregate
+        self._fingerprint = fingerprint
+        self._on_refresh = on_refresh
+        self.interval = interval
+        self.retry_interval = retry_interval
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()   # én oppfrisking om gangen (tråd + manuelt)
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._generation = 0
+        self.last_error = None
+
+    # ---- livssyklus ----
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=self.name, daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            ok = self.refresh()
+            self._stop.wait(self.interval if ok else self.retry_interval)
+
+    def seed(self, fetched_at, frames):
+        """Start med en lagret kopi (generasjon 0) til første ferske henting er klar."""
+        aggs = self._aggregate(frames) if self._aggregate else {}
+        with self._lock:
+            if self._snapshot is None:
+                self._snapshot = Snapshot(
+                    generation=0,
+                    fetched_at=fetched_at,
+                    values={},
+                    frames=frames,
+                    aggregates=aggs,
+                    source="disk",
+                )
+        self._ready.set()
+        return self
+
+    # ---- oppfrisking ----
+    def refresh(self, force=False):
+        """Hent + bygg et nytt snapshot og bytt det inn. Returnerer True ved suksess.
+           Er innholdet uendret, beholdes generasjonen (sesjonene trenger ikke rerun).
+           Kan kalles direkte (f.eks. etter en import) – kall serialiseres.
+           force: hent alt selv om kilden melder uendret (invalidate før henting)."""
+        with self._refresh_lock:
+            if force and self._invalidate is not None:
+                self._invalidate()
+            return self._refresh()
+
+    def _refresh(self):
+        try:
+            values = self._fetch()
+            current = self._snapshot
+            key = None
+            if values is not None and self._fingerprint is not None:
+                key = self._fingerprint(values)
+            unchanged = current is not None and current.source == "sheets" and (
+                values is None or (key is not None and key == current.content_key)
+            )
+            if not unchanged:
+                if values is None:      # "uendret", men ingenting ferskt å vise ennå
+                    raise RuntimeError("Kilden rapporterte uendret uten tidligere data.")
+                frames = self._build(values)
+                aggs = self._aggregate(frames) if self._aggregate else {}
+        except Exception as e:  # behold siste gode snapshot
+            METRICS.inc("rr_snapshot_refresh_total", result="error")
+            self.last_error = e
+            self._ready.set()   # slipp ventende sesjoner (de får feilen)
+            return False
+
+        with self._lock:
+            if unchanged:
+                snap = replace(current, fetched_at=time.time())
+            else:
+                self._generation += 1
+                snap = Snapshot(
+                    generation=self._generation,
+                    fetched_at=time.time(),
+                    values=values,
+                    frames=frames,
+                    aggregates=aggs,
+                    content_key=key,
+                )
+            self._snapshot = snap
+        METRICS.inc("rr_snapshot_refresh_total", result="unchanged" if unchanged else "changed")
+        self.last_error = None
+        self._ready.set()
+        if self._on_refresh is not None:
+            try:
+                self._on_refresh(snap)
+            except Exception as e:  # lagring skal aldri stoppe oppfriskingen
+                self.last_error = e
+        return True
+
+    # ---- lesing ----
+    @property
+    def generation(self):
+        return self._generation
+
+    def peek(self):
+        """Siste snapshot uten å vente (None hvis ingenting er lastet ennå)."""
+        return self._snapshot
+
+    def wait(self, timeout=60):
+        """Som current(), men None i stedet for feil (feilen ligger i last_error)."""
+        if self._snapshot is None:
+            self._ready.wait(timeout)
+        return self._snapshot
+
+    def current(self, timeout=60):
+        """Siste ferdige snapshot. Venter kun hvis det ennå ikke finnes noe."""
+        snap = self._snapshot
+        if snap is not None:
+            return snap
+        self._ready.wait(timeout)
+        snap = self._snapshot
+        if snap is None:
+            if self.last_error is not None:
+                raise self.last_error
+            raise TimeoutError("Ingen data fra regnearket ennå.")
+        return snap
@@ -0,0 +1,179 @@
+"""
+Lokal, persistent kopi av siste vellykkede snapshot (SQLite, kun stdlib).
+
+Hvert vellykkede oppfrisk skrives hit (én tabell per visning, med indekser på
+merke/status/tekniker/dato). Ved oppstart lastes siste kopi umiddelbart, slik at
+første side vises med en gang – merket med alder – mens bakgrunnstråden henter
+ferske data. Er Google nede, vises siste kopi i stedet for en feilmelding.
+
+Visninger som synkes inkrementelt (AppendOnlySheet, f.eks. Innlevert) lagres
+ikke som egen tabell: de rå radene ligger allerede i SyncStore (samme fil, bare
+nye rader skrives per henting), og rammen bygges fra dem ved load.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from sheet_data import VIEW_BUILDERS, canonical
+
+INDEXED_COLUMNS = ("Merke", "Status", "Tekniker", "Innlevert", "Dato")
+
+
+def _table(view):
+    return f"frame_{view.lower()}"
+
+
+class SnapshotStore:
+    """SQLite-fil med siste snapshot. Trådsikker (ny forbindelse per kall).
+
+    synced: {visning: arkfane} for append-only-visningene – lagres ikke her, men
+            bygges fra SyncStore (samme fil) ved load
+    """
+
+    def __init__(self, path, synced=None):
+        self.path = path
+        self.synced = dict(synced or {})
+        self._lock = threading.Lock()
+        self._saved = {}                # visning → ramme som sist ble skrevet
+        self._dropped = False           # gamle tabeller for synced-visningene er fjernet
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS meta (view TEXT PRIMARY KEY, fetched_at REAL, "
+            "generation INTEGER, dates TEXT)"
+        )
+        return con
+
+    def save(self, snapshot):
+        """Skriv visningenes rammer. Uendrede rammer (samme objekt) hoppes over."""
+        with self._lock, self._connect() as con:
+            if not self._dropped:       # kopier fra før visningen ble synket inkrementelt
+                for view in self.synced:
+                    con.execute(f'DROP TABLE IF EXISTS "{_table(view)}"')
+                    con.execute("DELETE FROM meta WHERE view=?", (view,))
+                self._dropped = True
+            for view, frame in snapshot.frames.items():
+                if view in self.synced:
+                    continue    # rå rader ligger i SyncStore
+                if not isinstance(frame, pd.DataFrame):
+                    continue    # parse-feil: behold forrige lagrede versjon
+                if self._saved.get(view) is frame:
+                    con.execute(
+                        "UPDATE meta SET fetched_at=?, generation=? WHERE view=?",
+                        (snapshot.fetched_at, snapshot.generation, view),
+                    )
+                    continue
+                table = _table(view)
+                dates = [c for c in frame.columns if pd.api.types.is_datetime64_any_dtype(frame[c])]
+                out = frame.astype({c: str for c in frame.columns if c not in dates})
+                out.to_sql(table, con, if_exists="replace", index=False)
+                for col in frame.columns:
+                    if col in INDEXED_COLUMNS:
+                        con.execute(
+                            f'CREATE INDEX IF NOT EXISTS "ix_{table}_{col.lower()}" '
+                            f'ON "{table}" ("{col}")'
+                        )
+                con.execute(
+                    "INSERT OR REPLACE INTO meta (view, fetched_at, generation, dates) "
+                    "VALUES (?, ?, ?, ?)",
+                    (view, snapshot.fetched_at, snapshot.generation, json.dumps(dates)),
+                )
+                self._saved[view] = frame
+
+    def load(self):
+        """(fetched_at, {visning: DataFrame}) fra siste lagrede kopi, eller None."""
+        if not os.path.exists(self.path):
+            return None
+        with self._lock, self._connect() as con:
+            meta = con.execute("SELECT view, fetched_at, dates FROM meta").fetchall()
+            if not meta:
+                return None
+            meta = [m for m in meta if m[0] not in self.synced]
+            if not meta:
+                return None
+            frames = {}
+            for view, _, dates in meta:
+                df = pd.read_sql_query(f'SELECT * FROM "{_table(view)}"', con)
+                for col in json.loads(dates or "[]"):
+                    df[col] = pd.to_datetime(df[col], errors="coerce").astype("datetime64[s]")
+                frames[view] = canonical(df)
+        sync = SyncStore(self.path)
+        for view, worksheet in self.synced.items():
+            try:
+                saved = sync.load(worksheet)
+                if saved is not None:
+                    header, rows, _ = saved
+                    frames[view] = VIEW_BUILDERS[view]([header] + rows)
+            except Exception:
+                pass            # visningen mangler i kopien til første henting
+        # Eldste visning bestemmer alderen på hele kopien
+        return min(m[1] for m in meta), frames
+
+
+class SyncStore:
+    """Rå rader for append-only-ark (sheet_data.AppendOnlySheet), i samme SQLite-fil som
+       snapshotet. Etter omstart fortsetter synken fra siste lagrede rad (bare halen
+       hentes), i stedet for å laste ned hele historikken på nytt. synced_at (siste fulle
+       synk) lagres også, så intervallet for full resynk gjelder på tvers av omstarter."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS sync_meta (worksheet TEXT PRIMARY KEY, header TEXT, "
+            "synced_at REAL NOT NULL DEFAULT 0)"
+        )
+        if "synced_at" not in {r[1] for r in con.execute("PRAGMA table_info(sync_meta)")}:
+            con.execute("ALTER TABLE sync_meta ADD COLUMN synced_at REAL NOT NULL DEFAULT 0")
+        con.execute(
+            "CREATE TABLE IF NOT EXISTS sync_rows (worksheet TEXT, i INTEGER, cells TEXT, "
+            "PRIMARY KEY (worksheet, i))"
+        )
+        return con
+
+    def load(self, worksheet):
+        """(header, rader, synced_at) for arkfanen, eller None hvis ingenting er lagret."""
+        if not os.path.exists(self.path):
+            return None
+        with self._lock, self._connect() as con:
+            meta = con.execute(
+                "SELECT header, synced_at FROM sync_meta WHERE worksheet=?", (worksheet,)
+            ).fetchone()
+            if meta is None:
+                return None
+            rows = con.execute(
+                "SELECT cells FROM sync_rows WHERE worksheet=? ORDER BY i", (worksheet,)
+            ).fetchall()
+        return json.loads(meta[0]), [json.loads(r[0]) for r in rows], meta[1]
+
+    def save(self, worksheet, header, rows, start=0, synced_at=None):
+        """Lagre rader fra posisjon `start` (0 = full synk: erstatt alt for arkfanen).
+           synced_at: tidspunkt for full synk (None = behold det lagrede)."""
+        with self._lock, self._connect() as con:
+            if start == 0:
+                con.execute("DELETE FROM sync_rows WHERE worksheet=?", (worksheet,))
+            else:
+                con.execute("DELETE FROM sync_rows WHERE worksheet=? AND i>=?", (worksheet, start))
+            con.execute(
+                "INSERT INTO sync_meta (worksheet, header, synced_at) VALUES (?, ?, COALESCE(?, 0)) "
+                "ON CONFLICT (worksheet) DO UPDATE SET header=excluded.header, "
+                "synced_at=COALESCE(?, sync_meta.synced_at)",
+                (worksheet, json.dumps(header), synced_at, synced_at),
+            )
+            con.executemany(
+                "INSERT INTO sync_rows (worksheet, i, cells) VALUES (?, ?, ?)",
+                ((worksheet, start + k, json.dumps(r)) for k, r in enumerate(rows)),
+            )
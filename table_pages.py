@@ -0,0 +1,140 @@
+"""
+Server-side paginering av store tabeller (sortering, filter og søk).
+
+"Vis tabell" sendte hele rammen (titusenvis av rader) til nettleseren. En
+TablePager holder i stedet ferdige indekser for én (delt, skrivebeskyttet)
+ramme og returnerer bare den synlige siden:
+
+    pager = pager_for(df)
+    page = pager.page(search="apple", sort="Innlevert", ascending=False,
+                      filters={"Merke": ["Apple"]}, page=0, page_size=50)
+    page.rows, page.matches, page.pages
+
+Søket går mot de UNIKE verdiene per kolonne (slik de vises, datoer som
+dd.mm.yyyy) og slås opp via heltallskoder, ikke tekst per rad. Kodene og
+sorteringsrekkefølgene bygges første gang de trengs og gjenbrukes så lenge
+rammen er den samme – dvs. frem til neste snapshot.
+"""
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from frame_filters import _Lru, _lookup
+
+PAGE_SIZES = (25, 50, 100, 250)
+DATE_FORMAT = "%d.%m.%Y"
+MAX_PAGERS = 16             # rammer med ferdige indekser (alle visninger, to snapshots)
+
+
+@dataclass
+class Page:
+    rows: pd.DataFrame      # radene på siden (original indeks beholdes)
+    matches: int            # rader som matcher søk/filter
+    page: int               # 0-basert sidenummer (klippet til gyldig område)
+    pages: int              # antall sider (minst 1)
+
+
+def _search_codes(s):
+    """Kolonne → (kode per rad, unike verdier som små-bokstavtekst). Kode -1 = tom."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+    else:
+        codes, uniques = pd.factorize(s)
+    if pd.api.types.is_datetime64_any_dtype(uniques):
+        text = pd.DatetimeIndex(uniques).strftime(DATE_FORMAT)
+    else:
+        text = pd.Index(uniques).astype(str)
+    return codes, [t.lower() for t in text]
+
+
+def _sort_order(s, ascending):
+    """Posisjoner i sortert rekkefølge (stabil, tomme sist). Kategorier sorteres på tekst."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        s = s.cat.reorder_categories(sorted(s.cat.categories, key=lambda c: str(c).lower()))
+    s = s.reset_index(drop=True)
+    return s.sort_values(ascending=ascending, kind="stable", na_position="last").index.to_numpy()
+
+
+class TablePager:
+    """Ferdige søke-/sorteringsindekser for én ramme. Trådsikker; rammen endres aldri."""
+
+    def __init__(self, df):
+        self.df = df
+        self._lock = threading.Lock()
+        self._codes = None
+        self._orders = {}
+
+    def _search(self, needle):
+        """Rader der minst én kolonne inneholder needle (delstreng, uten store/små bokstaver)."""
+        with self._lock:
+            if self._codes is None:
+                self._codes = [_search_codes(self.df[c]) for c in self.df.columns]
+        mask = np.zeros(len(self.df), dtype=bool)
+        for codes, text in self._codes:
+            hit = np.fromiter((needle in t for t in text), dtype=bool, count=len(text))
+            if hit.any():
+                mask |= np.append(hit, False)[codes]
+        return mask
+
+    def _order(self, col, ascending):
+        key = (col, ascending)
+        with self._lock:
+            order = self._orders.get(key)
+            if order is None:
+                order = self._orders[key] = _sort_order(self.df[col], ascending)
+        return order
+
+    def options(self, col):
+        """Verdier for et filter på kolonnen (sortert)."""
+        s = self.df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            vals = s.cat.categories[np.unique(s.cat.codes[s.cat.codes >= 0])]
+        else:
+            vals = s.dropna().unique()
+        return sorted(vals, key=lambda v: str(v).lower())
+
+    def mask(self, search="", filters=None, where=None):
+        """Bool-maske for rader som matcher søk og filter (None = alle rader).
+           where: ferdig bitmap fra f.eks. frame_filters.row_mask (AND-es inn)."""
+        mask = where
+        for col, allowed in (filters or {}).items():
+            if not allowed:
+                continue
+            m = _lookup(self.df[col], allowed)      # kategorikoder, som frame_filters
+            mask = m if mask is None else mask & m
+        needle = (search or "").strip().lower()
+        if needle:
+            m = self._search(needle)
+            mask = m if mask is None else mask & m
+        return mask
+
+    def page(self, search="", sort=None, ascending=True, filters=None, page=0, page_size=50,
+             where=None):
+        mask = self.mask(search, filters, where)
+        if sort is not None:
+            order = self._order(sort, ascending)
+            if mask is not None:
+                order = order[mask[order]]
+        else:
+            order = np.flatnonzero(mask) if mask is not None else None
+            if not ascending:               # radrekkefølgen i arket, baklengs
+                order = (np.arange(len(self.df)) if order is None else order)[::-1]
+        matches = len(self.df) if order is None else len(order)
+        pages = max((matches + page_size - 1) // page_size, 1)
+        page = min(max(int(page), 0), pages - 1)
+        start = page * page_size
+        if order is None:
+            rows = self.df.iloc[start:start + page_size]
+        else:
+            rows = self.df.iloc[order[start:start + page_size]]
+        return Page(rows=rows, matches=matches, page=page, pages=pages)
+
+
+_pagers = _Lru("table_pager", MAX_PAGERS)
+
+
+def pager_for(df):
+    """Delt TablePager per ramme-objekt (nøkkel = id; pageren holder rammen i live)."""
+    return _pagers.get(id(df), lambda: TablePager(df))
@@ -0,0 +1,88 @@
+"""
+Butikker (tenants): ett regneark per verksted, alle i samme deployment.
+
+Uten [stores] i secrets er det én butikk ("default") med de gamle nøklene
+(sheet_id, worksheet, worksheet_innlevert, …), og cache-filene ligger der de
+alltid har ligget. Med flere butikker:
+
+    [stores.oslo]
+    name     = "Oslo"
+    sheet_id = "1AbC…"
+
+    [stores.bergen]
+    name      = "Bergen"
+    sheet_id  = "1XyZ…"
+    worksheet = "Reparert"            # samme nøkler som øverst i secrets
+    [stores.bergen.sources.Inhouse]   # valgfritt, som [sources.*] (data_sources.py)
+    type = "sqlite"
+    path = "data/bergen.sqlite"
+
+Arkfaner og kilder som ikke er satt for en butikk arves fra toppnivået.
+Butikknøkkelen brukes i URL-en (?butikk=oslo), i cache-nøklene og i stiene
+til lokale filer (snapshot/arkiv), så ingen butikk kan se en annens data.
+"""
+import os
+import re
+from dataclasses import dataclass, field
+
+DEFAULT_KEY = "default"
+
+# Visning → secrets-nøkkel for arkfanen (og standardverdi)
+WORKSHEET_KEYS = {
+    "Reparert":  ("worksheet", "Sheet1"),
+    "Innlevert": ("worksheet_innlevert", "Sheet2"),
+    "Inhouse":   ("worksheet_inhouse", "Sheet3"),
+    "Arbeidet":  ("worksheet_arbeidet", "Sheet5"),
+}
+
+_KEY_RE = re.compile(r"^[a-z0-9][a-z0-9_-]*$")
+
+
+@dataclass(frozen=True)
+class Tenant:
+    key: str                    # URL/cache-nøkkel (små bokstaver, tall, - og _)
+    name: str                   # visningsnavn
+    sheet_id: str
+    worksheets: dict = field(hash=False)    # {visning: arkfane}
+    sources: dict = field(hash=False)       # {visning: kildekonfig} (data_sources.make_sources)
+
+
+def worksheets_from(cfg, inherited=None):
+    """{visning: arkfane} fra et secrets-avsnitt, med arv fra `inherited`."""
+    inherited = inherited or {}
+    return {
+        view: cfg.get(key, inherited.get(view, default))
+        for view, (key, default) in WORKSHEET_KEYS.items()
+    }
+
+
+def load_tenants(secrets):
+    """{nøkkel: Tenant} i rekkefølgen fra secrets. Minst én (standardbutikken)."""
+    base_ws = worksheets_from(secrets)
+    base_sources = {view: dict(cfg) for view, cfg in secrets.get("sources", {}).items()}
+    stores = secrets.get("stores", {})
+    if not stores:
+        return {DEFAULT_KEY: Tenant(
+            DEFAULT_KEY, secrets.get("store_name", "Butikk"), secrets.get("sheet_id"),
+            base_ws, base_sources,
+        )}
+
+    tenants = {}
+    for key, cfg in stores.items():
+        if not _KEY_RE.match(key):
+            raise ValueError(f"Ugyldig butikknøkkel {key!r} (små bokstaver, tall, - og _)")
+        sources = {**base_sources, **{v: dict(c) for v, c in cfg.get("sources", {}).items()}}
+        tenants[key] = Tenant(
+            key, cfg.get("name", key), cfg.get("sheet_id"),
+            worksheets_from(cfg, base_ws), sources,
+        )
+    return tenants
+
+
+def tenant_path(path, key):
+    """Lokal fil for en butikk: .cache/x.sqlite → .cache/<nøkkel>/x.sqlite.
+       Standardbutikken beholder stien (eksisterende kopier brukes videre)."""
+    if key == DEFAULT_KEY:
+        return path
+    head, tail = os.path.split(path)
+    return os.path.join(head, key, tail)
@@ -0,0 +1,5 @@
+"""Felles oppsett for testene: repo-roten på sys.path (modulene ligger flatt der)."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
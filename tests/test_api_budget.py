@@ -0,0 +1,114 @@
+"""ApiBudget: sammenslåing av like kall, token-bøtte og tak på samtidige kall."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from gspread.exceptions import APIError
+
+from fake_sheets import FakeSpreadsheet, api_error
+from sheet_data import ApiBudget, api_call
+
+
+def _book():
+    return {"Sheet1": [["Merke", "Tekniker"], ["Apple", "Nils"]]}
+
+
+def _concurrent(n, fn):
+    with ThreadPoolExecutor(n) as pool:
+        return [f.result() for f in [pool.submit(fn) for _ in range(n)]]
+
+
+def test_concurrent_identical_calls_share_one_request():
+    sh = FakeSpreadsheet(_book(), latency=0.2)
+    budget = ApiBudget(max_concurrent=4)
+    call = lambda: api_call("values_batch_get", sh.values_batch_get, ["'Sheet1'"],  # noqa: E731
+                            budget=budget, coalesce=("fake", ("'Sheet1'",)))
+    results = _concurrent(4, call)
+    assert sh.calls == 1
+    assert budget.coalesced == 3
+    assert all(r is results[0] for r in results)
+
+
+def test_different_keys_are_not_coalesced():
+    sh = FakeSpreadsheet(_book(), latency=0.05)
+    budget = ApiBudget(max_concurrent=4)
+    with ThreadPoolExecutor(2) as pool:
+        for f in [pool.submit(api_call, "values_batch_get", sh.values_batch_get, [rng],
+                              budget=budget, coalesce=("fake", (rng,)))
+                  for rng in ("'Sheet1'!A1:B1", "'Sheet1'!A2:B")]:
+            f.result()
+    assert sh.calls == 2
+    assert budget.coalesced == 0
+
+
+def test_coalesced_callers_share_the_error():
+    started, release = threading.Event(), threading.Event()
+
+    def failing():
+        started.set()
+        release.wait(5)
+        raise api_error(403)                # ikke 429/5xx: ingen nye forsøk
+
+    budget = ApiBudget()
+    with ThreadPoolExecutor(3) as pool:
+        leader = pool.submit(api_call, "values_batch_get", failing, budget=budget, coalesce="k")
+        started.wait(5)
+        followers = [pool.submit(api_call, "values_batch_get", failing, budget=budget,
+                                 coalesce="k") for _ in range(2)]
+        while budget.coalesced < 2:
+            time.sleep(0.01)
+        release.set()
+        for f in [leader] + followers:
+            with pytest.raises(APIError):
+                f.result()
+    assert budget.coalesced == 2
+
+
+def test_coalesced_call_retries_once_for_everyone():
+    sh = FakeSpreadsheet(_book(), latency=0.1)
+    sh.fail(429, times=1, retry_after=0)
+    budget = ApiBudget()
+    call = lambda: api_call("values_batch_get", sh.values_batch_get, ["'Sheet1'"],  # noqa: E731
+                            budget=budget, coalesce="k")
+    results = _concurrent(3, call)
+    assert sh.calls == 2                    # ett feilet kall + ett nytt forsøk, delt av alle
+    assert sh.errors == 1
+    assert all(r["valueRanges"][0]["values"] == _book()["Sheet1"] for r in results)
+
+
+def test_token_bucket_throttles_reads_after_burst():
+    sh = FakeSpreadsheet(_book())
+    budget = ApiBudget(reads_per_minute=1200, burst=2)     # 2 med en gang, så ~20/s
+    t0 = time.monotonic()
+    for _ in range(6):
+        api_call("values_batch_get", sh.values_batch_get, ["'Sheet1'"], budget=budget)
+    elapsed = time.monotonic() - t0
+    assert budget.throttled == 4
+    assert elapsed >= 4 / budget.bucket.rate * 0.9
+
+
+def test_drive_calls_are_not_throttled():
+    sh = FakeSpreadsheet(_book())
+    budget = ApiBudget(reads_per_minute=60, burst=1)
+    for _ in range(3):
+        api_call("get_lastUpdateTime", sh.get_lastUpdateTime, budget=budget)
+    assert budget.throttled == 0
+
+
+def test_max_concurrent_caps_calls_in_flight():
+    lock = threading.Lock()
+    active = peak = 0
+
+    def slow():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.05)
+        with lock:
+            active -= 1
+
+    budget = ApiBudget(max_concurrent=2)
+    _concurrent(6, lambda: api_call("values_batch_get", slow, budget=budget))
+    assert peak == 2
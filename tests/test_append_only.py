@@ -0,0 +1,102 @@
+"""AppendOnlySheet via SheetLoader mot fake_sheets: hale, sletting, resynk og 429/5xx."""
+import pytest
+from gspread.exceptions import APIError
+
+import sheet_data
+from fake_sheets import FakeClient
+from sheet_data import AppendOnlySheet, SheetLoader, frame_innlevert
+
+
+def _book(rows):
+    return {"Sheet2": [["Merke", "Innlevert"]] + [list(r) for r in rows]}
+
+
+def _loader(book, **kwargs):
+    client = FakeClient(book=book)
+    loader = SheetLoader(client, "fake", {"Innlevert": "Sheet2"}, append_only=("Innlevert",),
+                         check_modified=False, **kwargs)
+    return client.spreadsheet, loader
+
+
+def _brands(loader):
+    return list(frame_innlevert(loader.fetch()["Sheet2"])["Merke"].astype(str))
+
+
+def test_only_new_rows_are_appended():
+    sh, loader = _loader(_book([("Samsung", "01.10.2026"), ("Apple", "02.10.2026")]))
+    assert _brands(loader) == ["Samsung", "Apple"]
+    sh.append_rows("Sheet2", [("LG", "03.10.2026"), ("Sony", "04.10.2026")])
+    assert _brands(loader) == ["Samsung", "Apple", "LG", "Sony"]
+    sync = loader.syncs["Innlevert"]
+    assert (sync.full_syncs, sync.appended_rows) == (1, 2)
+    assert list(sync.frame["Merke"].astype(str)) == ["Samsung", "Apple", "LG", "Sony"]
+
+
+def test_deleted_row_forces_full_resync():
+    sh, loader = _loader(_book([("Samsung", "01.10.2026"), ("Apple", "02.10.2026")]))
+    loader.fetch()
+    # Slettet rad + ny rad nederst: like mange rader, men halen er forskjøvet
+    del sh.book["Sheet2"][1]
+    sh.append_rows("Sheet2", [("Apple", "03.10.2026")])
+    assert _brands(loader) == ["Apple", "Apple"]
+    sync = loader.syncs["Innlevert"]
+    assert sync.full_syncs == 2
+    assert list(sync.frame["Innlevert"].dt.day) == [2, 3]
+
+
+def test_edit_above_tail_is_caught_by_resync_interval():
+    rows = [("Samsung", f"{d:02d}.10.2026") for d in range(1, 11)]
+    sh, loader = _loader(_book(rows))
+    sync = loader.syncs["Innlevert"] = AppendOnlySheet(
+        "Sheet2", frame_innlevert, tail_rows=3, resync_seconds=3600)
+    loader.fetch()
+    sh.book["Sheet2"][1] = ["Apple", "01.10.2026"]     # over halen: usynlig for halesjekken
+    assert _brands(loader)[0] == "Samsung"
+    assert sync.full_syncs == 1
+    sync.synced_at -= 3600                  # intervallet er gått
+    assert _brands(loader)[0] == "Apple"
+    assert sync.full_syncs == 2
+
+
+def test_changed_header_forces_full_resync():
+    sh, loader = _loader(_book([("Samsung", "01.10.2026")]))
+    loader.fetch()
+    sh.book["Sheet2"][0] = ["Brand", "Innlevert"]
+    loader.fetch()
+    assert loader.syncs["Innlevert"].full_syncs == 2
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_fetch_retries_rate_limit_and_server_errors(status):
+    sh, loader = _loader(_book([("Samsung", "01.10.2026")]))
+    loader.fetch()
+    sh.append_rows("Sheet2", [("Apple", "02.10.2026")])
+    sh.fail(status, times=2, calls="values_batch_get", retry_after=0)
+    assert _brands(loader) == ["Samsung", "Apple"]
+    assert sh.errors == 2
+    assert loader.syncs["Innlevert"].full_syncs == 1
+
+
+def test_fetch_gives_up_after_retries_and_keeps_state():
+    sh, loader = _loader(_book([("Samsung", "01.10.2026")]))
+    loader.fetch()
+    sh.append_rows("Sheet2", [("Apple", "02.10.2026")])
+    sh.fail(503, times=10, calls="values_batch_get", retry_after=0)
+    with pytest.raises(APIError):
+        loader.fetch()
+    sh._failures.clear()
+    assert _brands(loader) == ["Samsung", "Apple"]
+    assert loader.syncs["Innlevert"].full_syncs == 1
+
+
+def test_error_rate_is_retried(monkeypatch):
+    # Ingen backoff-pauser i testen: samme beslutning (prøv igjen / gi opp), null ventetid
+    delay = sheet_data._retry_delay
+    monkeypatch.setattr(sheet_data, "_retry_delay",
+                        lambda e, attempt: None if delay(e, attempt) is None else 0.0)
+    client = FakeClient(rows=200, error_rate=0.3)
+    client.spreadsheet._rng.seed(1)
+    loader = SheetLoader(client, "fake", {"Innlevert": "Sheet2"}, append_only=("Innlevert",),
+                         check_modified=False)
+    assert len(loader.fetch()["Sheet2"]) == 201
+    assert client.spreadsheet.errors > 0
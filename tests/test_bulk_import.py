@@ -0,0 +1,96 @@
+"""bulk_import.import_excel mot fake_sheets: hele rader erstattes, fanen beholdes."""
+import io
+
+import pytest
+from gspread.exceptions import APIError
+from openpyxl import Workbook
+
+from bulk_import import import_excel
+from fake_sheets import FakeSpreadsheet
+
+
+def _xlsx(rows):
+    wb = Workbook()
+    for row in rows:
+        wb.active.append(list(row))
+    buf = io.BytesIO()
+    wb.save(buf)
+    buf.seek(0)
+    return buf
+
+
+def _book():
+    return {
+        "Sheet1": [["Merke", "Tekniker", "Ordrenr", "Notat"],
+                   ["Samsung", "Kari", "1001", "gammel"],
+                   ["LG", "Per", "1002"],
+                   ["Sony", "Ola", "1003", "gammel"]],
+        "Sheet2": [["Merke", "Innlevert"], ["Apple", "01.10.2026"]],
+    }
+
+
+def test_import_replaces_whole_rows_and_keeps_extra_header_columns():
+    sh = FakeSpreadsheet(_book())
+    stats = import_excel(_xlsx([("Brand", "Technician"), ("Apple", "Nils"), (None, "Ola")]),
+                         sh, "Sheet1")
+    assert sh.book["Sheet1"] == [
+        ["Merke", "Tekniker", "Ordrenr", "Notat"],
+        ["Apple", "Nils", "", ""],
+        ["", "", "", ""],
+        ["", "", "", ""],
+    ]
+    assert list(sh.book) == ["Sheet1", "Sheet2"]        # fanen er ikke slettet/flyttet
+    assert sh.book["Sheet2"] == _book()["Sheet2"]
+    assert (stats.read, stats.written, stats.skipped, stats.batches) == (2, 1, 1, 1)
+
+
+def test_import_grows_the_grid_for_more_rows():
+    sh = FakeSpreadsheet(_book())
+    rows = [("Merke", "Tekniker")] + [("Apple", f"T{i}") for i in range(1500)]
+    import_excel(_xlsx(rows), sh, "Sheet1", chunk_rows=500)
+    values = sh.book["Sheet1"]
+    assert len(values) == 1501
+    assert values[1500] == ["Apple", "T1499", "", ""]
+    assert sh.worksheet("Sheet1").row_count >= 1501
+
+
+def test_import_reports_progress_per_chunk():
+    seen = []
+    rows = [("Merke", "Tekniker")] + [("Apple", "Nils")] * 10
+    import_excel(_xlsx(rows), FakeSpreadsheet(_book()), "Sheet1", chunk_rows=4,
+                 on_progress=lambda s: seen.append(s.read))
+    assert seen == [4, 8, 10]
+
+
+def test_missing_columns_leave_the_sheet_untouched():
+    sh = FakeSpreadsheet(_book())
+    with pytest.raises(KeyError):
+        import_excel(_xlsx([("Foo", "Bar"), ("Apple", "Nils")]), sh, "Sheet1")
+    assert sh.book == _book()
+    assert sh.calls == 0
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_write_is_retried_on_rate_limit_and_server_errors(status):
+    sh = FakeSpreadsheet(_book())
+    sh.fail(status, times=2, calls="values_batch_update", retry_after=0)
+    import_excel(_xlsx([("Merke", "Tekniker"), ("Apple", "Nils")]), sh, "Sheet1")
+    assert sh.errors == 2
+    assert sh.book["Sheet1"][1] == ["Apple", "Nils", "", ""]
+
+
+def test_failed_write_leaves_the_sheet_untouched():
+    sh = FakeSpreadsheet(_book())
+    sh.fail(500, times=10, calls="values_batch_update", retry_after=0)
+    with pytest.raises(APIError):
+        import_excel(_xlsx([("Merke", "Tekniker"), ("Apple", "Nils")]), sh, "Sheet1")
+    assert sh.book == _book()
+
+
+def test_resize_is_retried():
+    sh = FakeSpreadsheet(_book())
+    sh.worksheet("Sheet1").fail(503, retry_after=0)        # bare skrivekall på fanen
+    rows = [("Merke", "Tekniker")] + [("Apple", "Nils")] * 1200
+    import_excel(_xlsx(rows), sh, "Sheet1")
+    assert sh.errors == 1
+    assert len(sh.book["Sheet1"]) == 1201